@@ -1,16 +1,13 @@
 import os
 from dotenv import load_dotenv
-from appwrite.client import Client
 from appwrite.services.databases import Databases
+from appwrite_client import get_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Appwrite client
-client = Client()
-client.set_endpoint(os.getenv('APPWRITE_ENDPOINT'))
-client.set_project(os.getenv('APPWRITE_PROJECT_ID'))
-client.set_key(os.getenv('APPWRITE_API_KEY'))
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
 
 # Initialize the database service
 databases = Databases(client)
@@ -1,18 +1,19 @@
 import os
 import json
+import argparse
 from dotenv import load_dotenv
-from appwrite.client import Client
 from appwrite.services.databases import Databases
 from appwrite.id import ID
+from appwrite.exception import AppwriteException
+from catalog import CollectionCatalog
+from fingerprint import load_state
+from appwrite_client import get_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Appwrite client
-client = Client()
-client.set_endpoint(os.getenv('APPWRITE_ENDPOINT'))
-client.set_project(os.getenv('APPWRITE_PROJECT_ID'))
-client.set_key(os.getenv('APPWRITE_API_KEY'))
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
 
 # Initialize the database service
 databases = Databases(client)
@@ -20,25 +21,17 @@ databases = Databases(client)
 # Use the database ID from environment variables
 DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
 
-def get_collection_id(collection_name):
-    try:
-        collections = databases.list_collections(DATABASE_ID)
-        for collection in collections['collections']:
-            if collection['name'] == collection_name:
-                return collection['$id']
-        return None
-    except Exception as e:
-        print(f"Error getting collection ID for {collection_name}: {str(e)}")
-        return None
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
 
 def create_relationship(parent_collection, parent_property, child_collection, type='oneToMany'):
     try:
-        parent_id = get_collection_id(parent_collection)
-        child_id = get_collection_id(child_collection)
+        parent_id = catalog.get_collection_id(parent_collection)
+        child_id = catalog.get_collection_id(child_collection)
         
         if not parent_id or not child_id:
             print(f"Error: Could not find collection IDs for {parent_collection} or {child_collection}")
-            return
+            return False
 
         databases.create_relationship_attribute(
             database_id=DATABASE_ID,
@@ -50,16 +43,33 @@ def create_relationship(parent_collection, parent_property, child_collection, ty
             two_way_key='parent_' + parent_collection.lower()
         )
         print(f"Relationship created: {parent_collection}.{parent_property} -> {child_collection}")
+    except AppwriteException as e:
+        if e.code != 409:
+            print(f"Error creating relationship {parent_collection}.{parent_property} -> {child_collection}: {str(e)}")
+            return False
+        print(f"Relationship {parent_collection}.{parent_property} already exists")
     except Exception as e:
         print(f"Error creating relationship {parent_collection}.{parent_property} -> {child_collection}: {str(e)}")
+        return False
+    return True
 
-def setup_relationships(data_model):
-    relationships = []
+# A collection's relationships are unchanged if its own and its related
+# collections' recorded hashes still match the live collections
+def relationships_current(schema_state, collection, collections):
+    live = catalog.collections
+    related = {attr['related_collection'] for attr in collection['attributes'] if attr.get('type') == 'relationship'}
+    if collection['name'] not in live or not schema_state.is_current(collection, 'relationships', live[collection['name']]['$id']):
+        return False
+    return all(name in collections and name in live and schema_state.is_current(collections[name], 'collection', live[name]['$id'])
+               for name in related)
+
+def setup_relationships(data_model, schema_state=None):
+    collections = {collection['name']: collection for collection in data_model['collections']}
+    relationships = {}
     for collection in data_model['collections']:
         for attribute in collection['attributes']:
             if attribute.get('type') == 'relationship':
-                relationships.append((
-                    collection['name'],
+                relationships.setdefault(collection['name'], []).append((
                     attribute['key'],
                     attribute['related_collection'],
                     attribute['relationship_type']
@@ -69,13 +79,26 @@ def setup_relationships(data_model):
         print("No relationships defined in the data model. Skipping relationship creation.")
         return
 
-    for parent, prop, child, rel_type in relationships:
-        create_relationship(parent, prop, child, rel_type)
+    for parent, attributes in relationships.items():
+        if schema_state is not None and relationships_current(schema_state, collections[parent], collections):
+            print(f"Relationships of {parent} unchanged since the last run. Skipping.")
+            continue
+        results = [create_relationship(parent, prop, child, rel_type) for prop, child, rel_type in attributes]
+        if all(results) and schema_state is not None:
+            schema_state.record(collections[parent], ['relationships'], catalog.get_collection_id(parent))
+    if schema_state is not None:
+        schema_state.save()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create the relationship attributes in _dataModel.json")
+    parser.add_argument('--refresh', action='store_true', help="create relationships even for collections unchanged since the last run")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
     # Load data model from JSON file
     with open('_dataModel.json', 'r') as f:
         data_model = json.load(f)
 
-    setup_relationships(data_model)
+    setup_relationships(data_model, load_state(DATABASE_ID, refresh=args.refresh))
     print("Relationship setup completed.")
\ No newline at end of file
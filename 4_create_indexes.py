@@ -1,17 +1,20 @@
 import os
 import json
+import asyncio
+import argparse
 from dotenv import load_dotenv
-from appwrite.client import Client
 from appwrite.services.databases import Databases
+from appwrite.exception import AppwriteException
+from catalog import CollectionCatalog
+from fingerprint import load_state
+from async_databases import AsyncDatabases, run_all
+from appwrite_client import get_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Appwrite client
-client = Client()
-client.set_endpoint(os.getenv('APPWRITE_ENDPOINT'))
-client.set_project(os.getenv('APPWRITE_PROJECT_ID'))
-client.set_key(os.getenv('APPWRITE_API_KEY'))
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
 
 # Initialize the database service
 databases = Databases(client)
@@ -19,47 +22,71 @@ databases = Databases(client)
 # Use the database ID from environment variables
 DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
 
-def get_collection_id(collection_name):
-    try:
-        collections = databases.list_collections(DATABASE_ID)
-        for collection in collections['collections']:
-            if collection['name'] == collection_name:
-                return collection['$id']
-        print(f"Collection '{collection_name}' not found")
-        return None
-    except Exception as e:
-        print(f"Error getting collection ID for '{collection_name}': {str(e)}")
-        return None
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
 
-def create_index(collection_id, key, type, attributes):
+# Coroutine view of the same service, so collections are indexed concurrently
+adb = AsyncDatabases(databases)
+
+async def create_index(collection_id, key, type, attributes, orders=None):
     try:
-        databases.create_index(
+        await adb.create_index(
             database_id=DATABASE_ID,
             collection_id=collection_id,
             key=key,
             type=type,
-            attributes=attributes
+            attributes=attributes,
+            orders=orders
         )
         print(f"Index '{key}' created successfully for collection '{collection_id}'")
+    except AppwriteException as e:
+        if e.code != 409:
+            print(f"Error creating index '{key}' for collection '{collection_id}': {str(e)}")
+            return False
+        print(f"Index '{key}' already exists in collection '{collection_id}'")
     except Exception as e:
         print(f"Error creating index '{key}' for collection '{collection_id}': {str(e)}")
+        return False
+    return True
 
 def load_data_model():
     with open('_dataModel.json', 'r') as f:
         return json.load(f)
 
-def create_indexes():
+# One collection's indexes are created in order; collections run side by side
+async def create_collection_indexes(collection, collection_id, schema_state=None):
+    results = []
+    for index in collection.get('indexes', []):
+        results.append(await create_index(collection_id, index['key'], index['type'], index['attributes'], index.get('orders')))
+    if all(results) and schema_state is not None:
+        schema_state.record(collection, ['indexes'], collection_id)
+
+async def create_indexes(schema_state=None):
     data_model = load_data_model()
     
+    pending = []
     for collection in data_model['collections']:
-        collection_id = get_collection_id(collection['name'])
+        collection_id = catalog.get_collection_id(collection['name'])
         if not collection_id:
             print(f"Skipping index creation for {collection['name']} due to missing collection")
             continue
-        
-        for index in collection.get('indexes', []):
-            create_index(collection_id, index['key'], index['type'], index['attributes'])
+        if schema_state is not None and schema_state.is_current(collection, 'indexes', collection_id):
+            print(f"Indexes of {collection['name']} unchanged since the last run. Skipping.")
+            continue
+        pending.append(create_collection_indexes(collection, collection_id, schema_state))
+    await run_all(pending)
+    if schema_state is not None:
+        schema_state.save()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create the indexes in _dataModel.json")
+    parser.add_argument('--refresh', action='store_true', help="create indexes even for collections unchanged since the last run")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    create_indexes()
+    args = parse_args()
+    try:
+        asyncio.run(create_indexes(load_state(DATABASE_ID, refresh=args.refresh)))
+    finally:
+        adb.close()
     print("Index creation process completed.")
\ No newline at end of file
@@ -1,19 +1,20 @@
 import os
 import json
+import asyncio
+import argparse
 from dotenv import load_dotenv
-from appwrite.client import Client
 from appwrite.services.databases import Databases
-from appwrite.permission import Permission
-from appwrite.role import Role
+from catalog import CollectionCatalog
+from reconcile import format_permissions
+from fingerprint import load_state
+from async_databases import AsyncDatabases, run_all
+from appwrite_client import get_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Appwrite client
-client = Client()
-client.set_endpoint(os.getenv('APPWRITE_ENDPOINT'))
-client.set_project(os.getenv('APPWRITE_PROJECT_ID'))
-client.set_key(os.getenv('APPWRITE_API_KEY'))
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
 
 # Initialize the database service
 databases = Databases(client)
@@ -21,37 +22,22 @@ databases = Databases(client)
 # Use the database ID from environment variables
 DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
 
-def get_collection_id(collection_name):
-    try:
-        collections = databases.list_collections(DATABASE_ID)
-        for collection in collections['collections']:
-            if collection['name'] == collection_name:
-                return collection['$id']
-        print(f"Collection '{collection_name}' not found")
-        return None
-    except Exception as e:
-        print(f"Error getting collection ID for '{collection_name}': {str(e)}")
-        return None
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
+
+# Coroutine view of the same service, so collections are updated concurrently
+adb = AsyncDatabases(databases)
 
-def set_collection_permissions(collection_name, permissions):
-    collection_id = get_collection_id(collection_name)
+async def set_collection_permissions(collection_name, permissions):
+    collection_id = catalog.get_collection_id(collection_name)
     if not collection_id:
         print(f"Failed to set permissions for {collection_name}: Collection not found")
-        return
+        return False
 
     try:
-        formatted_permissions = []
-        for perm in permissions:
-            action, role = perm.split('(')
-            role = role.strip('")')
-            if role == 'any':
-                formatted_permissions.append(getattr(Permission, action)(Role.any()))
-            elif role == 'users':
-                formatted_permissions.append(getattr(Permission, action)(Role.users()))
-            else:
-                formatted_permissions.append(getattr(Permission, action)(Role.team(role)))
+        formatted_permissions = format_permissions(permissions)
 
-        databases.update_collection(
+        await adb.update_collection(
             database_id=DATABASE_ID,
             collection_id=collection_id,
             name=collection_name,
@@ -60,21 +46,45 @@ def set_collection_permissions(collection_name, permissions):
         print(f"Permissions set for collection {collection_name}")
     except Exception as e:
         print(f"Error setting permissions for collection {collection_name}: {type(e).__name__}: {str(e)}")
+        return False
+    return True
 
 def load_data_model():
     with open('_dataModel.json', 'r') as f:
         return json.load(f)
 
-def set_permissions():
+async def set_collection_permissions_recorded(collection, schema_state=None):
+    if await set_collection_permissions(collection['name'], collection['permissions']) and schema_state is not None:
+        schema_state.record(collection, ['permissions'], catalog.get_collection_id(collection['name']))
+
+async def set_permissions(schema_state=None):
     data_model = load_data_model()
     
+    pending = []
     for collection in data_model['collections']:
-        if 'permissions' in collection:
-            set_collection_permissions(collection['name'], collection['permissions'])
-        else:
+        if 'permissions' not in collection:
             print(f"No permissions specified for collection {collection['name']}")
+            continue
+        if schema_state is not None:
+            live = catalog.collections.get(collection['name'])
+            if live and schema_state.is_current(collection, 'permissions', live['$id']):
+                print(f"Permissions of {collection['name']} unchanged since the last run. Skipping.")
+                continue
+        pending.append(set_collection_permissions_recorded(collection, schema_state))
+    await run_all(pending)
+    if schema_state is not None:
+        schema_state.save()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Set the collection permissions in _dataModel.json")
+    parser.add_argument('--refresh', action='store_true', help="set permissions even for collections unchanged since the last run")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
     print("Starting permissions setting process...")
-    set_permissions()
+    try:
+        asyncio.run(set_permissions(load_state(DATABASE_ID, refresh=args.refresh)))
+    finally:
+        adb.close()
     print("Permissions setting process completed.")
\ No newline at end of file
@@ -1,8 +1,14 @@
 import os
+import sys
 import json
+import time
+import argparse
+from xml.etree import ElementTree
 from dotenv import load_dotenv
-from appwrite.client import Client
 from appwrite.services.databases import Databases
+from catalog import CollectionCatalog
+from reconcile import attribute_diff, index_matches, format_permissions, normalize_permissions
+from appwrite_client import get_client
 import logging
 
 # Set up logging
@@ -11,11 +17,8 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Load environment variables
 load_dotenv()
 
-# Initialize Appwrite client
-client = Client()
-client.set_endpoint(os.getenv('APPWRITE_ENDPOINT'))
-client.set_project(os.getenv('APPWRITE_PROJECT_ID'))
-client.set_key(os.getenv('APPWRITE_API_KEY'))
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
 
 # Initialize the database service
 databases = Databases(client)
@@ -23,48 +26,80 @@ databases = Databases(client)
 # Use the database ID from environment variables
 DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
 
-def validate_collection_existence(collection_name):
-    try:
-        collections = databases.list_collections(DATABASE_ID)
-        for collection in collections['collections']:
-            if collection['name'] == collection_name:
-                logging.info(f"Collection '{collection_name}' exists.")
-                return collection['$id']
-        logging.error(f"Collection '{collection_name}' does not exist.")
-        return None
-    except Exception as e:
-        logging.error(f"Error validating collection '{collection_name}': {str(e)}")
-        return None
+# The live schema is read once (paginated) and every check runs against it in memory
+catalog = CollectionCatalog(databases, DATABASE_ID)
 
-def validate_collection_attributes(collection_id, expected_attributes):
-    try:
-        attributes = databases.list_attributes(DATABASE_ID, collection_id)
-        existing_attributes = {attr['key']: attr['type'] for attr in attributes['attributes']}
-        
-        for attr, attr_type in expected_attributes.items():
-            if attr not in existing_attributes:
-                logging.error(f"Attribute '{attr}' is missing in the collection.")
-            elif existing_attributes[attr] != attr_type:
-                logging.error(f"Attribute '{attr}' has incorrect type. Expected {attr_type}, got {existing_attributes[attr]}.")
-            else:
-                logging.info(f"Attribute '{attr}' is correctly configured.")
-    except Exception as e:
-        logging.error(f"Error validating attributes for collection {collection_id}: {str(e)}")
-
-def validate_relationship(parent_collection, child_collection, relationship_key):
-    parent_id = validate_collection_existence(parent_collection)
-    child_id = validate_collection_existence(child_collection)
-    
-    if parent_id and child_id:
-        try:
-            attributes = databases.list_attributes(DATABASE_ID, parent_id)
-            for attr in attributes['attributes']:
-                if attr['key'] == relationship_key and attr['type'] == 'relationship':
-                    logging.info(f"Relationship '{relationship_key}' between {parent_collection} and {child_collection} exists.")
-                    return
-            logging.error(f"Relationship '{relationship_key}' between {parent_collection} and {child_collection} is missing.")
-        except Exception as e:
-            logging.error(f"Error validating relationship: {str(e)}")
+def result(collection, check, name, status, message):
+    log = {'passed': logging.info, 'warning': logging.warning, 'failed': logging.error}[status]
+    log(message)
+    return {'collection': collection, 'check': check, 'name': name, 'status': status, 'message': message}
+
+def validate_attributes(collection, live, live_collections):
+    results = []
+    name = collection['name']
+    live_attributes = {attr['key']: attr for attr in live.get('attributes', [])}
+    for attr in collection['attributes']:
+        check = 'relationship' if attr['type'] == 'relationship' else 'attribute'
+        existing = live_attributes.get(attr['key'])
+        if not existing:
+            results.append(result(name, check, attr['key'], 'failed', f"{check.capitalize()} '{name}.{attr['key']}' is missing."))
+            continue
+        related_id = None
+        if check == 'relationship':
+            related = live_collections.get(attr['related_collection'])
+            if not related:
+                results.append(result(name, check, attr['key'], 'failed',
+                                      f"Relationship '{name}.{attr['key']}' points to missing collection '{attr['related_collection']}'."))
+                continue
+            related_id = related['$id']
+        diff = attribute_diff(attr, existing, related_id)
+        if diff:
+            detail = ', '.join(f"{field}: expected {new}, got {old}" for field, (old, new) in diff.items())
+            results.append(result(name, check, attr['key'], 'failed', f"{check.capitalize()} '{name}.{attr['key']}' differs ({detail})."))
+        elif existing.get('status', 'available') != 'available':
+            results.append(result(name, check, attr['key'], 'failed',
+                                  f"{check.capitalize()} '{name}.{attr['key']}' is {existing['status']}."))
+        else:
+            results.append(result(name, check, attr['key'], 'passed', f"{check.capitalize()} '{name}.{attr['key']}' is correctly configured."))
+    wanted = {attr['key'] for attr in collection['attributes']}
+    for key in live_attributes:
+        if key not in wanted:
+            results.append(result(name, 'attribute', key, 'warning', f"Attribute '{name}.{key}' is not in the data model."))
+    return results
+
+def validate_indexes(collection, live):
+    results = []
+    name = collection['name']
+    live_indexes = {index['key']: index for index in live.get('indexes', [])}
+    for index in collection.get('indexes', []):
+        existing = live_indexes.get(index['key'])
+        if not existing:
+            results.append(result(name, 'index', index['key'], 'failed', f"Index '{name}.{index['key']}' is missing."))
+        elif not index_matches(index, existing):
+            results.append(result(name, 'index', index['key'], 'failed',
+                                  f"Index '{name}.{index['key']}' differs (expected {index['type']} on {index['attributes']}, "
+                                  f"got {existing['type']} on {existing['attributes']})."))
+        elif existing.get('status', 'available') != 'available':
+            results.append(result(name, 'index', index['key'], 'failed', f"Index '{name}.{index['key']}' is {existing['status']}."))
+        else:
+            results.append(result(name, 'index', index['key'], 'passed', f"Index '{name}.{index['key']}' is correctly configured."))
+    wanted = {index['key'] for index in collection.get('indexes', [])}
+    for key in live_indexes:
+        if key not in wanted:
+            results.append(result(name, 'index', key, 'warning', f"Index '{name}.{key}' is not in the data model."))
+    return results
+
+def validate_permissions(collection, live):
+    name = collection['name']
+    if 'permissions' not in collection:
+        return []
+    wanted = normalize_permissions(format_permissions(collection['permissions']))
+    actual = normalize_permissions(live.get('$permissions', []))
+    if wanted != actual:
+        missing = ', '.join(sorted(wanted - actual)) or 'none'
+        extra = ', '.join(sorted(actual - wanted)) or 'none'
+        return [result(name, 'permissions', name, 'failed', f"Permissions for '{name}' differ (missing: {missing}; unexpected: {extra}).")]
+    return [result(name, 'permissions', name, 'passed', f"Permissions for '{name}' are correctly configured.")]
 
 def load_data_model():
     with open('_dataModel.json', 'r') as f:
@@ -72,29 +107,59 @@ def load_data_model():
 
 def run_validation():
     data_model = load_data_model()
-    
-    # Validate collections
-    collections = [collection['name'] for collection in data_model['collections']]
-    for collection in collections:
-        validate_collection_existence(collection)
-    
-    # Validate attributes
+    live_collections = catalog.collections
+    results = []
     for collection in data_model['collections']:
-        collection_id = validate_collection_existence(collection['name'])
-        if collection_id:
-            expected_attributes = {attr['key']: attr['type'] for attr in collection['attributes']}
-            validate_collection_attributes(collection_id, expected_attributes)
-    
-    # Validate relationships
-    relationships = []
-    for collection in data_model['collections']:
-        for attr in collection['attributes']:
-            if attr.get('type') == 'relationship':
-                relationships.append((collection['name'], attr['related_collection'], attr['key']))
-    
-    for parent, child, key in relationships:
-        validate_relationship(parent, child, key)
+        live = live_collections.get(collection['name'])
+        if not live:
+            results.append(result(collection['name'], 'collection', collection['name'], 'failed',
+                                  f"Collection '{collection['name']}' does not exist."))
+            continue
+        results.append(result(collection['name'], 'collection', collection['name'], 'passed',
+                              f"Collection '{collection['name']}' exists."))
+        results.extend(validate_attributes(collection, live, live_collections))
+        results.extend(validate_indexes(collection, live))
+        results.extend(validate_permissions(collection, live))
+    return results
+
+def write_json_report(path, results, elapsed):
+    summary = {status: sum(1 for r in results if r['status'] == status) for status in ('passed', 'warning', 'failed')}
+    with open(path, 'w') as f:
+        json.dump({'database_id': DATABASE_ID, 'elapsed': round(elapsed, 3), 'summary': summary, 'results': results}, f, indent=2)
+
+def write_junit_report(path, results, elapsed):
+    suites = ElementTree.Element('testsuites', name='appwrite-schema', time=f"{elapsed:.3f}")
+    for collection in dict.fromkeys(r['collection'] for r in results):
+        cases = [r for r in results if r['collection'] == collection]
+        suite = ElementTree.SubElement(suites, 'testsuite', name=collection, tests=str(len(cases)),
+                                       failures=str(sum(1 for r in cases if r['status'] == 'failed')))
+        for r in cases:
+            case = ElementTree.SubElement(suite, 'testcase', classname=f"{collection}.{r['check']}", name=r['name'])
+            if r['status'] == 'failed':
+                ElementTree.SubElement(case, 'failure', message=r['message'])
+            elif r['status'] == 'warning':
+                ElementTree.SubElement(case, 'system-out').text = r['message']
+    ElementTree.ElementTree(suites).write(path, encoding='utf-8', xml_declaration=True)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Validate the live database against _dataModel.json")
+    parser.add_argument('--report', help="write a JSON report to this path")
+    parser.add_argument('--junit', help="write a JUnit XML report to this path")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    run_validation()
-    logging.info("Validation process completed.")
\ No newline at end of file
+    args = parse_args()
+    started = time.monotonic()
+    try:
+        results = run_validation()
+    except Exception as e:
+        logging.error(f"Error reading the live schema: {str(e)}")
+        sys.exit(2)
+    elapsed = time.monotonic() - started
+    if args.report:
+        write_json_report(args.report, results, elapsed)
+    if args.junit:
+        write_junit_report(args.junit, results, elapsed)
+    failed = sum(1 for r in results if r['status'] == 'failed')
+    logging.info(f"Validation process completed in {elapsed:.2f}s: {len(results) - failed} checks passed, {failed} failed.")
+    sys.exit(1 if failed else 0)
@@ -1,20 +1,24 @@
 import os
+import sys
+import gzip
+import argparse
 import json
-import random
 from dotenv import load_dotenv
-from appwrite.client import Client
 from appwrite.services.databases import Databases
-from appwrite.id import ID
-from datetime import datetime, timedelta
+from catalog import CollectionCatalog, list_document_ids
+from bulk_writer import BulkWriter
+from sample_data import seed_documents, seeding_order, RelationshipPicker
+from datagen import compile_data_model
+from importer import import_file
+from overflow import overflow_store
+from journal import open_journal, BatchProgress
+from appwrite_client import get_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Appwrite client
-client = Client()
-client.set_endpoint(os.getenv('APPWRITE_ENDPOINT'))
-client.set_project(os.getenv('APPWRITE_PROJECT_ID'))
-client.set_key(os.getenv('APPWRITE_API_KEY'))
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
 
 # Initialize the database service
 databases = Databases(client)
@@ -22,92 +26,159 @@ databases = Databases(client)
 # Use the database ID from environment variables
 DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
 
-def get_collection_id(collection_name):
-    try:
-        collections = databases.list_collections(DATABASE_ID)
-        for collection in collections['collections']:
-            if collection['name'] == collection_name:
-                return collection['$id']
-        print(f"Collection '{collection_name}' not found")
-        return None
-    except Exception as e:
-        print(f"Error getting collection ID for '{collection_name}': {str(e)}")
-        return None
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
 
-def create_document(collection_name, data):
-    collection_id = get_collection_id(collection_name)
+def seed_collection(collection, writer, num_documents=5, pickers=None, generator=None, journal=None):
+    collection_id = catalog.get_collection_id(collection['name'])
     if not collection_id:
-        print(f"Failed to create document for {collection_name}: Collection not found")
+        print(f"Failed to seed {collection['name']}: Collection not found")
         return None
+    return seed_documents(writer, collection, collection_id, num_documents, pickers, generator, journal)
 
-    try:
-        document = databases.create_document(
-            database_id=DATABASE_ID,
-            collection_id=collection_id,
-            document_id=ID.unique(),
-            data=data
-        )
-        print(f"Document created in {collection_name}: {document['$id']}")
-        return document['$id']
-    except Exception as e:
-        print(f"Error creating document in {collection_name}: {str(e)}")
-        return None
+# ID pools are fetched once per related collection ($id only, paginated) and reused
+def get_id_pool(collection_name, id_pools):
+    if collection_name not in id_pools:
+        collection_id = catalog.get_collection_id(collection_name)
+        id_pools[collection_name] = list_document_ids(databases, DATABASE_ID, collection_id) if collection_id else []
+    return id_pools[collection_name]
 
-def generate_sample_data(attribute):
-    attr_type = attribute['type']
-    if attr_type == 'string':
-        return f"Sample {attribute['key']}"
-    elif attr_type == 'integer':
-        return random.randint(1, 100)
-    elif attr_type == 'float':
-        return random.uniform(1.0, 100.0)
-    elif attr_type == 'boolean':
-        return random.choice([True, False])
-    elif attr_type == 'datetime':
-        return (datetime.now() - timedelta(days=random.randint(0, 30))).isoformat()
-    elif attr_type == 'enum':
-        return random.choice(attribute['elements'])
-    elif attr_type == 'relationship':
-        return None  # Relationships will be handled separately
-    else:
+# Fill in relationships that could not be set at create time, with concurrent updates
+def seed_relationships(data_model, deferred, writer, journal=None):
+    id_pools = {}
+    results = []
+    for collection in data_model['collections']:
+        for attr in collection['attributes']:
+            if (collection['name'], attr['key']) not in deferred:
+                continue
+            related_ids = get_id_pool(attr['related_collection'], id_pools)
+            if not related_ids:
+                continue
+            picker = RelationshipPicker(attr, related_ids)
+            collection_id = catalog.get_collection_id(collection['name'])
+            progress = BatchProgress(journal, collection['name'], f"link:{attr['key']}") if journal else None
+            updates = pending_updates(get_id_pool(collection['name'], id_pools), attr['key'], picker, progress)
+            results.append(writer.update_documents(f"{collection['name']}.{attr['key']}", collection_id, updates,
+                                                   on_success=progress.done if progress else None))
+            if progress:
+                progress.finish()
+    return results
+
+# Relationship updates for the documents in `ids`, skipping batches already journaled
+def pending_updates(ids, key, picker, progress=None):
+    for index, doc_id in enumerate(ids):
+        if progress is not None:
+            if not progress.is_pending(index):
+                continue
+            progress.start(doc_id, index)
+        yield doc_id, {key: picker.pick()}
+
+def load_profile(path):
+    if not path:
         return None
+    with open(path, 'r') as f:
+        return json.load(f)
 
-def seed_collection(collection, num_documents=5):
-    for _ in range(num_documents):
-        data = {}
-        for attr in collection['attributes']:
-            if attr['type'] != 'relationship':
-                data[attr['key']] = generate_sample_data(attr)
-        create_document(collection['name'], data)
+def seed_data(num_documents=5, concurrency=32, rate=None, adaptive=True, random_seed=None, profile=None, journal=None):
+    with open('_dataModel.json', 'r') as f:
+        data_model = json.load(f)
 
-def seed_relationships(data_model):
-    for collection in data_model['collections']:
-        for attr in collection['attributes']:
-            if attr['type'] == 'relationship':
-                related_collection = next(c for c in data_model['collections'] if c['name'] == attr['related_collection'])
-                related_docs = databases.list_documents(DATABASE_ID, get_collection_id(related_collection['name']))
-                
-                if related_docs['documents']:
-                    docs = databases.list_documents(DATABASE_ID, get_collection_id(collection['name']))
-                    for doc in docs['documents']:
-                        related_id = random.choice(related_docs['documents'])['$id']
-                        databases.update_document(
-                            DATABASE_ID,
-                            get_collection_id(collection['name']),
-                            doc['$id'],
-                            {attr['key']: [related_id]}
-                        )
-
-def seed_data():
+    generators = compile_data_model(data_model, random_seed, profile)
+    writer = BulkWriter(databases, DATABASE_ID, concurrency=concurrency, rate=rate, adaptive=adaptive,
+                        overflow=overflow_store(client, data_model))
+    ordered, deferred = seeding_order(data_model)
+    id_pools = {}
+    results = []
+    for collection in ordered:
+        # Related collections are already seeded, so their IDs can go into the create call
+        pickers = {
+            attr['key']: RelationshipPicker(attr, get_id_pool(attr['related_collection'], id_pools))
+            for attr in collection['attributes']
+            if attr['type'] == 'relationship' and (collection['name'], attr['key']) not in deferred
+        }
+        results.append(seed_collection(collection, writer, num_documents, pickers, generators[collection['name']], journal))
+
+    results.extend(seed_relationships(data_model, deferred, writer, journal))
+
+    print("Seeding summary:")
+    for stats in results:
+        if stats:
+            print(f"  {stats.summary()}")
+
+# Write generated documents to <directory>/<Collection>.ndjson.gz instead of the
+# server, as fixtures for --import or other load tools. Relationships need live
+# document IDs, so they are left out.
+def write_fixtures(directory, num_documents=5, random_seed=None, profile=None):
     with open('_dataModel.json', 'r') as f:
         data_model = json.load(f)
 
-    for collection in data_model['collections']:
-        seed_collection(collection)
+    os.makedirs(directory, exist_ok=True)
+    for name, generator in compile_data_model(data_model, random_seed, profile).items():
+        path = os.path.join(directory, f"{name}.ndjson.gz")
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=1) as f:
+            for data in generator.documents(num_documents):
+                f.write(json.dumps(data) + '\n')
+        print(f"Wrote {num_documents} {name} documents to {path}")
+
+def import_data(path, collection_name, reject_path=None, concurrency=32, rate=None, adaptive=True, journal=None, resume=False):
+    with open('_dataModel.json', 'r') as f:
+        data_model = json.load(f)
 
-    seed_relationships(data_model)
+    collection = next((c for c in data_model['collections'] if c['name'] == collection_name), None)
+    if not collection:
+        print(f"Collection '{collection_name}' is not defined in _dataModel.json")
+        return None
+    collection_id = catalog.get_collection_id(collection_name)
+    if not collection_id:
+        print(f"Failed to import into {collection_name}: Collection not found")
+        return None
+
+    writer = BulkWriter(databases, DATABASE_ID, concurrency=concurrency, rate=rate, adaptive=adaptive,
+                        overflow=overflow_store(client, data_model))
+    progress = BatchProgress(journal, collection_name, 'import') if journal else None
+    return import_file(path, collection, collection_id, writer, reject_path or f"{path}.rejects.ndjson", progress, resume)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed every collection in _dataModel.json with sample documents")
+    parser.add_argument('--count', type=int, default=5, help="documents per collection (default: 5)")
+    parser.add_argument('--concurrency', type=int, default=32, help="maximum parallel create_document calls (default: 32)")
+    parser.add_argument('--fixed-concurrency', action='store_true', help="always run --concurrency calls instead of adapting to throttling")
+    parser.add_argument('--rate', type=float, default=0, help="target documents/sec per collection, 0 for unlimited (default: 0)")
+    parser.add_argument('--random-seed', type=int, help="seed for reproducible sample data")
+    parser.add_argument('--profile', help="JSON file of per-attribute generation hints: {collection: {attribute: {...}}}")
+    parser.add_argument('--output', help="write generated documents to NDJSON fixtures in this directory instead of the server")
+    parser.add_argument('--import', dest='import_path', help="load real rows from an NDJSON or CSV file (optionally .gz) instead of generating them")
+    parser.add_argument('--collection', help="collection to import into (required with --import)")
+    parser.add_argument('--resume', action='store_true', help="continue an interrupted seed or import from its journal, skipping finished batches")
+    parser.add_argument('--reject', help="file for rows that fail validation or are refused by the server (default: <import file>.rejects.ndjson)")
+    args = parser.parse_args()
+    if args.import_path and not args.collection:
+        parser.error("--import requires --collection")
+    return args
 
 if __name__ == "__main__":
-    print("Starting data seeding process...")
-    seed_data()
+    args = parse_args()
+    journal = None
+    try:
+        if args.import_path:
+            journal = open_journal(f"import-{args.collection}", DATABASE_ID,
+                                   {'path': os.path.abspath(args.import_path), 'size': os.path.getsize(args.import_path)}, args.resume)
+        elif not args.output:
+            journal = open_journal('seed', DATABASE_ID, {'count': args.count}, args.resume)
+    except (OSError, ValueError) as e:
+        print(f"Error opening journal: {str(e)}")
+        sys.exit(1)
+    if args.import_path:
+        print(f"Importing {args.import_path} into {args.collection}...")
+        import_data(args.import_path, args.collection, args.reject, args.concurrency, args.rate, not args.fixed_concurrency,
+                    journal, args.resume)
+    elif args.output:
+        write_fixtures(args.output, args.count, args.random_seed, load_profile(args.profile))
+    else:
+        print("Starting data seeding process...")
+        seed_data(args.count, args.concurrency, args.rate, not args.fixed_concurrency, args.random_seed, load_profile(args.profile),
+                  journal)
+    if journal is not None:
+        journal.close()
+    client.print_pool_stats()
     print("Data seeding process completed.")
\ No newline at end of file
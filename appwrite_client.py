@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import atexit
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from appwrite.client import Client
+from appwrite.input_file import InputFile
+from appwrite.exception import AppwriteException
+from appwrite.encoders.value_class_encoder import ValueClassEncoder
+from metrics import RequestMetrics, report
+from retry import RetryPolicy, retry_after_seconds, policy_from_env, created_path
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_TIMEOUT = 30
+
+# Response body bytes as they came over the wire, i.e. before gzip/deflate
+# decoding; the decoded length when the raw stream is unavailable
+def wire_bytes(response):
+    if response is None:
+        return 0
+    content = response.content or b''
+    try:
+        return response.raw.tell() or len(content)
+    except AttributeError:
+        return len(content)
+
+# Appwrite client that sends every request through one requests.Session, so
+# TCP/TLS connections are kept alive and reused instead of being opened per call.
+# The pool blocks when all connections are busy rather than opening throwaway
+# ones, which keeps highly concurrent seeding from exhausting ephemeral ports.
+class PooledClient(Client):
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, retry_policy=None):
+        super().__init__()
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        # Let the server compress responses; requests decodes them transparently
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        # Every request is timed and counted per endpoint and collection
+        self.metrics = RequestMetrics()
+
+    # Same request/response handling as Client.call, sent through the pooled session
+    def call(self, method, path='', headers=None, params=None, response_type='json'):
+        if headers is None:
+            headers = {}
+        if params is None:
+            params = {}
+
+        params = {k: v for k, v in params.items() if v is not None}
+        created = created_path(method, path, params)
+        idempotent = method != 'post' or created is not None
+        files = {}
+        stringify = False
+
+        headers = {**self._global_headers, **headers}
+
+        # GETs carry their parameters in the query string. Unlike Client.call, no
+        # empty JSON body is sent, which some servers leave unread on a kept-alive
+        # connection.
+        if method == 'get':
+            data = None
+        else:
+            data = params
+            params = {}
+            if headers['content-type'].startswith('application/json'):
+                data = json.dumps(data, cls=ValueClassEncoder)
+
+        if data is not None and headers['content-type'].startswith('multipart/form-data'):
+            del headers['content-type']
+            stringify = True
+            for key in data.copy():
+                if isinstance(data[key], InputFile):
+                    files[key] = (data[key].filename, data[key].data)
+                    del data[key]
+            data = self.flatten(data, stringify=stringify)
+
+        # Retryable failures (throttling, 5xx, dropped connections) of idempotent
+        # requests are retried with backoff; everything else is raised straight away
+        attempt = 0
+        while True:
+            try:
+                return self._send(method, path, headers, params, data, files, stringify, response_type)
+            except AppwriteException as e:
+                status = e.code or 0
+                if status == 409 and attempt > 0 and created:
+                    # An earlier attempt was applied but its response was lost
+                    return self.call('get', created, {'content-type': 'application/json'})
+                self.retry_policy.note(status)
+                if not self.retry_policy.should_retry(status, attempt, idempotent):
+                    raise
+                self.metrics.record_retry(method, path)
+                time.sleep(self.retry_policy.delay(attempt, getattr(e, 'retry_after', None)))
+                attempt += 1
+
+    # One attempt, timed and recorded in self.metrics
+    def _send(self, method, path, headers, params, data, files, stringify, response_type):
+        response = None
+        result = None
+        started = time.monotonic()
+        try:
+            response = self.session.request(
+                method=method,
+                url=self._endpoint + path,
+                params=self.flatten(params, stringify=stringify),
+                data=data,
+                files=files,
+                headers=headers,
+                verify=(not self._self_signed),
+                allow_redirects=False if response_type == 'location' else True,
+                timeout=self.timeout
+            )
+
+            response.raise_for_status()
+
+            warnings = response.headers.get('x-appwrite-warning')
+            if warnings:
+                for warning in warnings.split(';'):
+                    print(f'Warning: {warning}')
+
+            content_type = response.headers['Content-Type']
+
+            if response_type == 'location':
+                result = response.headers.get('Location')
+            elif content_type.startswith('application/json'):
+                result = response.json()
+            else:
+                result = response._content
+            return result
+        except Exception as e:
+            if response is not None:
+                content_type = response.headers.get('Content-Type', '')
+                if content_type.startswith('application/json'):
+                    error = AppwriteException(response.json()['message'], response.status_code, response.json().get('type'), response.json())
+                else:
+                    error = AppwriteException(response.text, response.status_code)
+                error.retry_after = retry_after_seconds(response.headers)
+                raise error
+            else:
+                raise AppwriteException(e)
+        finally:
+            self.metrics.record(
+                method,
+                path,
+                time.monotonic() - started,
+                response.status_code if response is not None else 0,
+                (len(data) if isinstance(data, (str, bytes)) else 0) + sum(len(file[1]) for file in files.values()),
+                wire_bytes(response),
+                result
+            )
+
+    # Requests sent vs connections opened across every host this client talked to
+    def pool_stats(self):
+        requests_sent = new_connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            new_connections += pool.num_connections
+        return {
+            'requests': requests_sent,
+            'new_connections': new_connections,
+            'reused_connections': max(requests_sent - new_connections, 0),
+        }
+
+    def print_pool_stats(self):
+        stats = self.pool_stats()
+        print(f"HTTP pool: {stats['requests']} requests, {stats['new_connections']} new connections, "
+              f"{stats['reused_connections']} reused")
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+# Build a pooled client from the environment. Pool size and per-request timeout
+# can be tuned with APPWRITE_POOL_SIZE and APPWRITE_TIMEOUT, retries with
+# APPWRITE_MAX_RETRIES, APPWRITE_RETRY_BASE_DELAY and APPWRITE_RETRY_MAX_DELAY.
+def create_client(endpoint=None, project_id=None, api_key=None, pool_size=None, timeout=None):
+    load_dotenv()
+    client = PooledClient(
+        pool_size=pool_size or int(os.getenv('APPWRITE_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        timeout=timeout or float(os.getenv('APPWRITE_TIMEOUT', DEFAULT_TIMEOUT)),
+        retry_policy=policy_from_env()
+    )
+    client.set_endpoint(endpoint or os.getenv('APPWRITE_ENDPOINT'))
+    client.set_project(project_id or os.getenv('APPWRITE_PROJECT_ID'))
+    client.set_key(api_key or os.getenv('APPWRITE_API_KEY'))
+    return client
+
+# One client per process, so every stage loaded into the same process
+# (deploy.py, benchmarks) shares a single connection pool. Its request metrics
+# are reported when the process exits.
+def get_client():
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = create_client()
+            atexit.register(report, _shared_client.metrics)
+        return _shared_client
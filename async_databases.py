@@ -0,0 +1,71 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from appwrite_client import DEFAULT_POOL_SIZE
+
+# asyncio view of a Databases service. Every method of the service
+# (create_collection, create_*_attribute, create_index, update_collection,
+# create_document, list_documents, ...) is available as a coroutine taking the
+# same arguments. Calls are sent on worker threads through the same pooled
+# client, so retries, metrics and connection reuse work as for blocking calls.
+# At most `limit` calls are in flight across every task using the facade; the
+# rest wait on a semaphore without holding a thread.
+class AsyncDatabases:
+    def __init__(self, databases, limit=None):
+        self.databases = databases
+        self.limit = max(1, limit or int(os.getenv('APPWRITE_POOL_SIZE', DEFAULT_POOL_SIZE)))
+        self._executor = ThreadPoolExecutor(max_workers=self.limit, thread_name_prefix='appwrite-async')
+        self._loop = None
+        self._semaphore = None
+
+    def __getattr__(self, name):
+        method = getattr(self.databases, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+    # Run any blocking call under the in-flight limit. The slot is held until
+    # the call has returned, even when the awaiting task is cancelled first, so
+    # cancelling never lets more than `limit` requests run at once.
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.limit)
+        semaphore = self._semaphore
+        await semaphore.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                # The loop has already closed; nobody is left waiting
+                pass
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    # Wait for calls already sent and drop those not yet started
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+# Run coroutines concurrently and return their results in order. If one of
+# them raises, or the caller is cancelled, the others are cancelled and awaited
+# before the error propagates, so no task outlives the call.
+async def run_all(coros):
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from appwrite.services.databases import Databases
+from appwrite.services.storage import Storage
+from standin_server import StandInServer
+from appwrite_client import create_client
+from bulk_writer import BulkWriter
+from data_access import Table
+from overflow import OverflowStore
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Each stage runs as its own process, exactly as a user would run it, against a
+# fresh stand-in server. Arguments may reference the scenario's fields.
+STAGES = [
+    ('1_setup_appwrite.py', []),
+    ('2_create_collections.py', []),
+    ('3_create_relationships.py', []),
+    ('4_create_indexes.py', []),
+    ('5_set_permissions.py', []),
+    ('6_validation.py', []),
+    ('7_seed_data.py', ['--count', '{documents}', '--concurrency', '16']),
+    ('xxx_delete_all_documents.py', ['--concurrency', '16']),
+]
+
+# Stages whose cost should grow with the number of documents; all others
+# should grow no faster than the size of the data model.
+DOCUMENT_STAGES = {'7_seed_data.py', 'xxx_delete_all_documents.py'}
+
+# A stage fails the scaling check if its request count grows more than this
+# factor faster than the scenario's size (catches accidental O(n^2) listings)
+SCALING_TOLERANCE = 1.5
+
+# A stage fails the baseline check if it needs more requests than this
+BASELINE_TOLERANCE = 1.10
+
+SCENARIOS = {
+    'quick': [
+        {'name': 'model-base-100', 'model': None, 'documents': 100},
+        {'name': 'model-base-400', 'model': None, 'documents': 400},
+        {'name': 'model-5x5', 'model': (5, 5), 'documents': 20},
+        {'name': 'model-10x10', 'model': (10, 10), 'documents': 20},
+    ],
+    'full': [
+        {'name': 'model-base-1000', 'model': None, 'documents': 1000},
+        {'name': 'model-base-5000', 'model': None, 'documents': 5000},
+        {'name': 'model-5x5', 'model': (5, 5), 'documents': 50},
+        {'name': 'model-10x10', 'model': (10, 10), 'documents': 50},
+        {'name': 'model-20x20', 'model': (20, 20), 'documents': 50},
+    ],
+}
+
+ATTRIBUTE_TYPES = [
+    {'type': 'string', 'size': 255},
+    {'type': 'integer'},
+    {'type': 'boolean'},
+    {'type': 'datetime'},
+    {'type': 'enum', 'elements': ['low', 'medium', 'high']},
+    {'type': 'float'},
+    {'type': 'string', 'size': 2000},
+]
+
+PERMISSIONS = ['read("users")', 'create("users")', 'update("users")', 'delete("users")']
+
+def synthetic_model(num_collections, num_attributes):
+    collections = []
+    for c in range(num_collections):
+        attributes = []
+        for a in range(num_attributes):
+            spec = ATTRIBUTE_TYPES[a % len(ATTRIBUTE_TYPES)]
+            attributes.append({'key': f'field{a}', **spec, 'required': a == 0})
+        if c > 0:
+            attributes.append({'key': 'parent', 'type': 'relationship', 'related_collection': f'Collection{c - 1}',
+                               'relationship_type': 'manyToOne'})
+        indexes = [{'key': 'idx_field0', 'type': 'key', 'attributes': ['field0']}]
+        if num_attributes > 3:
+            indexes.append({'key': 'idx_field3', 'type': 'key', 'attributes': ['field3']})
+        collections.append({'name': f'Collection{c}', 'attributes': attributes, 'indexes': indexes,
+                            'permissions': PERMISSIONS})
+    return {'collections': collections}
+
+def scenario_size(scenario, stage):
+    model = scenario['data_model']
+    if stage in DOCUMENT_STAGES:
+        # Document counts are per collection
+        return scenario['documents'] * len(model['collections'])
+    return sum(len(c['attributes']) + len(c.get('indexes', [])) for c in model['collections'])
+
+def run_stage(server, workdir, stage, args, scenario, log):
+    env = {
+        **os.environ,
+        'APPWRITE_ENDPOINT': server.endpoint,
+        'APPWRITE_PROJECT_ID': 'benchmark',
+        'APPWRITE_API_KEY': 'benchmark',
+        'APPWRITE_DATABASE_ID': 'benchmark',
+        'APPWRITE_DATABASE_NAME': 'benchmark',
+        'PYTHONPATH': SCRIPT_DIR,
+        # Measure every stage doing its full work, not skipping what an earlier stage recorded
+        'APPWRITE_STATE_FILE': '',
+    }
+    command = [sys.executable, os.path.join(SCRIPT_DIR, stage)] + [arg.format(**scenario) for arg in args]
+    server.state.reset_stats()
+    started = time.monotonic()
+    process = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    elapsed = time.monotonic() - started
+    log.write(f"===== {scenario['name']} / {stage} (exit {process.returncode})\n{process.stdout}{process.stderr}\n")
+    return {
+        'stage': stage,
+        'exit_code': process.returncode,
+        'elapsed': round(elapsed, 3),
+        **server.state.totals(),
+        'endpoints': dict(server.state.stats),
+    }
+
+def run_scenario(scenario, options, log):
+    if scenario['model']:
+        scenario['data_model'] = synthetic_model(*scenario['model'])
+    else:
+        with open(os.path.join(SCRIPT_DIR, '_dataModel.json')) as f:
+            scenario['data_model'] = json.load(f)
+    server = StandInServer(latency=options.latency, attribute_delay=options.attribute_delay, seed=0).start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            with open(os.path.join(workdir, '_dataModel.json'), 'w') as f:
+                json.dump(scenario['data_model'], f)
+            return [run_stage(server, workdir, stage, args, scenario, log) for stage, args in STAGES]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def print_results(name, results):
+    print(f"\n{name}")
+    print(f"  {'stage':<30} {'requests':>9} {'KB in':>9} {'KB out':>9} {'errors':>7} {'elapsed':>8}")
+    for r in results:
+        print(f"  {r['stage']:<30} {r['requests']:>9} {r['bytes_in'] / 1024:>9.1f} {r['bytes_out'] / 1024:>9.1f} "
+              f"{r['errors']:>7} {r['elapsed']:>7.2f}s")
+
+# Compare the smallest and largest scenario of each series: requests should not
+# grow much faster than the scenario's size
+def check_scaling(scenarios, all_results):
+    failures = []
+    series = {}
+    for scenario in scenarios:
+        series.setdefault(scenario['model'] is None, []).append(scenario)
+    for members in series.values():
+        if len(members) < 2:
+            continue
+        for stage, _ in STAGES:
+            small, large = members[0], members[-1]
+            size_ratio = scenario_size(large, stage) / max(scenario_size(small, stage), 1)
+            small_requests = next(r['requests'] for r in all_results[small['name']] if r['stage'] == stage)
+            large_requests = next(r['requests'] for r in all_results[large['name']] if r['stage'] == stage)
+            request_ratio = large_requests / max(small_requests, 1)
+            if request_ratio > max(size_ratio, 1) * SCALING_TOLERANCE:
+                failures.append(f"{stage}: requests grew {request_ratio:.1f}x from {small['name']} to {large['name']} "
+                                f"while the workload grew {size_ratio:.1f}x")
+    return failures
+
+def check_baseline(baseline, all_results):
+    failures = []
+    for name, results in all_results.items():
+        for r in results:
+            expected = baseline.get(name, {}).get(r['stage'])
+            if expected is not None and r['requests'] > expected * BASELINE_TOLERANCE + 2:
+                failures.append(f"{name} / {r['stage']}: {r['requests']} requests, baseline {expected}")
+    return failures
+
+class OverflowNote:
+    @classmethod
+    def from_document(cls, document):
+        return document
+
+class OverflowNotes(Table):
+    collection_name = 'Notes'
+    record = OverflowNote
+
+# Overwriting or deleting a document with overflow values must delete the files
+# it pointed to; the bucket should always hold one file per long value
+def check_overflow_cleanup(log):
+    server = StandInServer(seed=0).start()
+    try:
+        client = create_client(server.endpoint, 'benchmark', 'benchmark')
+        databases, storage = Databases(client), Storage(client)
+        databases.create('benchmark', 'benchmark')
+        databases.create_collection('benchmark', 'notes', 'Notes')
+        databases.create_string_attribute('benchmark', 'notes', 'body', 1000, False)
+        overflow = OverflowStore(client, {'Notes': {'body': {'threshold': 100, 'preview': 10}}})
+        writer = BulkWriter(databases, 'benchmark', concurrency=4, overflow=overflow)
+        table = OverflowNotes(databases, 'benchmark', overflow=overflow)
+        ids = [f"note{i}" for i in range(5)]
+        long_text = lambda version: f"version {version} " * 50
+        expected = []
+
+        def check(step, count):
+            files = storage.list_files(overflow.bucket_id)['total']
+            if files != count:
+                expected.append(f"overflow cleanup: {files} files in the bucket after {step}, expected {count}")
+
+        with contextlib.redirect_stdout(log):
+            writer.create_documents('Notes', 'notes', [{'$id': i, 'body': long_text(1)} for i in ids])
+            check('create', 5)
+            writer.update_documents('Notes', 'notes', [(i, {'body': long_text(2)}) for i in ids])
+            check('update', 5)
+            writer.upsert_documents('Notes', 'notes', [{'$id': i, 'body': long_text(3)} for i in ids], existing=True)
+            check('upsert', 5)
+            table.update(ids[0], {'body': long_text(4)})
+            check('table update', 5)
+            writer.delete_documents('Notes', 'notes', iter(ids[:3]))
+            check('delete', 2)
+            table.delete(ids[3])
+            check('table delete', 1)
+        return expected
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark every stage against a local Appwrite stand-in")
+    parser.add_argument('--suite', choices=sorted(SCENARIOS), default='quick', help="scenario set to run (default: quick)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds of latency added to every request (default: 0)")
+    parser.add_argument('--attribute-delay', type=float, default=0.1, help="seconds attributes stay 'processing' (default: 0.1)")
+    parser.add_argument('--output', help="write all results as JSON to this path")
+    parser.add_argument('--baseline', help="fail if request counts exceed this saved baseline")
+    parser.add_argument('--save-baseline', help="save request counts per scenario and stage to this path")
+    parser.add_argument('--log', default='bench_output.txt', help="where to write the stages' console output (default: bench_output.txt)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    scenarios = SCENARIOS[args.suite]
+    all_results = {}
+    with open(args.log, 'w') as log:
+        for scenario in scenarios:
+            all_results[scenario['name']] = run_scenario(scenario, args, log)
+            print_results(scenario['name'], all_results[scenario['name']])
+
+    failures = [f"{name} / {r['stage']}: exited with {r['exit_code']}"
+                for name, results in all_results.items() for r in results if r['exit_code'] != 0]
+    failures += check_scaling(scenarios, all_results)
+    with open(args.log, 'a') as log:
+        failures += check_overflow_cleanup(log)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += check_baseline(json.load(f), all_results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(all_results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({name: {r['stage']: r['requests'] for r in results} for name, results in all_results.items()}, f, indent=2)
+
+    if failures:
+        print("\nBenchmark failures:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll benchmarks passed.")
@@ -0,0 +1,243 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from appwrite.id import ID
+from appwrite.exception import AppwriteException
+from retry import AdaptiveLimit
+
+MAX_PRINTED_ERRORS = 10
+
+# Token bucket that spaces calls to at most `rate` per second (0/None = unlimited)
+class RateLimiter:
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(self._next, now) + 1.0 / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+class CollectionStats:
+    def __init__(self, collection_name, verb='created'):
+        self.collection_name = collection_name
+        self.verb = verb
+        self.succeeded = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.errors += 1
+            return self.errors
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def docs_per_sec(self):
+        return self.succeeded / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f"{self.collection_name}: {self.succeeded} {self.verb}, {self.errors} errors "
+                f"in {self.elapsed:.1f}s ({self.docs_per_sec:.0f} docs/s)")
+
+# Writes documents through a bounded worker pool. The input iterable is consumed
+# lazily so huge loads stay in constant memory. With `adaptive` (the default),
+# `concurrency` is only the ceiling: the number of requests in flight adapts to
+# how often the server throttles, converging on the highest rate it accepts.
+# Throttled and failed requests are retried by the client's retry policy.
+# With an OverflowStore, oversized values are uploaded by the same workers just
+# before their document is written.
+class BulkWriter:
+    def __init__(self, databases, database_id, concurrency=8, rate=None, adaptive=True, overflow=None):
+        self.databases = databases
+        self.database_id = database_id
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(rate)
+        self.adaptive = adaptive
+        self.overflow = overflow
+
+    # Run a write with the document's oversized values moved to storage,
+    # removing the uploaded files again if the write fails. `write` returns the
+    # pointers of the stored document it replaced; their files go once it succeeds.
+    def _with_overflow(self, collection_name, write, document_id, data):
+        if self.overflow is None:
+            write(document_id, data)
+            return
+        packed, pointers = self.overflow.pack(collection_name, data)
+        try:
+            replaced = write(document_id, packed)
+        except Exception:
+            self.overflow.discard(pointers)
+            raise
+        if replaced:
+            self.overflow.discard(replaced)
+
+    # Overflow pointers of the stored document that writing `data` replaces;
+    # with data=None, all of them
+    def _replaced(self, collection_name, collection_id, document_id, data=None):
+        if self.overflow is None:
+            return []
+        return self.overflow.replaced_pointers(self.databases, self.database_id, collection_id, collection_name,
+                                               document_id, data)
+
+    def _write(self, call, document_id, data, stats, on_error, on_success):
+        try:
+            self.limiter.acquire()
+            call(document_id, data)
+            stats.record(True)
+            if on_success:
+                on_success(document_id)
+        except Exception as e:
+            if on_error:
+                on_error({'$id': document_id, **data}, e)
+            errors = stats.record(False)
+            if errors <= MAX_PRINTED_ERRORS:
+                print(f"Error writing document {document_id} in {stats.collection_name}: {str(e)}")
+            elif errors == MAX_PRINTED_ERRORS + 1:
+                print(f"Further errors in {stats.collection_name} suppressed")
+
+    def _limit(self):
+        policy = getattr(self.databases.client, 'retry_policy', None)
+        if self.adaptive and policy:
+            return AdaptiveLimit(self.concurrency, throttled=lambda: policy.throttled)
+        return AdaptiveLimit(self.concurrency)
+
+    # Feed (document_id, data) pairs through the pool, keeping at most
+    # limit.limit of them in flight
+    def _run(self, call, items, stats, on_error, on_success=None):
+        limit = self._limit()
+
+        def run(document_id, data):
+            try:
+                self._write(call, document_id, data, stats, on_error, on_success)
+            finally:
+                limit.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for document_id, data in items:
+                limit.acquire()
+                pool.submit(run, document_id, data)
+        stats.finished = time.monotonic()
+        if limit.decreases:
+            print(f"{stats.collection_name}: server throttled {limit.decreases} times, "
+                  f"settled at {int(limit.limit)} concurrent requests")
+        return stats
+
+    # With `exists_ok`, a document whose ID already exists counts as created:
+    # resumed runs re-send the writes that were in flight when they stopped
+    def create_documents(self, collection_name, collection_id, documents, on_error=None, on_success=None, exists_ok=False):
+        def create(document_id, data):
+            data = dict(data)
+            self.databases.create_document(
+                database_id=self.database_id,
+                collection_id=collection_id,
+                document_id=document_id,
+                data=data,
+                permissions=data.pop('$permissions', None)
+            )
+
+        def call(document_id, data):
+            try:
+                self._with_overflow(collection_name, create, document_id, data)
+            except AppwriteException as e:
+                if not exists_ok or e.code != 409:
+                    raise
+
+        # Rows may carry their own document ID and permissions (imports, restores)
+        items = ((data.pop('$id', None) or ID.unique(), data) for data in documents)
+        stats = self._run(call, items, CollectionStats(collection_name), on_error, on_success)
+        print(f"Seeded {stats.summary()}")
+        return stats
+
+    def update_documents(self, collection_name, collection_id, updates, on_error=None, on_success=None):
+        def update(document_id, data):
+            replaced = self._replaced(collection_name, collection_id, document_id, data)
+            self.databases.update_document(
+                database_id=self.database_id,
+                collection_id=collection_id,
+                document_id=document_id,
+                data=data
+            )
+            return replaced
+
+        def call(document_id, data):
+            self._with_overflow(collection_name, update, document_id, data)
+
+        stats = self._run(call, updates, CollectionStats(collection_name, 'updated'), on_error, on_success)
+        print(f"Updated {stats.summary()}")
+        return stats
+
+    # Write documents whatever their state on the server: created when new,
+    # updated when their ID exists. `existing` says which to try first, so the
+    # common case costs one request and the other two.
+    def upsert_documents(self, collection_name, collection_id, documents, on_error=None, on_success=None, existing=False):
+        def create(document_id, data, permissions):
+            self.databases.create_document(
+                database_id=self.database_id,
+                collection_id=collection_id,
+                document_id=document_id,
+                data=data,
+                permissions=permissions
+            )
+
+        def update(document_id, data, permissions):
+            replaced = self._replaced(collection_name, collection_id, document_id, data)
+            self.databases.update_document(
+                database_id=self.database_id,
+                collection_id=collection_id,
+                document_id=document_id,
+                data=data,
+                permissions=permissions
+            )
+            return replaced
+
+        first, fallback, code = (update, create, 404) if existing else (create, update, 409)
+
+        def upsert(document_id, data):
+            data = dict(data)
+            permissions = data.pop('$permissions', None)
+            try:
+                return first(document_id, data, permissions)
+            except AppwriteException as e:
+                if e.code != code:
+                    raise
+                return fallback(document_id, data, permissions)
+
+        def call(document_id, data):
+            self._with_overflow(collection_name, upsert, document_id, data)
+
+        items = ((data.pop('$id'), data) for data in documents)
+        stats = self._run(call, items, CollectionStats(collection_name, 'written'), on_error, on_success)
+        print(f"Upserted {stats.summary()}")
+        return stats
+
+    # With an OverflowStore, the overflow files of each deleted document are
+    # deleted after it
+    def delete_documents(self, collection_name, collection_id, document_ids, on_error=None, on_success=None):
+        def call(document_id, data):
+            replaced = self._replaced(collection_name, collection_id, document_id)
+            try:
+                self.databases.delete_document(self.database_id, collection_id, document_id)
+            except AppwriteException as e:
+                # Already gone counts as deleted
+                if e.code != 404:
+                    raise
+            if replaced:
+                self.overflow.discard(replaced)
+
+        items = ((document_id, {}) for document_id in document_ids)
+        return self._run(call, items, CollectionStats(collection_name, 'deleted'), on_error, on_success)
@@ -0,0 +1,92 @@
+import threading
+from appwrite.query import Query
+
+PAGE_SIZE = 100
+
+# Walk every page of a list_* endpoint using cursorAfter pagination. The next
+# page is fetched before the current one is handed out, so the caller may
+# delete what it is given without invalidating the cursor.
+def paginate(list_fn, result_key, *args, queries=None, page_size=PAGE_SIZE):
+    def fetch(cursor):
+        page_queries = list(queries or []) + [Query.limit(page_size)]
+        if cursor:
+            page_queries.append(Query.cursor_after(cursor))
+        return list_fn(*args, queries=page_queries)[result_key]
+
+    page = fetch(None)
+    while page:
+        next_page = fetch(page[-1]['$id']) if len(page) == page_size else []
+        yield from page
+        page = next_page
+
+# Every document ID in a collection, one page at a time, without fetching the documents' bodies
+def iter_document_ids(databases, database_id, collection_id, page_size=PAGE_SIZE):
+    for document in paginate(databases.list_documents, 'documents', database_id, collection_id,
+                             queries=[Query.select(['$id'])], page_size=page_size):
+        yield document['$id']
+
+def list_document_ids(databases, database_id, collection_id, page_size=PAGE_SIZE):
+    return list(iter_document_ids(databases, database_id, collection_id, page_size))
+
+# Run-scoped view of the database schema: collections (with their attributes
+# and indexes) are fetched once and looked up by name until invalidated.
+class CollectionCatalog:
+    def __init__(self, databases, database_id):
+        self.databases = databases
+        self.database_id = database_id
+        self._collections = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        collections = {}
+        for collection in paginate(self.databases.list_collections, 'collections', self.database_id):
+            # Keep the first match, as the old linear scans did
+            collections.setdefault(collection['name'], collection)
+        self._collections = collections
+        return collections
+
+    @property
+    def collections(self):
+        with self._lock:
+            if self._collections is None:
+                self.load()
+            return self._collections
+
+    # Call after deleting collections (or any out-of-band change) so the next lookup refetches
+    def invalidate(self):
+        with self._lock:
+            self._collections = None
+
+    # Record a collection this run just created without refetching everything
+    def remember(self, collection):
+        with self._lock:
+            if self._collections is not None:
+                collection.setdefault('attributes', [])
+                collection.setdefault('indexes', [])
+                self._collections[collection['name']] = collection
+
+    def get_collection(self, collection_name):
+        try:
+            collection = self.collections.get(collection_name)
+        except Exception as e:
+            print(f"Error getting collection ID for '{collection_name}': {str(e)}")
+            return None
+        if not collection:
+            print(f"Collection '{collection_name}' not found")
+        return collection
+
+    def get_collection_id(self, collection_name):
+        collection = self.get_collection(collection_name)
+        return collection['$id'] if collection else None
+
+    def get_attributes(self, collection_name):
+        collection = self.get_collection(collection_name)
+        if not collection:
+            return {}
+        return {attr['key']: attr for attr in collection.get('attributes', [])}
+
+    def get_indexes(self, collection_name):
+        collection = self.get_collection(collection_name)
+        if not collection:
+            return {}
+        return {index['key']: index for index in collection.get('indexes', [])}
@@ -0,0 +1,118 @@
+import threading
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from async_databases import run_all
+
+# Runs a dependency graph of callables on a thread pool. `nodes` maps a node
+# name to (dependencies, fn). A node starts as soon as all of its dependencies
+# have succeeded; if one fails (raises or returns False), everything downstream
+# of it is skipped. Returns {name: {'status', 'started', 'elapsed'}}.
+def run_dag(nodes, max_workers=8):
+    for name, (deps, _) in nodes.items():
+        missing = [dep for dep in deps if dep not in nodes]
+        if missing:
+            raise ValueError(f"Node '{name}' depends on unknown nodes: {', '.join(missing)}")
+
+    origin = time.monotonic()
+    results = {}
+    lock = threading.Lock()
+    remaining = dict(nodes)
+
+    def run(name, fn):
+        started = time.monotonic()
+        try:
+            ok = fn() is not False
+        except Exception as e:
+            print(f"[{name}] Error: {str(e)}")
+            ok = False
+        with lock:
+            results[name] = {
+                'status': 'ok' if ok else 'failed',
+                'started': started - origin,
+                'elapsed': time.monotonic() - started,
+            }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = set()
+        while remaining or running:
+            # Rescan until stable so skips propagate through whole chains at once
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, (deps, fn) in list(remaining.items()):
+                    with lock:
+                        statuses = [results.get(dep, {}).get('status') for dep in deps]
+                    if any(status in ('failed', 'skipped') for status in statuses):
+                        with lock:
+                            results[name] = {'status': 'skipped', 'started': time.monotonic() - origin, 'elapsed': 0.0}
+                    elif all(status == 'ok' for status in statuses):
+                        running.add(pool.submit(run, name, fn))
+                    else:
+                        continue
+                    del remaining[name]
+                    progressed = True
+            if not running:
+                if remaining:
+                    raise ValueError(f"Dependency cycle between: {', '.join(remaining)}")
+                break
+            _, running = wait(running, return_when=FIRST_COMPLETED)
+    return results
+
+# run_dag on an event loop. A node's fn may be a coroutine function, which is
+# awaited, or a plain function, which runs on a worker thread. No worker limit
+# is needed: nodes waiting on the server hold no thread, and requests are capped
+# by the AsyncDatabases the coroutines use. Cancelling the run cancels every node.
+async def run_dag_async(nodes):
+    order = []
+    remaining = {name: set(deps) for name, (deps, _) in nodes.items()}
+    for name, deps in remaining.items():
+        missing = [dep for dep in deps if dep not in nodes]
+        if missing:
+            raise ValueError(f"Node '{name}' depends on unknown nodes: {', '.join(missing)}")
+    while remaining:
+        placed = set(order)
+        ready = [name for name, deps in remaining.items() if deps <= placed]
+        if not ready:
+            raise ValueError(f"Dependency cycle between: {', '.join(remaining)}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+
+    origin = time.monotonic()
+    results = {}
+    tasks = {}
+
+    async def run(name, deps, fn):
+        statuses = [await dep for dep in deps]
+        started = time.monotonic()
+        if any(status != 'ok' for status in statuses):
+            results[name] = {'status': 'skipped', 'started': started - origin, 'elapsed': 0.0}
+            return 'skipped'
+        try:
+            result = await fn() if asyncio.iscoroutinefunction(fn) else await asyncio.to_thread(fn)
+            ok = result is not False
+        except Exception as e:
+            print(f"[{name}] Error: {str(e)}")
+            ok = False
+        results[name] = {
+            'status': 'ok' if ok else 'failed',
+            'started': started - origin,
+            'elapsed': time.monotonic() - started,
+        }
+        return results[name]['status']
+
+    for name in order:
+        deps, fn = nodes[name]
+        tasks[name] = asyncio.ensure_future(run(name, [tasks[dep] for dep in deps], fn))
+    await run_all(tasks.values())
+    return results
+
+def print_timings(results, title="Timings"):
+    print(f"{title}:")
+    print(f"  {'node':<40} {'start':>8} {'elapsed':>8}  status")
+    for name, result in sorted(results.items(), key=lambda item: item[1]['started']):
+        print(f"  {name:<40} {result['started']:>7.2f}s {result['elapsed']:>7.2f}s  {result['status']}")
+    if results:
+        total = max(result['started'] + result['elapsed'] for result in results.values())
+        print(f"  {'total wall-clock':<40} {'':>8} {total:>7.2f}s")
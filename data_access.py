@@ -0,0 +1,180 @@
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from appwrite.id import ID
+from appwrite.query import Query
+from appwrite.exception import AppwriteException
+from catalog import CollectionCatalog, paginate, PAGE_SIZE
+
+# Runtime support for the record classes and tables written by generate_models.py
+
+def parse_datetime(value):
+    if value is None:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def format_datetime(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def to_float(value):
+    return None if value is None else float(value)
+
+# Related documents may come back expanded; records keep only their IDs
+def related_id(value):
+    if isinstance(value, dict):
+        return value.get('$id')
+    if isinstance(value, list):
+        return [item.get('$id') if isinstance(item, dict) else item for item in value]
+    return value
+
+# In-process read-through cache. A miss calls the loader and keeps its result
+# for `ttl` seconds; beyond `max_entries` the least recently used entry goes.
+# invalidate() drops everything, including results still being loaded, so a
+# read racing a write never puts the old value back.
+class ReadThroughCache:
+    def __init__(self, ttl=60.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        value = load()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+# One collection, read as records of the generated class. The collection is
+# looked up by name, so a table follows a migrate.py swap after a catalog
+# refresh. Tables whose class sets cache_ttl cache get/find/first results;
+# every write through the table invalidates its cache, and writes made
+# elsewhere show up once the TTL has passed. Cached records are shared between
+# callers and must not be modified.
+class Table:
+    collection_name = None
+    record = None
+    cache_ttl = None
+    cache_size = 256
+
+    def __init__(self, databases, database_id, catalog=None, cache=True, overflow=None):
+        self.databases = databases
+        self.database_id = database_id
+        self.catalog = catalog or CollectionCatalog(databases, database_id)
+        self.overflow = overflow
+        self.cache = ReadThroughCache(self.cache_ttl, self.cache_size) if cache and self.cache_ttl else None
+
+    @property
+    def collection_id(self):
+        collection_id = self.catalog.get_collection_id(self.collection_name)
+        if not collection_id:
+            raise LookupError(f"collection '{self.collection_name}' not found")
+        return collection_id
+
+    # With an OverflowStore, long values are downloaded before decoding
+    def decode(self, documents):
+        if self.overflow is not None:
+            self.overflow.expand(self.collection_name, documents)
+        return tuple(self.record.from_document(document) for document in documents)
+
+    def _cached(self, key, load):
+        return self.cache.get(key, load) if self.cache is not None else load()
+
+    def get(self, document_id):
+        def load():
+            try:
+                document = self.databases.get_document(self.database_id, self.collection_id, document_id)
+            except AppwriteException as e:
+                if e.code == 404:
+                    return None
+                raise
+            return self.decode([document])[0]
+        return self._cached(('get', document_id), load)
+
+    # One page of matching records, as a tuple
+    def find(self, *queries, limit=PAGE_SIZE):
+        def load():
+            documents = self.databases.list_documents(self.database_id, self.collection_id,
+                                                      queries=[*queries, Query.limit(limit)])['documents']
+            return self.decode(documents)
+        return self._cached(('find', queries, limit), load)
+
+    def first(self, *queries):
+        records = self.find(*queries, limit=1)
+        return records[0] if records else None
+
+    # Every matching record, fetched page by page and never cached
+    def scan(self, *queries, page_size=PAGE_SIZE):
+        for document in paginate(self.databases.list_documents, 'documents', self.database_id, self.collection_id,
+                                 queries=list(queries), page_size=page_size):
+            yield self.decode([document])[0]
+
+    # Overflow pointers of the stored document that writing `data` replaces;
+    # with data=None, all of them
+    def _replaced(self, document_id, data=None):
+        if self.overflow is None or document_id is None:
+            return []
+        return self.overflow.replaced_pointers(self.databases, self.database_id, self.collection_id,
+                                               self.collection_name, document_id, data)
+
+    # `document_id` is set when the write replaces an existing document
+    def _write(self, call, data, document_id=None):
+        data = data.to_data() if isinstance(data, self.record) else dict(data)
+        pointers = []
+        if self.overflow is not None:
+            data, pointers = self.overflow.pack(self.collection_name, data)
+        try:
+            replaced = self._replaced(document_id, data)
+            document = call(data)
+        except Exception:
+            if pointers:
+                self.overflow.discard(pointers)
+            raise
+        finally:
+            # Also after a failure: a timed-out write may still have been applied
+            self.invalidate()
+        if replaced:
+            self.overflow.discard(replaced)
+        return self.decode([document])[0]
+
+    def create(self, data, document_id=None, permissions=None):
+        return self._write(lambda data: self.databases.create_document(
+            self.database_id, self.collection_id, document_id or ID.unique(), data, permissions), data)
+
+    def update(self, document_id, data, permissions=None):
+        return self._write(lambda data: self.databases.update_document(
+            self.database_id, self.collection_id, document_id, data, permissions), data, document_id)
+
+    # The document's overflow files are deleted after it
+    def delete(self, document_id):
+        try:
+            replaced = self._replaced(document_id)
+            self.databases.delete_document(self.database_id, self.collection_id, document_id)
+        finally:
+            self.invalidate()
+        if replaced:
+            self.overflow.discard(replaced)
+
+    def invalidate(self):
+        if self.cache is not None:
+            self.cache.invalidate()
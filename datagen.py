@@ -0,0 +1,394 @@
+import math
+import zlib
+import random
+import bisect
+from datetime import datetime, timezone
+
+# NumPy is optional: with it, columns are drawn as vectorized batches; without
+# it, the same generators fall back to the standard library's random module.
+# Both are deterministic for a given seed, but they produce different data.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Text values are slices of one shared block of random words, so a value of
+# any length costs a single copy instead of word-by-word generation
+CORPUS_SIZE = 1 << 20
+
+WORDS = (
+    'the of and to in is for on with as by at from that this be are was it an or not but have has had '
+    'record note meeting summary project update review draft plan report team client product feature '
+    'design release issue customer data model prompt category setting transcript call interview '
+    'budget quarter roadmap launch market research analysis result action item follow decision '
+    'question answer idea feedback priority risk timeline owner status weekly daily monthly notes '
+    'audio video upload process output input brief detail overview context goal metric growth revenue '
+    'cost user account support service system platform mobile web api server database schema index '
+    'query cache performance latency error retry deploy build test quality security access policy '
+    'today tomorrow next last first final new old small large quick long short important urgent'
+).split()
+
+DEFAULT_ARRAY_ITEMS = (0, 5)
+DEFAULT_ARRAY_CARDINALITY = 200
+DEFAULT_DATETIME_DAYS = 365
+
+# Seeded runs end their date ranges here instead of at the current time, so the
+# same seed gives the same timestamps on any day
+SEEDED_DATETIME_END = '2025-01-01T00:00:00+00:00'
+DEFAULT_ZIPF_SKEW = 1.1
+
+# Text lengths are drawn from a precomputed table of this many samples
+LENGTH_TABLE_SIZE = 1 << 16
+
+# Array items (tags and the like) are short by default
+DEFAULT_ITEM_LENGTH = (12, 32)
+
+# Stable per-name seed, so adding an attribute or collection does not change
+# the values generated for the others
+def derive_seed(seed, name):
+    return (zlib.crc32(name.encode('utf-8')) ^ (seed or 0)) & 0xFFFFFFFF
+
+# Batches of random values as plain lists
+class PythonBackend:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def random(self, n):
+        r = self.rng.random
+        return [r() for _ in range(n)]
+
+    def integers(self, low, high, n):
+        r = self.rng.random
+        span = high - low + 1
+        return [low + int(r() * span) for _ in range(n)]
+
+    def uniform(self, low, high, n):
+        r = self.rng.random
+        span = high - low
+        return [low + r() * span for _ in range(n)]
+
+    def normal(self, mean, sd, n):
+        g = self.rng.gauss
+        return [g(mean, sd) for _ in range(n)]
+
+    def lognormal(self, mu, sigma, n):
+        g = self.rng.lognormvariate
+        return [g(mu, sigma) for _ in range(n)]
+
+    def exponential(self, scale, n):
+        e = self.rng.expovariate
+        return [e(1.0 / scale) for _ in range(n)]
+
+    def choose(self, population, cum_weights, n):
+        return self.rng.choices(population, cum_weights=cum_weights, k=n)
+
+    # Uniform draws, with replacement, from a list
+    def sample(self, population, n):
+        return self.rng.choices(population, k=n)
+
+class NumpyBackend:
+    def __init__(self, seed):
+        self.rng = numpy.random.default_rng(seed)
+
+    def random(self, n):
+        return self.rng.random(n).tolist()
+
+    def integers(self, low, high, n):
+        return self.rng.integers(low, high + 1, n).tolist()
+
+    def uniform(self, low, high, n):
+        return self.rng.uniform(low, high, n).tolist()
+
+    def normal(self, mean, sd, n):
+        return self.rng.normal(mean, sd, n).tolist()
+
+    def lognormal(self, mu, sigma, n):
+        return self.rng.lognormal(mu, sigma, n).tolist()
+
+    def exponential(self, scale, n):
+        return self.rng.exponential(scale, n).tolist()
+
+    def choose(self, population, cum_weights, n):
+        indexes = numpy.searchsorted(cum_weights, self.rng.random(n) * cum_weights[-1], side='right')
+        return [population[i] for i in indexes.tolist()]
+
+    def sample(self, population, n):
+        return [population[i] for i in self.rng.integers(0, len(population), n).tolist()]
+
+def make_backend(seed):
+    return NumpyBackend(seed) if numpy is not None else PythonBackend(seed)
+
+_corpora = {}
+
+# (text, word start offsets) built once per run seed and shared by every text
+# attribute; each attribute's own RNG only picks offsets and lengths from it
+def get_corpus(seed):
+    if seed not in _corpora:
+        rng = random.Random(seed)
+        text = ' '.join(rng.choices(WORDS, k=CORPUS_SIZE // 5))
+        starts = [0] + [i + 1 for i, char in enumerate(text) if char == ' ']
+        _corpora[seed] = (text, starts)
+    return _corpora[seed]
+
+def cumulative(weights):
+    total, result = 0.0, []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+# Sample from a fixed set of values, uniformly or Zipf-skewed (the first values
+# are the most common), or with explicit weights
+class Categorical:
+    def __init__(self, backend, values, frequency='uniform', skew=DEFAULT_ZIPF_SKEW, weights=None):
+        self.backend = backend
+        self.values = list(values)
+        if weights is None:
+            if frequency == 'zipf':
+                weights = [1.0 / (rank + 1) ** skew for rank in range(len(self.values))]
+            else:
+                weights = [1.0] * len(self.values)
+        self.cum_weights = cumulative(weights)
+        if numpy is not None:
+            self.cum_weights = numpy.asarray(self.cum_weights)
+
+    def sample(self, n):
+        return self.backend.choose(self.values, self.cum_weights, n)
+
+# Default median length for a string of the declared size: short fields get a
+# few words, 64 KB text fields get a couple of paragraphs
+def default_median_length(size):
+    return max(1, min(size // 8, 1500))
+
+def text_values(backend, run_seed, size, spec):
+    corpus, starts = get_corpus(run_seed)
+    max_length = min(spec.get('max_length', size), size, len(corpus) // 2)
+    min_length = min(spec.get('min_length', 1), max_length)
+    distribution = spec.get('length_distribution', 'lognormal')
+    median = spec.get('median_length', default_median_length(max_length))
+    # Offsets from the first half of the corpus, so every slice fits
+    offsets = starts[:bisect.bisect_right(starts, len(corpus) - max_length - 1)]
+
+    # Lengths are drawn once into a table and sampled from it per batch
+    if distribution == 'fixed':
+        lengths = [min(max(median, min_length), max_length)]
+    elif distribution == 'uniform':
+        lengths = backend.integers(min_length, max_length, LENGTH_TABLE_SIZE)
+    else:
+        mu = math.log(max(median, 1))
+        lengths = [min(max(int(x), min_length), max_length)
+                   for x in backend.lognormal(mu, spec.get('sigma', 0.75), LENGTH_TABLE_SIZE)]
+
+    # Values end on a word boundary; at least one whole word is always kept
+    def generate(n):
+        values = []
+        for start, length in zip(backend.sample(offsets, n), backend.sample(lengths, n)):
+            end = corpus.rfind(' ', start, start + length + 1)
+            if end <= start:
+                end = min(corpus.find(' ', start), start + max_length)
+            values.append(corpus[start:end])
+        return values
+    return generate
+
+def integer_values(backend, attr, spec):
+    low = spec.get('min', attr.get('min', 0))
+    high = spec.get('max', attr.get('max', 1000))
+    if spec.get('distribution') == 'normal':
+        mean = spec.get('mean', (low + high) / 2)
+        sd = spec.get('sd', (high - low) / 6 or 1)
+        return lambda n: [min(max(int(round(x)), low), high) for x in backend.normal(mean, sd, n)]
+    return lambda n: backend.integers(low, high, n)
+
+def float_values(backend, attr, spec):
+    low = spec.get('min', attr.get('min', 0.0))
+    high = spec.get('max', attr.get('max', 1000.0))
+    if spec.get('distribution') == 'normal':
+        mean = spec.get('mean', (low + high) / 2)
+        sd = spec.get('sd', (high - low) / 6 or 1.0)
+        return lambda n: [min(max(x, low), high) for x in backend.normal(mean, sd, n)]
+    return lambda n: backend.uniform(low, high, n)
+
+def boolean_values(backend, spec):
+    true_ratio = spec.get('true_ratio', 0.5)
+    return lambda n: [x < true_ratio for x in backend.random(n)]
+
+# ISO 8601 timestamps between `start` and `end` (default: the 365 days up to
+# now, or up to SEEDED_DATETIME_END when seeded). 'recent' skews towards `end`,
+# like upload dates.
+def datetime_values(backend, seed, spec):
+    if 'end' in spec:
+        end = parse_time(spec['end'])
+    elif seed is not None:
+        end = parse_time(SEEDED_DATETIME_END)
+    else:
+        end = datetime.now(timezone.utc).replace(microsecond=0)
+    if 'start' in spec:
+        span = (end - parse_time(spec['start'])).total_seconds()
+    else:
+        span = spec.get('days', DEFAULT_DATETIME_DAYS) * 86400.0
+    end_ts = end.timestamp()
+    if spec.get('distribution') == 'recent':
+        offsets = lambda n: [min(x, span) for x in backend.exponential(span / 4, n)]
+    else:
+        offsets = lambda n: backend.uniform(0, span, n)
+
+    if numpy is not None:
+        end_ms = numpy.datetime64(int(end_ts * 1000), 'ms')
+
+        def generate(n):
+            stamps = end_ms - (numpy.asarray(offsets(n)) * 1000).astype('timedelta64[ms]')
+            return numpy.datetime_as_string(stamps, unit='ms', timezone='UTC').tolist()
+        return generate
+    return lambda n: format_timestamps([end_ts - x for x in offsets(n)])
+
+# UTC ISO 8601 with milliseconds. Dates are formatted once per day and cached,
+# which is several times faster than a datetime object per value.
+def format_timestamps(timestamps):
+    days = {}
+    values = []
+    for ts in timestamps:
+        ms = int(ts * 1000)
+        day, ms_of_day = divmod(ms, 86400000)
+        date = days.get(day)
+        if date is None:
+            date = days[day] = datetime.fromtimestamp(day * 86400, timezone.utc).strftime('%Y-%m-%d')
+        seconds, millis = divmod(ms_of_day, 1000)
+        minutes, second = divmod(seconds, 60)
+        hour, minute = divmod(minutes, 60)
+        values.append(f"{date}T{hour:02d}:{minute:02d}:{second:02d}.{millis:03d}+00:00")
+    return values
+
+def parse_time(text):
+    value = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def formatted_values(backend, attr_type, spec):
+    numbers = lambda n: backend.integers(0, spec.get('cardinality', 10 ** 9), n)
+    if attr_type == 'email':
+        return lambda n: [f"user{i}@example.com" for i in numbers(n)]
+    if attr_type == 'url':
+        return lambda n: [f"https://example.com/item/{i}" for i in numbers(n)]
+    return lambda n: [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in numbers(n)]
+
+# Batch generator for one scalar attribute: fresh values, or draws from a
+# vocabulary of `cardinality` values when set
+def scalar_values(backend, seed, attr, spec, run_seed=None):
+    attr_type = attr['type']
+    if attr_type == 'enum':
+        return Categorical(backend, attr['elements'], spec.get('frequency', 'uniform'),
+                           spec.get('skew', DEFAULT_ZIPF_SKEW), spec.get('weights')).sample
+    if attr_type == 'string':
+        generate = text_values(backend, run_seed, attr.get('size', 255), spec)
+    elif attr_type == 'integer':
+        generate = integer_values(backend, attr, spec)
+    elif attr_type == 'float':
+        generate = float_values(backend, attr, spec)
+    elif attr_type == 'boolean':
+        return boolean_values(backend, spec)
+    elif attr_type == 'datetime':
+        generate = datetime_values(backend, seed, spec)
+    elif attr_type in ('email', 'url', 'ip'):
+        generate = formatted_values(backend, attr_type, spec)
+    else:
+        raise ValueError(f"Unsupported attribute type: {attr_type}")
+    cardinality = spec.get('cardinality')
+    if cardinality and attr_type not in ('email', 'url', 'ip'):
+        vocabulary = list(dict.fromkeys(generate(cardinality)))
+        return Categorical(backend, vocabulary, spec.get('frequency', 'uniform'), spec.get('skew', DEFAULT_ZIPF_SKEW)).sample
+    return generate
+
+# Batch generator for one attribute, including arrays and nulls
+def compile_attribute(attr, spec, seed, run_seed=None):
+    backend = make_backend(seed)
+    if attr.get('array'):
+        # Array items come from a limited, Zipf-skewed vocabulary by default,
+        # like tags: a few are everywhere, most are rare
+        spec = {'cardinality': DEFAULT_ARRAY_CARDINALITY, 'frequency': 'zipf', 'median_length': DEFAULT_ITEM_LENGTH[0],
+                'max_length': min(attr.get('size', 255), DEFAULT_ITEM_LENGTH[1]), **spec}
+    generate = scalar_values(backend, seed, attr, spec, run_seed)
+
+    if attr.get('array'):
+        min_items = spec.get('min_items', DEFAULT_ARRAY_ITEMS[0])
+        max_items = spec.get('max_items', DEFAULT_ARRAY_ITEMS[1])
+        scalar = generate
+
+        def generate(n):
+            counts = backend.integers(min_items, max_items, n)
+            items = scalar(sum(counts))
+            result, position = [], 0
+            for count in counts:
+                result.append(items[position:position + count])
+                position += count
+            return result
+
+    null_ratio = 0.0 if attr.get('required') else spec.get('null_ratio', 0.0)
+    if null_ratio:
+        values = generate
+
+        def generate(n):
+            return [None if roll < null_ratio else value for roll, value in zip(backend.random(n), values(n))]
+    return generate
+
+# A collection's attributes compiled once into column generators. batch(n)
+# returns {key: [n values]}; documents() turns batches into row dicts.
+# Generation hints come from each attribute's optional "sample" object in the
+# data model, overridden by `profile` ({key: {...}}):
+#   all types:     null_ratio (optional attributes only), cardinality,
+#                  frequency ('uniform' or 'zipf'), skew
+#   string:        min_length, max_length, median_length, sigma,
+#                  length_distribution ('lognormal', 'uniform' or 'fixed')
+#   integer/float: min, max, distribution ('uniform' or 'normal'), mean, sd
+#   boolean:       true_ratio
+#   datetime:      start, end, days, distribution ('uniform' or 'recent')
+#   enum:          weights
+#   arrays:        min_items, max_items
+class CollectionGenerator:
+    def __init__(self, collection, seed=None, profile=None):
+        self.name = collection['name']
+        profile = profile or {}
+        self.columns = {}
+        self.nullable = False
+        for attr in collection['attributes']:
+            if attr['type'] == 'relationship':
+                continue
+            spec = {**attr.get('sample', {}), **profile.get(attr['key'], {})}
+            attr_seed = derive_seed(seed, f"{self.name}.{attr['key']}") if seed is not None else None
+            self.columns[attr['key']] = compile_attribute(attr, spec, attr_seed, seed)
+            if not attr.get('required') and spec.get('null_ratio'):
+                self.nullable = True
+
+    def batch(self, n):
+        return {key: generate(n) for key, generate in self.columns.items()}
+
+    def documents(self, count, pickers=None, batch_size=DEFAULT_BATCH_SIZE):
+        pickers = pickers or {}
+        keys = list(self.columns)
+        if not keys:
+            # Collections with only relationships still get their documents
+            for _ in range(count):
+                yield {key: picker.pick() for key, picker in pickers.items()}
+            return
+        remaining = count
+        while remaining > 0:
+            n = min(batch_size, remaining)
+            remaining -= n
+            columns = self.batch(n)
+            for values in zip(*(columns[key] for key in keys)):
+                if self.nullable:
+                    data = {key: value for key, value in zip(keys, values) if value is not None}
+                else:
+                    data = dict(zip(keys, values))
+                for key, picker in pickers.items():
+                    data[key] = picker.pick()
+                yield data
+
+# Compile every collection in the data model. profile maps collection name ->
+# attribute key -> hints.
+def compile_data_model(data_model, seed=None, profile=None):
+    profile = profile or {}
+    return {
+        collection['name']: CollectionGenerator(collection, seed, profile.get(collection['name']))
+        for collection in data_model['collections']
+    }
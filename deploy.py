@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+from dotenv import load_dotenv
+from appwrite.services.databases import Databases
+from appwrite.exception import AppwriteException
+from catalog import CollectionCatalog, list_document_ids
+from reconcile import Reconciler
+from fingerprint import STAGES, load_state
+from bulk_writer import BulkWriter
+from sample_data import seed_documents, seeding_order, RelationshipPicker
+from datagen import compile_data_model
+from overflow import overflow_store
+from journal import open_journal
+from dag import run_dag_async, print_timings
+from async_databases import AsyncDatabases
+from appwrite_client import get_client
+
+# Which graph node applies each kind of planned change
+NODE_FOR_ACTION = {
+    'create_collection': 'collection',
+    'create_attribute': 'attributes',
+    'update_attribute': 'attributes',
+    'delete_attribute': 'attributes',
+    'unsupported': 'attributes',
+    'create_relationship': 'relationships',
+    'delete_index': 'indexes',
+    'create_index': 'indexes',
+    'update_permissions': 'permissions',
+    'delete_collection': 'prune',
+}
+
+# Load environment variables
+load_dotenv()
+
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
+
+# Initialize the database service
+databases = Databases(client)
+
+# Use the database ID from environment variables
+DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
+
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
+
+def load_data_model():
+    with open('_dataModel.json', 'r') as f:
+        return json.load(f)
+
+def ensure_database():
+    try:
+        database = databases.create(database_id=DATABASE_ID, name=os.getenv('APPWRITE_DATABASE_NAME'))
+        print(f"Database created: {database['name']}")
+    except AppwriteException as e:
+        if e.code != 409:
+            raise
+        print(f"Database {DATABASE_ID} already exists")
+
+# Stages 1-7 as one dependency graph. The plan is computed once from a single
+# read of the live schema; every per-collection node then applies its share of it.
+# With a SchemaState, unchanged stages are left out of the plan and each node
+# records its stage once it has succeeded. Schema nodes are coroutines on `adb`,
+# so a node waiting for Appwrite to build attributes holds no thread.
+def build_graph(data_model, reconciler, adb, prune=False, seed=0, writer=None, generators=None, schema_state=None, journal=None):
+    state = {'plan': []}
+
+    def plan():
+        state['plan'] = reconciler.plan(data_model, prune=prune, state=schema_state)
+        reconciler.print_plan(state['plan'])
+
+    def apply(node, collection=None):
+        async def run():
+            items = [item for item in state['plan']
+                     if NODE_FOR_ACTION[item['action']] == node
+                     and (collection is None or item['collection'] == collection['name'])]
+            if items and not await reconciler.apply_async(items, adb):
+                return False
+            if schema_state is not None and collection is not None and node in STAGES:
+                reconciler.record(schema_state, [collection], [node], items)
+            return True
+        return run
+
+    async def prune_collections():
+        if not await apply('prune')():
+            return False
+        if schema_state is not None:
+            for item in state['plan']:
+                if item['action'] == 'delete_collection':
+                    schema_state.forget(item['collection'])
+        return True
+
+    _, deferred = seeding_order(data_model)
+
+    def seed_collection(collection):
+        def run():
+            collection_id = catalog.get_collection_id(collection['name'])
+            if not collection_id:
+                print(f"Failed to seed {collection['name']}: Collection not found")
+                return False
+            # Related collections were seeded by upstream nodes; draw their IDs at create time
+            pickers = {}
+            for attr in collection['attributes']:
+                if attr['type'] != 'relationship':
+                    continue
+                if (collection['name'], attr['key']) in deferred:
+                    print(f"Skipping {collection['name']}.{attr['key']}: cyclic relationships are seeded by 7_seed_data.py")
+                    continue
+                related_id = catalog.get_collection_id(attr['related_collection'])
+                if not related_id:
+                    print(f"Failed to seed {collection['name']}: related collection '{attr['related_collection']}' not found")
+                    return False
+                pickers[attr['key']] = RelationshipPicker(attr, list_document_ids(databases, DATABASE_ID, related_id))
+            stats = seed_documents(writer, collection, collection_id, seed, pickers, (generators or {}).get(collection['name']),
+                                   journal)
+            return stats.errors == 0
+        return run
+
+    nodes = {
+        'database': ([], ensure_database),
+        'plan': (['database'], plan),
+    }
+    for collection in data_model['collections']:
+        name = collection['name']
+        related = {attr['related_collection'] for attr in collection['attributes'] if attr['type'] == 'relationship'}
+        nodes[f'collection:{name}'] = (['plan'], apply('collection', collection))
+        nodes[f'attributes:{name}'] = ([f'collection:{name}'], apply('attributes', collection))
+        # Permissions only need the collection, so they run alongside attributes and indexes
+        nodes[f'permissions:{name}'] = ([f'collection:{name}'], apply('permissions', collection))
+        nodes[f'indexes:{name}'] = ([f'attributes:{name}'], apply('indexes', collection))
+        nodes[f'relationships:{name}'] = (
+            [f'attributes:{name}'] + [f'collection:{other}' for other in sorted(related)],
+            apply('relationships', collection)
+        )
+        if seed:
+            seeded_first = sorted(attr['related_collection'] for attr in collection['attributes']
+                                  if attr['type'] == 'relationship' and (name, attr['key']) not in deferred)
+            nodes[f'seed:{name}'] = (
+                [f'attributes:{name}', f'relationships:{name}'] + [f'seed:{other}' for other in seeded_first],
+                seed_collection(collection)
+            )
+    if prune:
+        nodes['prune'] = ([name for name in nodes if name not in ('database', 'plan')], prune_collections)
+    return nodes
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Deploy _dataModel.json in one process, running independent steps in parallel")
+    parser.add_argument('--prune', action='store_true', help="also delete collections, attributes and indexes missing from the data model")
+    parser.add_argument('--workers', type=int, default=8, help="schema requests in flight at once (default: 8)")
+    parser.add_argument('--seed', type=int, default=0, help="sample documents to create per collection after deploying (default: 0)")
+    parser.add_argument('--concurrency', type=int, default=32, help="maximum parallel create_document calls when seeding (default: 32)")
+    parser.add_argument('--fixed-concurrency', action='store_true', help="always run --concurrency calls instead of adapting to throttling")
+    parser.add_argument('--rate', type=float, default=0, help="target documents/sec per collection when seeding, 0 for unlimited (default: 0)")
+    parser.add_argument('--random-seed', type=int, help="seed for reproducible sample data")
+    parser.add_argument('--profile', help="JSON file of per-attribute generation hints for seeding: {collection: {attribute: {...}}}")
+    parser.add_argument('--resume', action='store_true', help="with --seed, continue the seeding of an interrupted deploy")
+    parser.add_argument('--refresh', action='store_true', help="compare every stage with the live schema, even those unchanged since the last deploy")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    data_model = load_data_model()
+    reconciler = Reconciler(databases, DATABASE_ID, catalog)
+    writer = BulkWriter(databases, DATABASE_ID, concurrency=args.concurrency, rate=args.rate, adaptive=not args.fixed_concurrency,
+                        overflow=overflow_store(client, data_model))
+    profile = None
+    if args.profile:
+        with open(args.profile, 'r') as f:
+            profile = json.load(f)
+    # Compiling the generators builds their text corpora, so only do it when seeding
+    generators = compile_data_model(data_model, args.random_seed, profile) if args.seed else None
+    schema_state = load_state(DATABASE_ID, refresh=args.refresh)
+    journal = None
+    if args.seed:
+        try:
+            journal = open_journal('deploy-seed', DATABASE_ID, {'count': args.seed}, args.resume)
+        except (OSError, ValueError) as e:
+            print(f"Error opening journal: {str(e)}")
+            sys.exit(1)
+    adb = AsyncDatabases(databases, limit=args.workers)
+    graph = build_graph(data_model, reconciler, adb, prune=args.prune, seed=args.seed, writer=writer,
+                        generators=generators, schema_state=schema_state, journal=journal)
+    try:
+        results = asyncio.run(run_dag_async(graph))
+    finally:
+        adb.close()
+    if schema_state is not None:
+        schema_state.save()
+    if journal is not None:
+        journal.close()
+    print_timings(results)
+    client.print_pool_stats()
+    failed = [name for name, result in results.items() if result['status'] != 'ok']
+    if failed:
+        print(f"Deploy finished with failures: {', '.join(failed)}")
+        raise SystemExit(1)
+    print("Deploy completed.")
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from appwrite.services.databases import Databases
+from catalog import CollectionCatalog, paginate, PAGE_SIZE
+from snapshot import ShardWriter, write_manifest, default_compression, prefetch, DEFAULT_SHARD_SIZE
+from overflow import overflow_store
+from appwrite_client import get_client
+
+# Load environment variables
+load_dotenv()
+
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
+
+# Initialize the database service
+databases = Databases(client)
+
+# Use the database ID from environment variables
+DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
+
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
+
+def load_data_model():
+    with open('_dataModel.json', 'r') as f:
+        return json.load(f)
+
+# Every document, regrouped into pages of `page_size` so a page's overflow
+# values download together
+def iter_pages(collection_id, page_size=PAGE_SIZE):
+    documents = paginate(databases.list_documents, 'documents', DATABASE_ID, collection_id, page_size=page_size)
+    while page := list(itertools.islice(documents, page_size)):
+        yield page
+
+# Keep the document's ID, permissions and the attributes the model defines.
+# Related documents may come back expanded; only their IDs are kept.
+def export_document(document, attributes):
+    data = {'$id': document['$id'], '$permissions': document.get('$permissions', [])}
+    for attr in attributes:
+        if attr['key'] not in document:
+            continue
+        value = document[attr['key']]
+        if attr['type'] == 'relationship':
+            if isinstance(value, dict):
+                value = value.get('$id')
+            elif isinstance(value, list):
+                value = [item.get('$id') if isinstance(item, dict) else item for item in value]
+        data[attr['key']] = value
+    return data
+
+def export_collection(collection, directory, compression, shard_size, page_size, overflow=None):
+    name = collection['name']
+    collection_id = catalog.get_collection_id(name)
+    if not collection_id:
+        print(f"Failed to export {name}: Collection not found")
+        return name, None
+    started = time.monotonic()
+    writer = ShardWriter(directory, name, compression, shard_size)
+    try:
+        # The next page is fetched while the current one is compressed and written
+        for page in prefetch(iter_pages(collection_id, page_size)):
+            # Snapshots hold full values; overflowed ones are downloaded back into the page
+            if overflow is not None:
+                overflow.expand(name, page)
+            for document in page:
+                writer.write(export_document(document, collection['attributes']))
+    except Exception as e:
+        print(f"Error exporting {name}: {str(e)}")
+        writer.close()
+        return name, None
+    result = writer.close()
+    elapsed = time.monotonic() - started
+    size = sum(shard['bytes'] for shard in result['shards'])
+    print(f"Exported {name}: {result['count']} documents in {len(result['shards'])} shards, "
+          f"{size / 1048576:.1f} MB in {elapsed:.1f}s")
+    return name, {'collection_id': collection_id, **result}
+
+def export_data(directory, workers=4, compression=None, shard_size=DEFAULT_SHARD_SIZE, page_size=PAGE_SIZE):
+    data_model = load_data_model()
+    compression = compression or default_compression()
+    os.makedirs(directory, exist_ok=True)
+    overflow = overflow_store(client, data_model)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            lambda collection: export_collection(collection, directory, compression, shard_size, page_size, overflow),
+            data_model['collections']
+        ))
+    failed = [name for name, result in results if result is None]
+    collections = {name: result for name, result in results if result is not None}
+    write_manifest(directory, DATABASE_ID, data_model, collections, compression)
+    return failed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export every collection in _dataModel.json to compressed NDJSON shards")
+    parser.add_argument('directory', help="where to write the shards and manifest.json")
+    parser.add_argument('--workers', type=int, default=4, help="collections exported in parallel (default: 4)")
+    parser.add_argument('--compression', choices=['zstd', 'gzip'], help="shard compression (default: zstd if installed, else gzip)")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE // 1048576, help="uncompressed MB per shard (default: 256)")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help=f"documents fetched per request (default: {PAGE_SIZE})")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.compression == 'zstd' and default_compression() != 'zstd':
+        raise SystemExit("zstd compression needs the zstandard package")
+    print(f"Exporting to {args.directory}...")
+    failed = export_data(args.directory, args.workers, args.compression, args.shard_size * 1048576, args.page_size)
+    client.print_pool_stats()
+    if failed:
+        print(f"Export finished with failures: {', '.join(failed)}")
+        raise SystemExit(1)
+    print("Export completed.")
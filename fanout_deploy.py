@@ -0,0 +1,151 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Settings each target needs, and the environment variable deploy.py reads them from
+TARGET_ENV = {
+    'endpoint': 'APPWRITE_ENDPOINT',
+    'project_id': 'APPWRITE_PROJECT_ID',
+    'api_key': 'APPWRITE_API_KEY',
+    'database_id': 'APPWRITE_DATABASE_ID',
+    'database_name': 'APPWRITE_DATABASE_NAME',
+}
+
+# Targets file: {"defaults": {...}, "targets": [{"name": ..., "project_id": ..., ...}]}.
+# Each target is merged over the defaults. Instead of putting a key in the file,
+# "api_key_env" may name an environment variable that holds it.
+def load_targets(path, only=None):
+    with open(path, 'r') as f:
+        config = json.load(f)
+    defaults = config.get('defaults', {})
+    targets = []
+    for i, entry in enumerate(config['targets']):
+        target = {**defaults, **entry}
+        target.setdefault('name', target.get('project_id') or f"target-{i}")
+        if 'api_key_env' in target and 'api_key' not in entry:
+            target['api_key'] = os.getenv(target['api_key_env'])
+        if only and target['name'] not in only:
+            continue
+        missing = [field for field in TARGET_ENV if not target.get(field) and field != 'database_name']
+        if missing:
+            raise ValueError(f"Target '{target['name']}' is missing {', '.join(missing)}")
+        targets.append(target)
+    names = [target['name'] for target in targets]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate target names: {', '.join(duplicates)}")
+    files = [log_name(name) for name in names]
+    clashes = sorted({name for name, file in zip(names, files) if files.count(file) > 1})
+    if clashes:
+        raise ValueError(f"Target names share a log file name: {', '.join(clashes)}")
+    return targets
+
+# Target names are free text; log files get a name that is safe as a path
+def log_name(name):
+    return re.sub(r'[^\w.-]', '_', name).lstrip('.') or '_'
+
+# The target settings come from the targets file alone. Every one of them is
+# set, so neither this process's environment nor deploy.py's own load_dotenv()
+# can fill one in from .env.
+def target_env(target, concurrency, metrics_path):
+    env = {**os.environ, 'PYTHONPATH': SCRIPT_DIR, 'PYTHONUNBUFFERED': '1'}
+    for field, variable in TARGET_ENV.items():
+        env[variable] = str(target.get(field) or '')
+    env['APPWRITE_DATABASE_NAME'] = str(target.get('database_name') or target['database_id'])
+    # The connection pool blocks at this size, which caps the requests in flight per target
+    env['APPWRITE_POOL_SIZE'] = str(concurrency)
+    env['APPWRITE_METRICS_JSON'] = metrics_path
+    env.pop('APPWRITE_METRICS_PROM', None)
+    return env
+
+# Deploy one target in its own process, so a crash, hang or bad key only
+# affects that target. Output goes to <log_dir>/<name>.log, with characters
+# other than letters, digits, '.', '-' and '_' in the name replaced by '_'.
+def deploy_target(target, deploy_args, concurrency, log_dir, timeout):
+    name = target['name']
+    log_path = os.path.join(log_dir, f"{log_name(name)}.log")
+    metrics_path = os.path.join(log_dir, f"{log_name(name)}.metrics.json")
+    command = [sys.executable, os.path.join(SCRIPT_DIR, 'deploy.py'), '--workers', str(concurrency)] + deploy_args
+    started = time.monotonic()
+    with open(log_path, 'w') as log:
+        try:
+            process = subprocess.run(command, env=target_env(target, concurrency, metrics_path), stdout=log,
+                                     stderr=subprocess.STDOUT, timeout=timeout, cwd=os.getcwd())
+            status = 'ok' if process.returncode == 0 else f"failed ({process.returncode})"
+        except subprocess.TimeoutExpired:
+            status = 'timeout'
+        except Exception as e:
+            log.write(f"Error starting deploy: {str(e)}\n")
+            status = 'error'
+    result = {'target': name, 'status': status, 'elapsed': round(time.monotonic() - started, 2), 'log': log_path,
+              'requests': None, 'retries': None, 'errors': None}
+    try:
+        with open(metrics_path, 'r') as f:
+            endpoints = json.load(f)['endpoints'].values()
+        result['requests'] = sum(stats['calls'] for stats in endpoints)
+        result['retries'] = sum(stats['retries'] for stats in endpoints)
+        result['errors'] = sum(stats['errors'] for stats in endpoints)
+    except (OSError, ValueError, KeyError):
+        pass
+    print(f"[{name}] {status} in {result['elapsed']:.1f}s")
+    return result
+
+def print_report(results, elapsed):
+    print(f"\n{'target':<30} {'status':<12} {'elapsed':>8} {'requests':>9} {'retries':>8} {'errors':>7}")
+    for r in sorted(results, key=lambda r: (r['status'] == 'ok', r['target'])):
+        print(f"{r['target']:<30} {r['status']:<12} {r['elapsed']:>7.1f}s {r['requests'] if r['requests'] is not None else '-':>9} "
+              f"{r['retries'] if r['retries'] is not None else '-':>8} {r['errors'] if r['errors'] is not None else '-':>7}")
+    failed = [r for r in results if r['status'] != 'ok']
+    print(f"\n{len(results) - len(failed)} of {len(results)} targets deployed in {elapsed:.1f}s")
+    for r in failed:
+        print(f"  {r['target']}: {r['status']}, see {r['log']}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Deploy _dataModel.json to every target in a targets file concurrently",
+        epilog="Arguments after -- are passed to deploy.py, e.g. -- --prune --seed 10"
+    )
+    parser.add_argument('targets', help="JSON targets file")
+    parser.add_argument('--parallel', type=int, default=16, help="targets deployed at the same time (default: 16)")
+    parser.add_argument('--target-concurrency', type=int, default=4,
+                        help="maximum concurrent requests per target (default: 4)")
+    parser.add_argument('--only', nargs='+', help="deploy only these target names")
+    parser.add_argument('--timeout', type=float, default=1800, help="seconds before a target's deploy is stopped (default: 1800)")
+    parser.add_argument('--log-dir', default='deploy-logs', help="per-target logs and metrics (default: deploy-logs)")
+    parser.add_argument('--report', help="write the per-target results as JSON to this path")
+    argv = sys.argv[1:]
+    split = argv.index('--') if '--' in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    args.deploy_args = argv[split + 1:]
+    return args
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = parse_args()
+    try:
+        targets = load_targets(args.targets, args.only)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading targets: {str(e)}")
+        sys.exit(2)
+    os.makedirs(args.log_dir, exist_ok=True)
+    print(f"Deploying to {len(targets)} targets, {args.parallel} at a time...")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as pool:
+        results = list(pool.map(
+            lambda target: deploy_target(target, args.deploy_args, args.target_concurrency, args.log_dir, args.timeout),
+            targets
+        ))
+    elapsed = time.monotonic() - started
+    print_report(results, elapsed)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'elapsed': round(elapsed, 2), 'targets': results}, f, indent=2)
+    sys.exit(1 if any(r['status'] != 'ok' for r in results) else 0)
@@ -0,0 +1,101 @@
+import os
+import json
+import hashlib
+import threading
+
+# fcntl is POSIX-only; without it concurrent runs sharing a state file may drop each other's updates
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STATE_FILE = '.appwrite-state.json'
+
+# Each stage owns one part of a collection's definition in _dataModel.json
+STAGES = ('collection', 'attributes', 'relationships', 'indexes', 'permissions')
+
+def stage_part(stage, collection):
+    if stage == 'collection':
+        return {'name': collection['name']}
+    if stage == 'attributes':
+        return [attr for attr in collection['attributes'] if attr['type'] != 'relationship']
+    if stage == 'relationships':
+        return [attr for attr in collection['attributes'] if attr['type'] == 'relationship']
+    if stage == 'indexes':
+        return collection.get('indexes', [])
+    if stage == 'permissions':
+        return collection.get('permissions')
+    raise ValueError(f"Unknown stage: {stage}")
+
+def stage_hash(stage, collection):
+    canonical = json.dumps(stage_part(stage, collection), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+# Hashes of the parts of the data model last applied to each collection, kept
+# in a local JSON file per endpoint/project/database. A stage whose hash still
+# matches, on the same collection ID, is skipped. Changes made outside these
+# scripts are not seen until a run with the state ignored (--refresh).
+class SchemaState:
+    def __init__(self, path, scope, refresh=False):
+        self.path = path
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._entries = {} if refresh else self._read().get(scope, {})
+        self._changed = set()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def is_current(self, collection, stage, collection_id):
+        with self._lock:
+            entry = self._entries.get(collection['name'])
+        return bool(entry) and entry.get('$id') == collection_id and entry.get(stage) == stage_hash(stage, collection)
+
+    def record(self, collection, stages, collection_id):
+        hashes = {stage: stage_hash(stage, collection) for stage in stages}
+        with self._lock:
+            entry = self._entries.get(collection['name'])
+            if not entry or entry.get('$id') != collection_id:
+                entry = self._entries[collection['name']] = {'$id': collection_id}
+            entry.update(hashes)
+            self._changed.add(collection['name'])
+
+    def forget(self, collection_name):
+        with self._lock:
+            if self._entries.pop(collection_name, None) is not None:
+                self._changed.add(collection_name)
+
+    # Merge this run's changes into the file as it is now, so runs against
+    # other databases (or other collections) that share the file keep theirs
+    def save(self):
+        with self._lock:
+            if not self._changed:
+                return
+            with open(self.path + '.lock', 'w') as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                state = self._read()
+                entries = state.setdefault(self.scope, {})
+                for name in self._changed:
+                    if name in self._entries:
+                        entries[name] = self._entries[name]
+                    else:
+                        entries.pop(name, None)
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, 'w') as f:
+                    json.dump(state, f, indent=2, sort_keys=True)
+                os.replace(temporary, self.path)
+            self._changed.clear()
+
+# The state for the database in the environment, or None when disabled.
+# APPWRITE_STATE_FILE moves the file; set it to an empty string to turn skipping off.
+def load_state(database_id, refresh=False):
+    path = os.getenv('APPWRITE_STATE_FILE', STATE_FILE)
+    if not path:
+        return None
+    scope = f"{os.getenv('APPWRITE_ENDPOINT')}|{os.getenv('APPWRITE_PROJECT_ID')}|{database_id}"
+    return SchemaState(path, scope, refresh)
@@ -0,0 +1,234 @@
+import re
+import sys
+import json
+import keyword
+import argparse
+
+# Names every record has besides its attributes
+RECORD_FIELDS = ('id', 'created_at', 'updated_at', 'permissions')
+RESERVED = set(RECORD_FIELDS) | {'from_document', 'to_data'}
+
+PYTHON_TYPES = {
+    'string': 'str', 'email': 'str', 'url': 'str', 'ip': 'str',
+    'integer': 'int', 'float': 'float', 'boolean': 'bool', 'datetime': 'datetime',
+}
+
+# Attribute types with a range helper instead of an equality one
+RANGE_TYPES = ('integer', 'float', 'datetime')
+
+def load_data_model(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+# categoryName -> category_name, AssemblyAI -> assembly_ai
+def snake_case(name):
+    name = re.sub(r'(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])', '_', name)
+    name = re.sub(r'\W', '_', name).lower()
+    if not name or name[0].isdigit():
+        name = '_' + name
+    return name + '_' if keyword.iskeyword(name) else name
+
+# Categories -> Category, Settings -> Setting, Record -> Record
+def class_name(collection_name):
+    name = re.sub(r'\W', '', collection_name)
+    if name.endswith('ies'):
+        name = name[:-3] + 'y'
+    elif name.endswith('s') and not name.endswith('ss'):
+        name = name[:-1]
+    return name[:1].upper() + name[1:]
+
+def field_names(collection):
+    names = {}
+    for attr in collection['attributes']:
+        name = snake_case(attr['key'])
+        while name in RESERVED or name in names.values():
+            name += '_'
+        names[attr['key']] = name
+    return names
+
+def annotation(attr):
+    if attr['type'] == 'enum':
+        base = f"Literal[{', '.join(repr(element) for element in attr['elements'])}]"
+    elif attr['type'] == 'relationship':
+        many = attr.get('relationship_type') in ('oneToMany', 'manyToMany')
+        base = 'List[str]' if many else 'str'
+    else:
+        base = PYTHON_TYPES.get(attr['type'], 'Any')
+    if attr.get('array'):
+        base = f"List[{base}]"
+    return base if attr.get('required') else f"Optional[{base}]"
+
+# Expression turning the raw value of `attr` (read with get) into the record's value
+def decoder(attr):
+    raw = f"get({attr['key']!r})"
+    convert = {'datetime': 'parse_datetime', 'float': 'to_float', 'relationship': 'related_id'}.get(attr['type'])
+    if not convert:
+        return raw
+    if attr.get('array') and attr['type'] != 'relationship':
+        return f"[{convert}(item) for item in {raw} or ()]"
+    return f"{convert}({raw})"
+
+def encoder(attr, name):
+    if attr['type'] != 'datetime':
+        return f"self.{name}"
+    if attr.get('array'):
+        return f"[format_datetime(item) for item in self.{name}] if self.{name} is not None else None"
+    return f"format_datetime(self.{name})"
+
+def record_class(collection, names):
+    cls = class_name(collection['name'])
+    attributes = collection['attributes']
+    slots = ', '.join(repr(name) for name in (*RECORD_FIELDS, *names.values()))
+    lines = [
+        f"class {cls}:",
+        f"    __slots__ = ({slots})",
+        "",
+        "    id: str",
+        "    created_at: Optional[datetime]",
+        "    updated_at: Optional[datetime]",
+        "    permissions: List[str]",
+    ]
+    lines += [f"    {names[attr['key']]}: {annotation(attr)}" for attr in attributes]
+    lines += [
+        "",
+        "    @classmethod",
+        "    def from_document(cls, document):",
+        "        self = cls.__new__(cls)",
+        "        get = document.get",
+        "        self.id = document['$id']",
+        "        self.created_at = parse_datetime(get('$createdAt'))",
+        "        self.updated_at = parse_datetime(get('$updatedAt'))",
+        "        self.permissions = get('$permissions') or []",
+    ]
+    lines += [f"        self.{names[attr['key']]} = {decoder(attr)}" for attr in attributes]
+    lines += [
+        "        return self",
+        "",
+        "    def to_data(self):",
+        "        return {",
+    ]
+    lines += [f"            {attr['key']!r}: {encoder(attr, names[attr['key']])}," for attr in attributes]
+    lines += [
+        "        }",
+        "",
+        "    def __repr__(self):",
+        f"        return f\"{cls}(id={{self.id!r}})\"",
+    ]
+    return lines
+
+# One helper per declared index: equality lookups for key and unique indexes,
+# ranges for single numeric or datetime keys, and search for fulltext indexes
+def index_helpers(collection, names):
+    attributes = {attr['key']: attr for attr in collection['attributes']}
+    lines = []
+    for index in collection.get('indexes', []):
+        keys = [key for key in index['attributes'] if key in attributes]
+        if len(keys) != len(index['attributes']):
+            continue
+        fields = [names[key] for key in keys]
+        suffix = '_and_'.join(fields)
+        params = ', '.join(fields)
+        lines.append("")
+        if index['type'] == 'fulltext':
+            lines += [
+                f"    def search_{suffix}(self, {params}, limit=PAGE_SIZE):",
+                f"        return self.find(Query.search({keys[0]!r}, {fields[0]}), limit=limit)",
+            ]
+            continue
+        attr = attributes[keys[0]]
+        if len(keys) == 1 and attr['type'] in RANGE_TYPES and not attr.get('array'):
+            field = fields[0]
+            lines += [
+                f"    def {field}_between(self, start=None, end=None, limit=PAGE_SIZE, descending=False):",
+                f"        queries = [Query.order_desc({keys[0]!r}) if descending else Query.order_asc({keys[0]!r})]",
+                "        if start is not None:",
+                f"            queries.append(Query.greater_than_equal({keys[0]!r}, format_datetime(start)))",
+                "        if end is not None:",
+                f"            queries.append(Query.less_than_equal({keys[0]!r}, format_datetime(end)))",
+                "        return self.find(*queries, limit=limit)",
+            ]
+            continue
+        queries = ', '.join(
+            f"Query.contains({key!r}, {field})" if attributes[key].get('array')
+            else f"Query.equal({key!r}, format_datetime({field}))" if attributes[key]['type'] == 'datetime'
+            else f"Query.equal({key!r}, {field})"
+            for key, field in zip(keys, fields))
+        if index['type'] == 'unique':
+            lines += [
+                f"    def get_by_{suffix}(self, {params}):",
+                f"        return self.first({queries})",
+            ]
+        else:
+            lines += [
+                f"    def by_{suffix}(self, {params}, limit=PAGE_SIZE):",
+                f"        return self.find({queries}, limit=limit)",
+                "",
+                f"    def first_by_{suffix}(self, {params}):",
+                f"        return self.first({queries})",
+            ]
+    return lines
+
+def table_class(collection, names):
+    cls = class_name(collection['name'])
+    cache = collection.get('cache') or {}
+    lines = [
+        f"class {collection['name']}Table(Table):",
+        f"    collection_name = {collection['name']!r}",
+        f"    record = {cls}",
+    ]
+    if cache:
+        lines.append(f"    cache_ttl = {cache.get('ttl', 60)!r}")
+        lines.append(f"    cache_size = {cache.get('max_entries', 256)!r}")
+    return lines + index_helpers(collection, names)
+
+def generate(data_model, model_path):
+    collections = data_model['collections']
+    lines = [
+        f"# Generated by generate_models.py from {model_path}. Rerun the generator after",
+        "# changing the data model instead of editing this file.",
+        "from datetime import datetime",
+        "from typing import Any, List, Literal, Optional",
+        "from appwrite.query import Query",
+        "from catalog import CollectionCatalog, PAGE_SIZE",
+        "from data_access import Table, parse_datetime, format_datetime, to_float, related_id",
+    ]
+    for collection in collections:
+        names = field_names(collection)
+        lines += ["", ""] + record_class(collection, names)
+        lines += ["", ""] + table_class(collection, names)
+    lines += [
+        "",
+        "",
+        "# Every table of the data model, sharing one collection catalog",
+        "class Tables:",
+        "    def __init__(self, databases, database_id, cache=True, overflow=None):",
+        "        self.catalog = CollectionCatalog(databases, database_id)",
+    ]
+    lines += [f"        self.{snake_case(collection['name'])} = {collection['name']}Table(databases, database_id, "
+              f"self.catalog, cache, overflow)" for collection in collections]
+    lines += [
+        "",
+        "    def invalidate(self):",
+        "        self.catalog.invalidate()",
+    ]
+    lines += [f"        self.{snake_case(collection['name'])}.invalidate()" for collection in collections]
+    return '\n'.join(lines) + '\n'
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate typed record classes and tables for the collections in _dataModel.json")
+    parser.add_argument('--model', default='_dataModel.json', help="data model to read (default: _dataModel.json)")
+    parser.add_argument('--output', default='appwrite_models.py', help="module to write (default: appwrite_models.py)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        data_model = load_data_model(args.model)
+        source = generate(data_model, args.model)
+        compile(source, args.output, 'exec')
+        with open(args.output, 'w') as f:
+            f.write(source)
+    except Exception as e:
+        print(f"Error generating {args.output}: {str(e)}")
+        sys.exit(1)
+    print(f"Wrote {len(data_model['collections'])} record classes and tables to {args.output}")
@@ -0,0 +1,182 @@
+import csv
+import gzip
+import json
+import threading
+from datetime import datetime
+from overflow import overflow_settings
+
+TRUE_VALUES = {'true', '1', 'yes', 'y', 't'}
+FALSE_VALUES = {'false', '0', 'no', 'n', 'f'}
+
+# Separator for array values in CSV cells (JSON lists are accepted too)
+CSV_ARRAY_SEPARATOR = '|'
+
+class RowError(ValueError):
+    pass
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+# Yield (line_number, row) pairs one at a time from an NDJSON or CSV file
+def read_rows(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    with open_text(path) as f:
+        if name.endswith('.csv'):
+            # Data starts on line 2, after the header
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, RowError(f"invalid JSON: {e.msg}")
+
+def coerce_scalar(value, attr):
+    attr_type = attr['type']
+    if attr_type == 'integer':
+        if isinstance(value, bool):
+            raise RowError(f"'{attr['key']}' must be an integer")
+        if isinstance(value, float) and not value.is_integer():
+            raise RowError(f"'{attr['key']}' must be an integer")
+        return int(value)
+    if attr_type == 'float':
+        return float(value)
+    if attr_type == 'boolean':
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+        raise RowError(f"'{attr['key']}' must be a boolean")
+    if attr_type == 'datetime':
+        text = str(value).strip()
+        # Appwrite accepts ISO 8601; fromisoformat needs 'Z' spelled as an offset
+        datetime.fromisoformat(text.replace('Z', '+00:00'))
+        return text
+    return value if isinstance(value, str) else str(value)
+
+def coerce_value(value, attr):
+    if attr.get('array'):
+        if isinstance(value, str):
+            text = value.strip()
+            if text.startswith('['):
+                value = json.loads(text)
+            else:
+                value = [item for item in text.split(CSV_ARRAY_SEPARATOR) if item] if text else []
+        if not isinstance(value, list):
+            raise RowError(f"'{attr['key']}' must be a list")
+        return [coerce_scalar(item, attr) for item in value]
+    return coerce_scalar(value, attr)
+
+def check_value(value, attr):
+    values = value if attr.get('array') else [value]
+    for item in values:
+        # Overflow attributes have no length limit; long values go to storage
+        if attr['type'] == 'string' and len(item) > attr.get('size', 255) and not overflow_settings(attr):
+            raise RowError(f"'{attr['key']}' is longer than {attr.get('size', 255)} characters")
+        if attr['type'] == 'enum' and item not in attr['elements']:
+            raise RowError(f"'{attr['key']}' must be one of {attr['elements']}")
+
+# Turn a raw row into document data matching the collection's attribute types.
+# Columns the model doesn't know about (including exported $-metadata other than
+# $id) are dropped; empty CSV cells count as missing.
+def coerce_row(row, attributes):
+    if not isinstance(row, dict):
+        raise RowError("row is not an object")
+    data = {}
+    if row.get('$id'):
+        data['$id'] = str(row['$id'])
+    for attr in attributes:
+        if attr['type'] == 'relationship':
+            continue
+        value = row.get(attr['key'])
+        if value is None or value == '':
+            if attr.get('required'):
+                raise RowError(f"'{attr['key']}' is required")
+            continue
+        try:
+            value = coerce_value(value, attr)
+        except RowError:
+            raise
+        except (TypeError, ValueError) as e:
+            raise RowError(f"'{attr['key']}': {str(e)}")
+        check_value(value, attr)
+        data[attr['key']] = value
+    return data
+
+# Append-only NDJSON file of rows that could not be loaded, with the reason
+class RejectFile:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, line_number, row, error):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps({'line': line_number, 'error': str(error), 'row': row}, default=str) + '\n')
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+# Lazily parse, coerce and validate a file. Valid documents are yielded; bad rows
+# go to the reject file, so memory use does not depend on the file size.
+# With a BatchProgress, rows in batches an earlier run finished are skipped and
+# rows without an $id get one that is stable across runs.
+def iter_documents(path, collection, rejects, progress=None):
+    for line_number, row in read_rows(path):
+        if progress is not None and not progress.is_pending(line_number):
+            continue
+        if isinstance(row, RowError):
+            rejects.write(line_number, None, row)
+            if progress is not None:
+                progress.skip(f"line:{line_number}", line_number)
+            continue
+        try:
+            data = coerce_row(row, collection['attributes'])
+        except RowError as e:
+            rejects.write(line_number, row, e)
+            if progress is not None:
+                progress.skip(f"line:{line_number}", line_number)
+            continue
+        yield data if progress is None else progress.assign(line_number, data)
+
+# Rows the server refuses are rejected too, and count as handled: a resumed run
+# does not send them again. With `resume`, rows that already exist count as created.
+def import_file(path, collection, collection_id, writer, reject_path, progress=None, resume=False):
+    rejects = RejectFile(reject_path)
+
+    def on_error(data, error):
+        rejects.write(None, data, error)
+        if progress is not None:
+            progress.done(data['$id'])
+
+    try:
+        stats = writer.create_documents(
+            collection['name'],
+            collection_id,
+            iter_documents(path, collection, rejects, progress),
+            on_error=on_error,
+            on_success=progress.done if progress else None,
+            exists_ok=resume
+        )
+        if progress is not None:
+            progress.finish()
+    finally:
+        rejects.close()
+    if rejects.count:
+        print(f"{rejects.count} rows rejected; see {reject_path}")
+    return stats
@@ -0,0 +1,211 @@
+import os
+import json
+import hashlib
+import time
+import uuid
+import threading
+
+JOURNAL_DIR = '.appwrite-journal'
+
+# Items per journaled batch: a resumed run redoes at most the unfinished
+# batches, so this bounds the work repeated after a crash
+BATCH_SIZE = 1000
+
+# Append-only NDJSON log of the work a bulk job has completed. The first line
+# holds the job's run ID and options; every following line records one finished
+# batch or step. Records are buffered and written with an fsync every
+# `sync_every` records or `sync_interval` seconds, and on close. A crash loses
+# at most the unsynced tail, which a resumed run simply does again: every
+# journaled operation is safe to repeat.
+class Journal:
+    def __init__(self, path, job, params, resume=False, sync_every=100, sync_interval=1.0):
+        self.path = path
+        self.job = job
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._last_sync = time.monotonic()
+        self._batches = {}
+        self._finished = {}
+        header = self._load(params) if resume else None
+        if header:
+            self.run = header['run']
+            done = sum(len(batches) for batches in self._batches.values())
+            print(f"Resuming {job} run {self.run}: {done} batches and {len(self._finished)} steps already done")
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            if resume:
+                print(f"No journal to resume at {path}; starting from the beginning")
+            self.run = uuid.uuid4().hex[:8]
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._file = open(path, 'w', encoding='utf-8')
+            self._write([{'job': job, 'run': self.run, 'params': params, 'started': time.time()}])
+
+    # Read an existing journal, dropping a line torn by a crash mid-write
+    def _load(self, params):
+        try:
+            with open(self.path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+        valid = content.rfind(b'\n') + 1
+        lines = content[:valid].decode('utf-8').splitlines()
+        if not lines:
+            return None
+        header = json.loads(lines[0])
+        if header.get('params') != params:
+            raise ValueError(f"{self.path} was written by a run with different options ({header.get('params')}); "
+                             f"rerun without --resume to start over")
+        for line in lines[1:]:
+            record = json.loads(line)
+            key = (record['collection'], record['op'])
+            if 'batch' in record:
+                self._batches.setdefault(key, set()).add(record['batch'])
+            else:
+                self._finished[key] = record
+        if valid < len(content):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid)
+        return header
+
+    def _write(self, records):
+        self._file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def append(self, record):
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._write(self._buffer)
+                self._buffer = []
+
+    def flush(self):
+        with self._lock:
+            if self._buffer:
+                self._write(self._buffer)
+                self._buffer = []
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._file.close()
+
+    def completed_batches(self, collection, op):
+        return set(self._batches.get((collection, op), ()))
+
+    def record_batch(self, collection, op, batch):
+        self.append({'collection': collection, 'op': op, 'batch': batch})
+
+    # A step recorded with finish() is skipped entirely by a resumed run
+    def is_finished(self, collection, op):
+        return (collection, op) in self._finished
+
+    def finish(self, collection, op, **details):
+        self._finished[(collection, op)] = details
+        self.append({'collection': collection, 'op': op, 'finished': True, **details})
+
+    # Document IDs are derived from the run and the item's position, so a
+    # resumed run re-sends the same IDs and never creates duplicates
+    def document_id(self, index):
+        return f"{self.run}{index:012x}"
+
+# Tracks which items of one collection's numbered stream have been written and
+# journals every BATCH_SIZE consecutive items once all of them have. Items are
+# registered in stream order with assign()/start() and reported with done().
+# A batch with a failed item is not journaled, so a resumed run retries it.
+class BatchProgress:
+    def __init__(self, journal, collection, op, batch_size=BATCH_SIZE):
+        self.journal = journal
+        self.collection = collection
+        self.op = op
+        self.batch_size = batch_size
+        self.completed = journal.completed_batches(collection, op)
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._seen = {}
+        self._done = {}
+        self._current = -1
+
+    def is_pending(self, index):
+        return index // self.batch_size not in self.completed
+
+    # How many of the first `total` items are still to do
+    def remaining(self, total):
+        done = sum(min(self.batch_size, total - batch * self.batch_size) for batch in self.completed
+                   if batch * self.batch_size < total)
+        return total - done
+
+    def pending(self, total):
+        for batch in range((total + self.batch_size - 1) // self.batch_size):
+            if batch not in self.completed:
+                yield from range(batch * self.batch_size, min((batch + 1) * self.batch_size, total))
+
+    def start(self, key, index):
+        batch = index // self.batch_size
+        with self._lock:
+            self._keys[key] = index
+            self._seen[batch] = self._seen.get(batch, 0) + 1
+            if batch > self._current:
+                self._current = batch
+                for earlier in [b for b in self._seen if b < batch]:
+                    self._check(earlier)
+
+    # Register a document, giving it a stable ID unless it carries its own
+    def assign(self, index, data):
+        data.setdefault('$id', self.journal.document_id(index))
+        self.start(data['$id'], index)
+        return data
+
+    # Documents for the pending positions of a stream of `total`
+    def track(self, documents, total):
+        for index, data in zip(self.pending(total), documents):
+            yield self.assign(index, data)
+
+    # An item that needs no write (e.g. a row rejected before sending)
+    def skip(self, key, index):
+        self.start(key, index)
+        self.done(key)
+
+    def done(self, key):
+        with self._lock:
+            index = self._keys.pop(key, None)
+            if index is None:
+                return
+            batch = index // self.batch_size
+            self._done[batch] = self._done.get(batch, 0) + 1
+            if batch < self._current:
+                self._check(batch)
+
+    # Call once the stream has ended and every write has returned
+    def finish(self):
+        with self._lock:
+            self._current += 1
+            for batch in list(self._seen):
+                self._check(batch)
+        self.journal.flush()
+
+    def _check(self, batch):
+        if self._done.get(batch, 0) == self._seen[batch]:
+            del self._seen[batch]
+            self._done.pop(batch, None)
+            self.completed.add(batch)
+            self.journal.record_batch(self.collection, self.op, batch)
+
+# The journal for a bulk job against the database in the environment, or None
+# when journaling is off. APPWRITE_JOURNAL_DIR moves the directory; set it to
+# an empty string to turn journaling off. Raises ValueError when resuming a
+# journal written with different options.
+def open_journal(job, database_id, params, resume=False):
+    directory = os.getenv('APPWRITE_JOURNAL_DIR', JOURNAL_DIR)
+    if not directory:
+        if resume:
+            print("Journaling is off (APPWRITE_JOURNAL_DIR is empty); --resume has nothing to resume")
+        return None
+    scope = {'endpoint': os.getenv('APPWRITE_ENDPOINT'), 'project': os.getenv('APPWRITE_PROJECT_ID'), 'database': database_id}
+    # The same database ID is common across projects and servers, so the file
+    # is named after the whole scope
+    digest = hashlib.sha256(json.dumps(scope, sort_keys=True).encode()).hexdigest()[:12]
+    return Journal(os.path.join(directory, f"{job}-{database_id}-{digest}.ndjson"), job, {**scope, **params}, resume)
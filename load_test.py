@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from dotenv import load_dotenv
+from appwrite.services.databases import Databases
+from catalog import CollectionCatalog, paginate
+from metrics import percentile
+from plan_indexes import load_workload
+from appwrite_client import get_client
+
+# Load environment variables
+load_dotenv()
+
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
+
+# Initialize the database service
+databases = Databases(client)
+
+# Use the database ID from environment variables
+DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
+
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
+
+# Query values written as "{sample}" are filled in per request from documents
+# sampled at the start, so every request asks for something that exists
+PLACEHOLDER = '{sample}'
+
+def load_data_model():
+    with open('_dataModel.json', 'r') as f:
+        return json.load(f)
+
+def sample_documents(collection_id, size):
+    documents = []
+    for document in paginate(databases.list_documents, 'documents', DATABASE_ID, collection_id):
+        documents.append(document)
+        if len(documents) >= size:
+            break
+    return documents
+
+def sample_value(attribute, method, samples, rng):
+    values = [document[attribute] for document in samples if document.get(attribute) not in (None, [], '')]
+    if not values:
+        return None
+    value = rng.choice(values)
+    if isinstance(value, list):
+        value = rng.choice(value)
+    if method == 'search' and isinstance(value, str):
+        value = rng.choice(value.split() or [value])
+    return value
+
+# A copy of the query with its placeholders filled in
+def resolve(query, samples, rng):
+    if query['method'] in ('and', 'or'):
+        return {**query, 'values': [resolve(inner, samples, rng) for inner in query['values']]}
+    values = query.get('values')
+    if not values or PLACEHOLDER not in values:
+        return query
+    values = [sample_value(query['attribute'], query['method'], samples, rng) if value == PLACEHOLDER else value
+              for value in values]
+    if query['method'] == 'between':
+        values = sorted(values, key=lambda value: (value is None, value))
+    return {**query, 'values': values}
+
+def encode(query):
+    return json.dumps(query, separators=(',', ':'))
+
+# Run one scenario's queries from `concurrency` threads for `duration` seconds
+# after a `warmup` whose requests are not counted
+def run_scenario(collection_id, entry, samples, concurrency, duration, warmup, seed):
+    lock = threading.Lock()
+    latencies, returned = [], []
+    errors = [0]
+    started = time.monotonic()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    def worker(index):
+        rng = random.Random(f"{seed}:{entry['name']}:{index}")
+        local_latencies, local_returned, local_errors = [], [], 0
+        while True:
+            queries = [encode(resolve(query, samples, rng)) for query in entry['queries']]
+            request_started = time.monotonic()
+            if request_started >= deadline:
+                break
+            try:
+                response = databases.list_documents(DATABASE_ID, collection_id, queries=queries)
+                ok = True
+            except Exception as e:
+                ok = False
+                if local_errors == 0:
+                    print(f"  {entry['name']}: {str(e)}")
+            finished = time.monotonic()
+            if request_started < measure_from:
+                continue
+            if ok:
+                local_latencies.append(finished - request_started)
+                local_returned.append(len(response['documents']))
+            else:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            returned.extend(local_returned)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(time.monotonic() - measure_from, 1e-9)
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed,
+        'mean_ms': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p95_ms': 1000 * percentile(latencies, 0.95),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'documents': sum(returned) / len(returned) if returned else 0.0,
+    }
+
+def load_test(workload, concurrency=8, duration=10.0, warmup=1.0, sample_size=200, only=None, seed=0):
+    data_model = load_data_model()
+    names = {collection['name'] for collection in data_model['collections']}
+    results = []
+    for collection_name, entries in workload.items():
+        if collection_name not in names:
+            print(f"Skipping {collection_name}: not in _dataModel.json")
+            continue
+        collection_id = catalog.get_collection_id(collection_name)
+        if not collection_id:
+            continue
+        samples = sample_documents(collection_id, sample_size)
+        if not samples:
+            print(f"Warning: {collection_name} is empty; seed it first for meaningful numbers")
+        for entry in entries:
+            if only and entry['name'] not in only:
+                continue
+            print(f"Running {collection_name}: {entry['name']} ({concurrency} concurrent, {duration:.0f}s)...")
+            result = run_scenario(collection_id, entry, samples, concurrency, duration, warmup, seed)
+            results.append({'collection': collection_name, 'scenario': entry['name'], **result})
+    return results
+
+def print_results(results, baseline=None):
+    previous = {(r['collection'], r['scenario']): r for r in (baseline or [])}
+    print(f"\n{'scenario':<45} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'docs':>6} {'errors':>6}")
+    for r in results:
+        print(f"{r['collection'] + ': ' + r['scenario']:<45} {r['throughput']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['documents']:>6.1f} {r['errors']:>6}")
+        before = previous.get((r['collection'], r['scenario']))
+        if before:
+            print(f"{'  vs baseline':<45} {change(before['throughput'], r['throughput']):>8} "
+                  f"{change(before['p50_ms'], r['p50_ms']):>8} {change(before['p95_ms'], r['p95_ms']):>8} "
+                  f"{change(before['p99_ms'], r['p99_ms']):>8}")
+
+def change(before, after):
+    if not before:
+        return '-'
+    return f"{100 * (after - before) / before:+.0f}%"
+
+# Scenarios whose p99 latency grew by more than `tolerance` (0.2 = 20%) over the baseline
+def regressions(results, baseline, tolerance):
+    previous = {(r['collection'], r['scenario']): r for r in baseline}
+    slower = []
+    for r in results:
+        before = previous.get((r['collection'], r['scenario']))
+        if before and before['p99_ms'] and r['p99_ms'] > before['p99_ms'] * (1 + tolerance):
+            slower.append(f"{r['collection']}: {r['scenario']} p99 {before['p99_ms']:.1f} -> {r['p99_ms']:.1f} ms")
+    return slower
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure read throughput and latency of the queries in a workload file")
+    parser.add_argument('workload', help="JSON file of queries per collection, as for plan_indexes.py; \"{sample}\" values are filled from live documents")
+    parser.add_argument('--concurrency', type=int, default=8, help="requests in flight per scenario (default: 8)")
+    parser.add_argument('--duration', type=float, default=10, help="measured seconds per scenario (default: 10)")
+    parser.add_argument('--warmup', type=float, default=1, help="unmeasured seconds before each scenario (default: 1)")
+    parser.add_argument('--sample-size', type=int, default=200, help="documents sampled per collection for \"{sample}\" values (default: 200)")
+    parser.add_argument('--only', nargs='+', help="run only the scenarios with these names")
+    parser.add_argument('--random-seed', type=int, default=0, help="seed for the sampled query values (default: 0)")
+    parser.add_argument('--output', help="write the results as JSON to this path")
+    parser.add_argument('--compare', help="results JSON of an earlier run to compare against")
+    parser.add_argument('--max-regression', type=float,
+                        help="with --compare, exit nonzero if any p99 is this fraction slower (e.g. 0.2 for 20%%)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+    results = load_test(load_workload(args.workload), args.concurrency, args.duration, args.warmup,
+                        args.sample_size, args.only, args.random_seed)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'concurrency': args.concurrency, 'duration': args.duration, 'results': results}, f, indent=2)
+    client.print_pool_stats()
+    if baseline and args.max_regression is not None:
+        slower = regressions(results, baseline, args.max_regression)
+        if slower:
+            print("Slower than the baseline:")
+            for line in slower:
+                print(f"  {line}")
+            sys.exit(1)
@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import random
+import threading
+
+# Latency buckets (seconds) for the Prometheus histogram
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# Latency samples kept per endpoint/collection for percentiles; beyond this a
+# uniform reservoir sample is kept so memory stays flat on long imports
+MAX_SAMPLES = 10000
+
+ATTRIBUTE_TYPES = {'boolean', 'datetime', 'email', 'enum', 'float', 'integer', 'ip', 'relationship', 'string', 'url'}
+
+# Path segment that is followed by an ID, and the placeholder used for it
+ID_SEGMENTS = {
+    'databases': '{databaseId}',
+    'collections': '{collectionId}',
+    'documents': '{documentId}',
+    'indexes': '{key}',
+    'attributes': '{key}',
+    'buckets': '{bucketId}',
+    'files': '{fileId}',
+}
+
+COLLECTION_PATH = '/databases/{databaseId}/collections/{collectionId}'
+
+# SDK service method behind each request, keyed by HTTP method and path template
+ENDPOINTS = {
+    ('GET', '/databases'): 'list',
+    ('POST', '/databases'): 'create',
+    ('GET', '/databases/{databaseId}'): 'get',
+    ('PUT', '/databases/{databaseId}'): 'update',
+    ('DELETE', '/databases/{databaseId}'): 'delete',
+    ('GET', '/databases/{databaseId}/collections'): 'list_collections',
+    ('POST', '/databases/{databaseId}/collections'): 'create_collection',
+    ('GET', COLLECTION_PATH): 'get_collection',
+    ('PUT', COLLECTION_PATH): 'update_collection',
+    ('DELETE', COLLECTION_PATH): 'delete_collection',
+    ('GET', COLLECTION_PATH + '/attributes'): 'list_attributes',
+    ('GET', COLLECTION_PATH + '/attributes/{key}'): 'get_attribute',
+    ('DELETE', COLLECTION_PATH + '/attributes/{key}'): 'delete_attribute',
+    ('PATCH', COLLECTION_PATH + '/attributes/{key}/relationship'): 'update_relationship_attribute',
+    ('GET', COLLECTION_PATH + '/documents'): 'list_documents',
+    ('POST', COLLECTION_PATH + '/documents'): 'create_document',
+    ('GET', COLLECTION_PATH + '/documents/{documentId}'): 'get_document',
+    ('PATCH', COLLECTION_PATH + '/documents/{documentId}'): 'update_document',
+    ('DELETE', COLLECTION_PATH + '/documents/{documentId}'): 'delete_document',
+    ('GET', COLLECTION_PATH + '/indexes'): 'list_indexes',
+    ('POST', COLLECTION_PATH + '/indexes'): 'create_index',
+    ('GET', COLLECTION_PATH + '/indexes/{key}'): 'get_index',
+    ('DELETE', COLLECTION_PATH + '/indexes/{key}'): 'delete_index',
+    # Storage, for overflow attributes
+    ('POST', '/storage/buckets'): 'create_bucket',
+    ('PUT', '/storage/buckets/{bucketId}'): 'update_bucket',
+    ('GET', '/storage/buckets/{bucketId}/files'): 'list_files',
+    ('POST', '/storage/buckets/{bucketId}/files'): 'create_file',
+    ('GET', '/storage/buckets/{bucketId}/files/{fileId}/download'): 'get_file_download',
+    ('DELETE', '/storage/buckets/{bucketId}/files/{fileId}'): 'delete_file',
+}
+for attribute_type in ATTRIBUTE_TYPES:
+    ENDPOINTS[('POST', f'{COLLECTION_PATH}/attributes/{attribute_type}')] = f'create_{attribute_type}_attribute'
+    if attribute_type != 'relationship':
+        ENDPOINTS[('PATCH', f'{COLLECTION_PATH}/attributes/{attribute_type}/{{key}}')] = f'update_{attribute_type}_attribute'
+
+# Responses that describe collections
+COLLECTION_ENDPOINTS = {'list_collections', 'create_collection', 'get_collection', 'update_collection'}
+
+# Turn a request path into its template, e.g.
+# /databases/main/collections/6f1c.../documents/abc -> /databases/{databaseId}/collections/{collectionId}/documents/{documentId}
+# Attribute creates and updates carry the attribute type in the path, which is
+# kept so each typed call is counted separately.
+def path_template(method, path):
+    parts = path.strip('/').split('/')
+    template = []
+    for i, part in enumerate(parts):
+        previous = parts[i - 1] if i else None
+        if previous == 'attributes' and method in ('POST', 'PATCH') and part in ATTRIBUTE_TYPES:
+            template.append(part)
+        elif i >= 2 and parts[i - 2] == 'attributes' and previous in ATTRIBUTE_TYPES and method == 'PATCH':
+            template.append('{key}')
+        elif previous in ID_SEGMENTS:
+            template.append(ID_SEGMENTS[previous])
+        else:
+            template.append(part)
+    return '/' + '/'.join(template)
+
+def endpoint_name(method, path):
+    method = method.upper()
+    template = path_template(method, path)
+    return ENDPOINTS.get((method, template), f'{method} {template}')
+
+# The collection a request targets, if any
+def collection_from_path(path):
+    parts = path.strip('/').split('/')
+    if 'collections' in parts:
+        i = parts.index('collections')
+        if i + 1 < len(parts):
+            return parts[i + 1]
+    return ''
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+class EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_time = 0.0
+        self.status_codes = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.samples = []
+
+    def record(self, elapsed, status, bytes_sent, bytes_received, rng):
+        self.calls += 1
+        self.total_time += elapsed
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        if not 200 <= status < 400:
+            self.errors += 1
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+        self.buckets[bucket] += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(elapsed)
+        else:
+            slot = rng.randrange(self.calls)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = elapsed
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.retries += other.retries
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.total_time += other.total_time
+        for status, count in other.status_codes.items():
+            self.status_codes[status] = self.status_codes.get(status, 0) + count
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.samples = (self.samples + other.samples)[:MAX_SAMPLES]
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'total_time': round(self.total_time, 4),
+            'p50': round(percentile(self.samples, 0.50), 4),
+            'p95': round(percentile(self.samples, 0.95), 4),
+            'p99': round(percentile(self.samples, 0.99), 4),
+            'status_codes': {str(status): count for status, count in sorted(self.status_codes.items())},
+        }
+
+# Per-endpoint, per-collection request statistics for one process. The pooled
+# client records every request here; scripts print or export it at exit.
+class RequestMetrics:
+    def __init__(self):
+        self.stats = {}
+        self.collection_names = {}
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+
+    def _stats(self, endpoint, collection_id):
+        key = (endpoint, collection_id)
+        if key not in self.stats:
+            self.stats[key] = EndpointStats()
+        return self.stats[key]
+
+    # status is 0 when no response was received (connection error, timeout).
+    # body is the decoded response, used to learn collection names.
+    def record(self, method, path, elapsed, status, bytes_sent=0, bytes_received=0, body=None):
+        endpoint = endpoint_name(method, path)
+        with self._lock:
+            self._stats(endpoint, collection_from_path(path)).record(elapsed, status, bytes_sent, bytes_received, self._rng)
+            if endpoint in COLLECTION_ENDPOINTS and isinstance(body, dict):
+                self.note_collections(body)
+
+    def record_retry(self, method, path):
+        endpoint = endpoint_name(method, path)
+        with self._lock:
+            self._stats(endpoint, collection_from_path(path)).retries += 1
+
+    # Learn collection names from collection responses, so reports can show names instead of IDs
+    def note_collections(self, body):
+        for collection in body.get('collections', [body]):
+            if isinstance(collection, dict) and '$id' in collection and 'name' in collection:
+                self.collection_names[collection['$id']] = collection['name']
+
+    def collection_label(self, collection_id):
+        return self.collection_names.get(collection_id, collection_id)
+
+    def by_endpoint(self):
+        with self._lock:
+            totals = {}
+            for (endpoint, _), stats in self.stats.items():
+                totals.setdefault(endpoint, EndpointStats()).merge(stats)
+            return totals
+
+    def total_calls(self):
+        with self._lock:
+            return sum(stats.calls for stats in self.stats.values())
+
+    def to_dict(self):
+        endpoints = self.by_endpoint()
+        with self._lock:
+            collections = {}
+            for (endpoint, collection_id), stats in sorted(self.stats.items()):
+                if collection_id:
+                    label = self.collection_label(collection_id)
+                    collections.setdefault(label, {})[endpoint] = stats.to_dict()
+        return {
+            'endpoints': {endpoint: stats.to_dict() for endpoint, stats in sorted(endpoints.items())},
+            'collections': collections,
+        }
+
+    def print_summary(self):
+        endpoints = self.by_endpoint()
+        if not endpoints:
+            return
+        print(f"\n{'endpoint':<32} {'calls':>7} {'errors':>6} {'retries':>7} {'total s':>8} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KB out':>8} {'KB in':>8}")
+        for endpoint, stats in sorted(endpoints.items(), key=lambda item: -item[1].total_time):
+            print(f"{endpoint:<32} {stats.calls:>7} {stats.errors:>6} {stats.retries:>7} {stats.total_time:>8.2f} "
+                  f"{percentile(stats.samples, 0.50) * 1000:>8.1f} {percentile(stats.samples, 0.95) * 1000:>8.1f} "
+                  f"{percentile(stats.samples, 0.99) * 1000:>8.1f} {stats.bytes_sent / 1024:>8.1f} "
+                  f"{stats.bytes_received / 1024:>8.1f}")
+
+    def write_json(self, path, script=None):
+        data = {'script': script, **self.to_dict()}
+        write_atomically(path, json.dumps(data, indent=2))
+
+    # Prometheus text exposition format, for node_exporter's textfile collector
+    def write_prometheus(self, path, script=None):
+        lines = []
+        metrics = [
+            ('appwrite_requests_total', 'counter', 'Requests sent to Appwrite', 'calls'),
+            ('appwrite_request_errors_total', 'counter', 'Requests that failed or returned an error status', 'errors'),
+            ('appwrite_request_retries_total', 'counter', 'Requests that were retried', 'retries'),
+            ('appwrite_request_bytes_sent_total', 'counter', 'Request body bytes sent', 'bytes_sent'),
+            ('appwrite_response_bytes_received_total', 'counter', 'Response body bytes received over the wire, before decompression', 'bytes_received'),
+        ]
+        with self._lock:
+            stats = sorted(self.stats.items())
+            rows = [(self.prometheus_labels(endpoint, collection_id, script), s) for (endpoint, collection_id), s in stats]
+        for name, kind, help_text, field in metrics:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, s in rows:
+                lines.append(f'{name}{{{labels}}} {getattr(s, field)}')
+        name = 'appwrite_request_duration_seconds'
+        lines.append(f'# HELP {name} Request latency')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, s in rows:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ['+Inf'], s.buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {s.total_time:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {s.calls}')
+        write_atomically(path, '\n'.join(lines) + '\n')
+
+    def prometheus_labels(self, endpoint, collection_id, script):
+        labels = {'endpoint': endpoint, 'collection': self.collection_label(collection_id)}
+        if script:
+            labels['script'] = script
+        return ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items())
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Write to a temporary file and rename, so readers never see a partial file
+def write_atomically(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+def script_name():
+    return os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+
+# End-of-run report: a summary table on the console, plus a JSON file and a
+# Prometheus textfile when APPWRITE_METRICS_JSON / APPWRITE_METRICS_PROM are set.
+# Both paths may contain {script}, which is replaced with the running script's name.
+def report(metrics):
+    if not metrics.total_calls():
+        return
+    script = script_name()
+    try:
+        metrics.print_summary()
+        json_path = os.getenv('APPWRITE_METRICS_JSON')
+        if json_path:
+            metrics.write_json(json_path.format(script=script), script)
+        prometheus_path = os.getenv('APPWRITE_METRICS_PROM')
+        if prometheus_path:
+            metrics.write_prometheus(prometheus_path.format(script=script), script)
+    except Exception as e:
+        print(f"Error writing request metrics: {str(e)}")
@@ -0,0 +1,506 @@
+import os
+import sys
+import json
+import asyncio
+import time
+import queue
+import hashlib
+import argparse
+import itertools
+import importlib
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from appwrite.services.databases import Databases
+from appwrite.query import Query
+from appwrite.exception import AppwriteException
+from catalog import CollectionCatalog, paginate, list_document_ids, PAGE_SIZE
+from reconcile import Reconciler, normalize_permissions, key_queries, ATTRIBUTE_TIMEOUT, SHADOW_SUFFIX, RETIRED_SUFFIX
+from bulk_writer import BulkWriter
+from async_databases import AsyncDatabases
+from importer import coerce_row, RejectFile, CSV_ARRAY_SEPARATOR
+from fingerprint import load_state, STAGES
+from overflow import overflow_store, is_pointer, pointer_summary
+from appwrite_client import get_client
+
+# Load environment variables
+load_dotenv()
+
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
+
+# Initialize the database service
+databases = Databases(client)
+
+# Use the database ID from environment variables
+DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
+
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
+
+# Checksums are sums of 128-bit document digests, so they don't depend on scan order
+CHECKSUM_MODULUS = 2 ** 128
+
+def load_data_model():
+    with open('_dataModel.json', 'r') as f:
+        return json.load(f)
+
+# Changes the reconciler can't make in place, by collection
+def migrations_needed(plan):
+    needed = {}
+    for item in plan:
+        if item['action'] == 'unsupported':
+            needed.setdefault(item['collection'], []).append(item)
+    return needed
+
+# A copy gets a new collection ID, which relationships elsewhere would still point past
+def relationship_blocker(collection, data_model):
+    if any(attr['type'] == 'relationship' for attr in collection['attributes']):
+        return f"{collection['name']} has relationship attributes"
+    for other in data_model['collections']:
+        if any(attr['type'] == 'relationship' and attr.get('related_collection') == collection['name']
+               for attr in other['attributes']):
+            return f"{other['name']} has a relationship to {collection['name']}"
+    return None
+
+# A custom transform is given as module:function and called as
+# function(document, data) with the live document and the converted data
+def load_transform(spec):
+    module_name, _, function_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), function_name or 'transform')
+
+# The per-row transform from a live document to data for the new schema. Each
+# attribute is read from its own key, or from "migrate": {"from": ...} for a
+# rename, and mapped through "migrate": {"map": {...}} (e.g. re-keyed enum
+# values). Arrays and scalars are converted into each other ("split"/"join"
+# choose the separator) and the result is coerced to the new types as imports are.
+def row_transform(collection, custom=None):
+    attributes = [attr for attr in collection['attributes'] if attr['type'] != 'relationship']
+
+    def transform(document):
+        row = {'$id': document['$id']}
+        for attr in attributes:
+            hint = attr.get('migrate') or {}
+            value = document.get(hint.get('from', attr['key']))
+            if isinstance(value, list) and not attr.get('array'):
+                separator = hint.get('join', CSV_ARRAY_SEPARATOR)
+                value = separator.join(str(item) for item in value) if len(value) > 1 else (value[0] if value else None)
+            elif isinstance(value, str) and attr.get('array') and 'split' in hint:
+                value = [item.strip() for item in value.split(hint['split']) if item.strip()]
+            elif value is not None and attr.get('array') and not isinstance(value, (list, str)):
+                value = [value]
+            if 'map' in hint and value is not None:
+                mapping = hint['map']
+                value = [mapping.get(str(item), item) for item in value] if isinstance(value, list) else mapping.get(str(value), value)
+            if value is None and attr.get('default') is not None:
+                value = attr['default']
+            row[attr['key']] = value
+        data = coerce_row(row, attributes)
+        data['$permissions'] = document.get('$permissions', [])
+        if custom is not None:
+            data = custom(document, data)
+        return data
+    return transform
+
+# Values reduced to a form both copies share: datetimes in UTC to the
+# millisecond, numbers as floats, permissions as an expanded set and overflow
+# pointers without their file IDs
+def canonical(data, attributes):
+    values = {'$id': data['$id'], '$permissions': sorted(normalize_permissions(data.get('$permissions') or []))}
+    for attr in attributes:
+        value = data.get(attr['key'])
+        if value is None or value == []:
+            continue
+        if is_pointer(value):
+            value = pointer_summary(value)
+        items = value if isinstance(value, list) else [value]
+        if attr['type'] == 'datetime':
+            items = [datetime.fromisoformat(str(item).replace('Z', '+00:00')).astimezone(timezone.utc)
+                     .isoformat(timespec='milliseconds') for item in items]
+        elif attr['type'] in ('integer', 'float'):
+            items = [float(item) for item in items]
+        values[attr['key']] = items if isinstance(value, list) else items[0]
+    return values
+
+def document_digest(data, attributes):
+    text = json.dumps(canonical(data, attributes), sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:16], 'big')
+
+def first_document(collection_id, *queries):
+    documents = databases.list_documents(DATABASE_ID, collection_id, queries=[*queries, Query.limit(1)])['documents']
+    return documents[0] if documents else None
+
+# The newest $updatedAt in a collection, by the server's clock
+def latest_update(collection_id):
+    document = first_document(collection_id, Query.order_desc('$updatedAt'), Query.select(['$id', '$updatedAt']))
+    return document['$updatedAt'] if document else None
+
+# Split a collection into `parts` $createdAt ranges, as query lists, so each
+# range can be paged through by its own scanner
+def scan_ranges(collection_id, parts):
+    if parts > 1:
+        first = first_document(collection_id, Query.order_asc('$createdAt'), Query.select(['$id', '$createdAt']))
+        last = first_document(collection_id, Query.order_desc('$createdAt'), Query.select(['$id', '$createdAt']))
+        if first and last and first['$createdAt'] != last['$createdAt']:
+            low = datetime.fromisoformat(first['$createdAt'].replace('Z', '+00:00'))
+            high = datetime.fromisoformat(last['$createdAt'].replace('Z', '+00:00'))
+            step = (high - low) / parts
+            bounds = [None] + [(low + step * i).isoformat(timespec='milliseconds') for i in range(1, parts)] + [None]
+            ranges = []
+            for start, end in zip(bounds, bounds[1:]):
+                queries = [Query.greater_than_equal('$createdAt', start)] if start else []
+                if end:
+                    queries.append(Query.less_than('$createdAt', end))
+                ranges.append(queries)
+            return ranges
+    return [[]]
+
+# Documents matching any of the query lists, each list paged through with
+# cursor pagination on its own thread, handed over through a bounded queue
+def parallel_scan(collection_id, query_lists, page_size=PAGE_SIZE):
+    items = queue.Queue(maxsize=page_size * len(query_lists))
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan(queries):
+        try:
+            for document in paginate(databases.list_documents, 'documents', DATABASE_ID, collection_id,
+                                     queries=queries, page_size=page_size):
+                if not put(document):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+
+    threads = [threading.Thread(target=scan, args=(queries,), daemon=True) for queries in query_lists]
+    for thread in threads:
+        thread.start()
+    try:
+        remaining = len(threads)
+        while remaining:
+            item = items.get()
+            if item is done:
+                remaining -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+# Documents by ID, leaving out those deleted in the meantime
+def fetch_documents(collection_id, document_ids):
+    for document_id in document_ids:
+        try:
+            yield databases.get_document(DATABASE_ID, collection_id, document_id)
+        except AppwriteException as e:
+            if e.code != 404:
+                raise
+
+# Checksums a collection's documents reach the new schema through, and sends
+# the transformed documents to the shadow collection. With an OverflowStore,
+# long values are downloaded before the transform and uploaded again as files
+# of the copy, so the two collections never share a file.
+class ShadowCopy:
+    def __init__(self, collection, source, shadow, transform, writer, rejects, workers, overflow=None):
+        self.collection = collection
+        self.attributes = [attr for attr in collection['attributes'] if attr['type'] != 'relationship']
+        self.source = source
+        self.shadow = shadow
+        self.transform = transform
+        self.writer = writer
+        self.rejects = rejects
+        self.workers = workers
+        self.overflow = overflow
+
+    def expanded(self, documents):
+        if self.overflow is None or self.collection['name'] not in self.overflow.attributes:
+            yield from documents
+            return
+        documents = iter(documents)
+        while batch := list(itertools.islice(documents, PAGE_SIZE)):
+            yield from self.overflow.expand(self.collection['name'], batch)
+
+    def write(self, documents, existing=True):
+        def transformed():
+            for document in self.expanded(documents):
+                try:
+                    yield self.transform(document)
+                except Exception as e:
+                    self.rejects.write(None, document, e)
+        # Named after the model collection, whose overflow settings the copy uses
+        stats = self.writer.upsert_documents(self.collection['name'], self.shadow['$id'], transformed(), existing=existing)
+        return stats.errors == 0
+
+    def backfill(self):
+        print(f"Backfilling {self.shadow['name']} from {self.collection['name']} with {self.workers} scanners...")
+        return self.write(parallel_scan(self.source['$id'], scan_ranges(self.source['$id'], self.workers)), existing=False)
+
+    # Copy documents written since `since` again, round after round, until a
+    # round finds nothing that wasn't already copied at the same $updatedAt.
+    # Each round starts from the newest $updatedAt seen before the previous one.
+    # Returns where the next catch-up should start, or False if it didn't settle.
+    def catch_up(self, since, rounds):
+        copied = {}
+        for round_number in range(1, rounds + 1):
+            latest = latest_update(self.source['$id'])
+            queries = [Query.greater_than_equal('$updatedAt', since)] if since else []
+            fresh = {}
+
+            def changed():
+                for document in paginate(databases.list_documents, 'documents', DATABASE_ID, self.source['$id'],
+                                         queries=queries):
+                    if copied.get(document['$id']) != document['$updatedAt']:
+                        fresh[document['$id']] = document['$updatedAt']
+                        yield document
+            if not self.write(changed()):
+                return False
+            print(f"Catch-up round {round_number}: {len(fresh)} documents written during the previous pass")
+            if not fresh:
+                return latest
+            copied.update(fresh)
+            since = latest
+        print(f"{self.collection['name']} is changing faster than it can be copied; rerun with --freeze-writes")
+        return False
+
+    def source_digest(self, document):
+        try:
+            return document_digest(self.transform(document), self.attributes)
+        except Exception:
+            # Matches no copy, so the document is reported and retried
+            return 0
+
+    def checksum(self, collection_id, digest, keep):
+        count, total, digests = 0, 0, {}
+        for document in parallel_scan(collection_id, scan_ranges(collection_id, self.workers)):
+            value = digest(document)
+            count += 1
+            total = (total + value) % CHECKSUM_MODULUS
+            if keep:
+                digests[document['$id']] = value
+        return count, total, digests
+
+    # Compare row counts and checksums of the transformed source and the copy.
+    # On a mismatch, compare again document by document and rewrite the
+    # differences, until both agree or `attempts` runs out.
+    def verify(self, attempts=3):
+        keep = False
+        for attempt in range(attempts + 1):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                source = pool.submit(self.checksum, self.source['$id'], self.source_digest, keep)
+                copy = pool.submit(self.checksum, self.shadow['$id'], lambda d: document_digest(d, self.attributes), keep)
+                (source_count, source_sum, source_digests), (copy_count, copy_sum, copy_digests) = source.result(), copy.result()
+            print(f"Verify {self.collection['name']}: {source_count} documents (checksum {source_sum:032x}), "
+                  f"{self.shadow['name']}: {copy_count} documents (checksum {copy_sum:032x})")
+            if source_count == copy_count and source_sum == copy_sum:
+                return True
+            if not keep:
+                keep = True
+                continue
+            if attempt == attempts:
+                break
+            stale = [document_id for document_id, value in source_digests.items() if copy_digests.get(document_id) != value]
+            extra = [document_id for document_id in copy_digests if document_id not in source_digests]
+            print(f"Repairing {len(stale)} differing and {len(extra)} extra documents")
+            if stale:
+                self.write(fetch_documents(self.source['$id'], stale))
+            if extra:
+                self.writer.delete_documents(self.collection['name'], self.shadow['$id'], iter(extra))
+        print(f"Copy of {self.collection['name']} does not match the source")
+        return False
+
+    # Delete copies of documents removed from the source since the last full scan
+    def remove_deleted(self):
+        source_ids = set(list_document_ids(databases, DATABASE_ID, self.source['$id']))
+        extra = [document_id for document_id in list_document_ids(databases, DATABASE_ID, self.shadow['$id'])
+                 if document_id not in source_ids]
+        if not extra:
+            return True
+        stats = self.writer.delete_documents(self.collection['name'], self.shadow['$id'], iter(extra))
+        print(f"Deleted {stats.summary()}")
+        return stats.errors == 0
+
+# Create the collection, attributes and indexes of `model` that don't exist yet
+def build(reconciler, model):
+    plan = reconciler.plan({'collections': [model]})
+    unsupported = [item for item in plan if item['action'] == 'unsupported']
+    if unsupported:
+        print(f"{model['name']} exists with a different schema ({unsupported[0]['key']}: {unsupported[0]['detail']}); "
+              f"delete it and rerun")
+        return False
+    if not plan:
+        return True
+    adb = AsyncDatabases(databases)
+    try:
+        return asyncio.run(reconciler.apply_async(plan, adb))
+    finally:
+        adb.close()
+
+# Indexes on a populated collection are built in the background
+def wait_for_indexes(collection_id, keys, timeout=ATTRIBUTE_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while True:
+        statuses = {index['key']: index.get('status') for queries in key_queries(keys)
+                    for index in databases.list_indexes(DATABASE_ID, collection_id, queries=queries)['indexes']}
+        failed = [key for key in keys if statuses.get(key) in ('failed', 'stuck')]
+        if failed:
+            print(f"Indexes failed: {', '.join(failed)}")
+            return False
+        if all(statuses.get(key) == 'available' for key in keys):
+            return True
+        if time.monotonic() > deadline:
+            print(f"Timed out waiting for indexes: {', '.join(key for key in keys if statuses.get(key) != 'available')}")
+            return False
+        time.sleep(1)
+
+# Point the collection's name at the copy. The old collection is renamed first,
+# so the name never resolves to two collections at once.
+def swap(collection, source, shadow, permissions):
+    retired_name = f"{collection['name']}{RETIRED_SUFFIX}_{time.strftime('%Y%m%d%H%M%S', time.gmtime())}"
+    databases.update_collection(DATABASE_ID, source['$id'], name=retired_name, permissions=permissions)
+    try:
+        databases.update_collection(DATABASE_ID, shadow['$id'], name=collection['name'],
+                                    permissions=shadow.get('$permissions', []))
+    except Exception:
+        databases.update_collection(DATABASE_ID, source['$id'], name=collection['name'], permissions=permissions)
+        raise
+    catalog.invalidate()
+    print(f"Swapped {collection['name']}: now {shadow['$id']}, old collection {source['$id']} kept as {retired_name}")
+    return retired_name
+
+def migrate_collection(collection, data_model, reconciler, state, workers=4, concurrency=32, adaptive=True,
+                       custom=None, rounds=5, freeze=False, drop_old=False, reject_path=None):
+    name = collection['name']
+    blocker = relationship_blocker(collection, data_model)
+    if blocker:
+        print(f"Cannot migrate {name}: {blocker}")
+        return False
+    source = catalog.get_collection(name)
+    if not source:
+        print(f"Failed to migrate {name}: Collection not found")
+        return False
+    started = time.monotonic()
+    shadow_name = name + SHADOW_SUFFIX
+    # A shadow left by an interrupted run is reused; every write to it is an upsert
+    if not build(reconciler, {**collection, 'name': shadow_name, 'indexes': []}):
+        return False
+    # Relist so the second build sees the shadow's attributes
+    catalog.invalidate()
+    shadow = catalog.get_collection(shadow_name)
+    overflow = overflow_store(client, data_model)
+    writer = BulkWriter(databases, DATABASE_ID, concurrency=concurrency, adaptive=adaptive, overflow=overflow)
+    rejects = RejectFile(reject_path or f"migrate-{name}.rejects.ndjson")
+    copy = ShadowCopy(collection, source, shadow, row_transform(collection, custom), writer, rejects, workers, overflow)
+    permissions = source.get('$permissions', [])
+    frozen = swapped = False
+    try:
+        since = latest_update(source['$id'])
+        if not copy.backfill() or rejects.count:
+            return False
+        since = copy.catch_up(since, rounds)
+        if since is False:
+            return False
+        indexes = [index['key'] for index in collection.get('indexes', [])]
+        if not build(reconciler, {**collection, 'name': shadow_name}) or not wait_for_indexes(shadow['$id'], indexes):
+            return False
+        since = latest_update(source['$id']) or since
+        if not copy.verify():
+            return False
+
+        # Writes between the last catch-up and the swap would be lost; frozen
+        # collections only accept reads (API keys are not affected)
+        if freeze:
+            read_only = [permission for permission in permissions if permission.startswith('read(')]
+            databases.update_collection(DATABASE_ID, source['$id'], name=name, permissions=read_only)
+            frozen = True
+            print(f"Writes to {name} frozen")
+        if copy.catch_up(since, rounds) is False or not copy.remove_deleted() or rejects.count:
+            return False
+        swap(collection, source, shadow, read_only if frozen else permissions)
+        frozen, swapped = False, True
+    except Exception as e:
+        print(f"Error migrating {name}: {str(e)}")
+        return False
+    finally:
+        rejects.close()
+        if rejects.count:
+            print(f"{rejects.count} documents could not be transformed; see {rejects.path}")
+        if frozen:
+            databases.update_collection(DATABASE_ID, source['$id'], name=name, permissions=permissions)
+            print(f"Writes to {name} unfrozen")
+        if not swapped:
+            print(f"{shadow_name} was left in place; rerun to continue the migration")
+
+    if state is not None:
+        state.forget(name)
+        state.record(collection, STAGES, shadow['$id'])
+        state.save()
+    if drop_old:
+        try:
+            # Its files have the same name as the new collection's, so they go by pointer
+            if overflow is not None:
+                overflow.delete_referenced_files(databases, DATABASE_ID, source['$id'], name)
+            databases.delete_collection(DATABASE_ID, source['$id'])
+            print(f"Old collection {source['$id']} deleted")
+        except Exception as e:
+            print(f"Error deleting old collection {source['$id']}: {str(e)}")
+    print(f"Migrated {name} in {time.monotonic() - started:.1f}s")
+    return True
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Apply schema changes Appwrite can't make in place by copying collections to the new schema")
+    parser.add_argument('collections', nargs='*', help="collections to migrate (default: those whose plan has unsupported changes)")
+    parser.add_argument('--plan', action='store_true', help="list the collections that need a migration without changing anything")
+    parser.add_argument('--workers', type=int, default=4, help="parallel cursor scans per collection (default: 4)")
+    parser.add_argument('--concurrency', type=int, default=32, help="maximum parallel writes (default: 32)")
+    parser.add_argument('--fixed-concurrency', action='store_true', help="always run --concurrency calls instead of adapting to throttling")
+    parser.add_argument('--transform', help="custom per-document transform as module:function, called as function(document, data)")
+    parser.add_argument('--catch-up-rounds', type=int, default=5, help="catch-up passes before giving up on a busy collection (default: 5)")
+    parser.add_argument('--freeze-writes', action='store_true', help="make the collection read-only for the final catch-up and the swap")
+    parser.add_argument('--drop-old', action='store_true', help="delete the old collection after the swap instead of keeping it")
+    parser.add_argument('--reject', help="file for documents the transform refuses (default: migrate-<Collection>.rejects.ndjson)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    data_model = load_data_model()
+    models = {collection['name']: collection for collection in data_model['collections']}
+    reconciler = Reconciler(databases, DATABASE_ID, catalog)
+    needed = migrations_needed(reconciler.plan(data_model))
+    names = args.collections or list(needed)
+    unknown = [name for name in names if name not in models]
+    if unknown:
+        print(f"Not in _dataModel.json: {', '.join(unknown)}")
+        sys.exit(1)
+    if not names:
+        print("No collection needs a migration. Nothing to do.")
+        sys.exit(0)
+    for name in names:
+        print(f"{name}:")
+        for item in needed.get(name, []):
+            print(f"  ! {item['key']}: {item['detail']}")
+        if name not in needed:
+            print("  (requested; no unsupported changes)")
+    if args.plan:
+        sys.exit(0)
+
+    custom = load_transform(args.transform) if args.transform else None
+    state = load_state(DATABASE_ID)
+    failed = [name for name in names if not migrate_collection(
+        models[name], data_model, reconciler, state, args.workers, args.concurrency, not args.fixed_concurrency,
+        custom, args.catch_up_rounds, args.freeze_writes, args.drop_old, args.reject)]
+    client.print_pool_stats()
+    if failed:
+        print(f"Migration failed for: {', '.join(failed)}")
+        sys.exit(1)
+    print("Migration completed.")
@@ -0,0 +1,240 @@
+import os
+import gzip
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from appwrite.id import ID
+from appwrite.query import Query
+from appwrite.input_file import InputFile
+from appwrite.exception import AppwriteException
+from appwrite.services.storage import Storage
+from catalog import paginate
+from reconcile import format_permissions
+
+# String attributes marked "overflow" in _dataModel.json keep values longer than
+# `threshold` characters in a Storage bucket, gzip-compressed. The document holds
+# a pointer plus the first `preview` characters instead:
+#   overflow:<file id>:<length>\n<preview>
+POINTER_PREFIX = 'overflow:'
+DEFAULT_THRESHOLD = 4096
+DEFAULT_PREVIEW = 200
+DEFAULT_BUCKET_ID = 'overflow'
+
+# Appwrite takes uploads in chunks of this size
+CHUNK_SIZE = 5 * 1024 * 1024
+
+# Longest pointer prefix: "overflow:" + 36-character ID + ":" + length + "\n"
+POINTER_OVERHEAD = len(POINTER_PREFIX) + 36 + 1 + 12 + 1
+
+# {"overflow": true} or {"overflow": {"threshold": ..., "preview": ...}} on a
+# scalar string attribute; None when the attribute does not overflow
+def overflow_settings(attr):
+    option = attr.get('overflow')
+    if not option or attr['type'] != 'string' or attr.get('array'):
+        return None
+    option = option if isinstance(option, dict) else {}
+    size = attr.get('size', 255)
+    preview = option.get('preview', DEFAULT_PREVIEW)
+    threshold = min(option.get('threshold', DEFAULT_THRESHOLD), size)
+    if preview + POINTER_OVERHEAD > size:
+        raise ValueError(f"'{attr['key']}' is too small ({size}) for an overflow pointer with a {preview}-character preview")
+    return {'threshold': threshold, 'preview': preview}
+
+def overflow_attributes(data_model):
+    attributes = {}
+    for collection in data_model['collections']:
+        settings = {attr['key']: overflow_settings(attr) for attr in collection['attributes']}
+        settings = {key: value for key, value in settings.items() if value}
+        if settings:
+            attributes[collection['name']] = settings
+    return attributes
+
+def is_pointer(value):
+    return isinstance(value, str) and value.startswith(POINTER_PREFIX) and '\n' in value
+
+def parse_pointer(value):
+    header = value[len(POINTER_PREFIX):value.index('\n')]
+    file_id, length = header.rsplit(':', 1)
+    return file_id, int(length)
+
+# The pointer without its file ID. Copies of a document hold their own files,
+# so this is what two copies of the same value have in common.
+def pointer_summary(value):
+    _, length = parse_pointer(value)
+    preview = value[value.index('\n') + 1:]
+    return f"{POINTER_PREFIX}{length}\n{preview}"
+
+# Moves oversized values to and from the bucket. Uploads stream the compressed
+# value through a spooled temporary file in CHUNK_SIZE chunks, so a value of
+# any length is sent without holding a second compressed copy in memory.
+#
+# The bucket grants nothing itself: a bucket-level read would cover every file
+# in it, whichever collection the file belongs to. Each file is readable by its
+# collection's read roles (`reads`, by collection name) and by the read roles
+# of its own document.
+class OverflowStore:
+    def __init__(self, client, attributes, bucket_id=DEFAULT_BUCKET_ID, reads=None):
+        self.client = client
+        self.storage = Storage(client)
+        self.attributes = attributes
+        self.bucket_id = bucket_id
+        self.reads = reads or {}
+        self._bucket_ready = False
+        self._lock = threading.Lock()
+
+    def ensure_bucket(self):
+        with self._lock:
+            if self._bucket_ready:
+                return
+            # Values arrive compressed; the bucket stores them as they are
+            settings = {'bucket_id': self.bucket_id, 'name': 'Overflow text', 'permissions': [],
+                        'file_security': True, 'compression': 'none'}
+            try:
+                self.storage.create_bucket(**settings)
+                print(f"Overflow bucket created: {self.bucket_id}")
+            except AppwriteException as e:
+                if e.code != 409:
+                    raise
+                # Buckets created by earlier versions granted every collection's reads on all files
+                self.storage.update_bucket(**settings)
+            self._bucket_ready = True
+
+    def upload(self, text, name, permissions=None):
+        self.ensure_bucket()
+        file_id = ID.unique()
+        with tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE) as spool:
+            with gzip.GzipFile(fileobj=spool, mode='wb', compresslevel=6) as stream:
+                for start in range(0, len(text), 1 << 20):
+                    stream.write(text[start:start + (1 << 20)].encode('utf-8'))
+            size = spool.tell()
+            spool.seek(0)
+            if size <= CHUNK_SIZE:
+                self.storage.create_file(self.bucket_id, file_id, InputFile.from_bytes(spool.read(), name, 'application/gzip'),
+                                         permissions=permissions)
+                return file_id
+            headers = {'content-type': 'multipart/form-data'}
+            offset = 0
+            while offset < size:
+                chunk = spool.read(CHUNK_SIZE)
+                headers['content-range'] = f"bytes {offset}-{offset + len(chunk) - 1}/{size}"
+                self.client.call('post', f"/storage/buckets/{self.bucket_id}/files", dict(headers), {
+                    'fileId': file_id,
+                    'file': InputFile.from_bytes(chunk, name, 'application/gzip'),
+                    'permissions': permissions,
+                })
+                headers['x-appwrite-id'] = file_id
+                offset += len(chunk)
+        return file_id
+
+    def download(self, pointer):
+        file_id, _ = parse_pointer(pointer)
+        return gzip.decompress(self.storage.get_file_download(self.bucket_id, file_id)).decode('utf-8')
+
+    def delete(self, pointer):
+        file_id, _ = parse_pointer(pointer)
+        try:
+            self.storage.delete_file(self.bucket_id, file_id)
+        except AppwriteException as e:
+            if e.code != 404:
+                raise
+
+    # Read permissions for a file of `collection_name` holding part of `data`
+    def file_permissions(self, collection_name, data):
+        own = [permission for permission in data.get('$permissions') or [] if permission.startswith('read(')]
+        return sorted(set(self.reads.get(collection_name, [])) | set(own))
+
+    # Document data with oversized values replaced by pointers, and the
+    # pointers created. The files get file_permissions(); `data` itself is
+    # left as it was.
+    def pack(self, collection_name, data):
+        packed, created = data, []
+        for key, settings in self.attributes.get(collection_name, {}).items():
+            value = data.get(key)
+            if not isinstance(value, str) or len(value) <= settings['threshold'] or is_pointer(value):
+                continue
+            if packed is data:
+                packed = dict(data)
+            try:
+                file_id = self.upload(value, f"{collection_name}.{key}.txt.gz", self.file_permissions(collection_name, data))
+            except Exception:
+                self.discard(created)
+                raise
+            packed[key] = f"{POINTER_PREFIX}{file_id}:{len(value)}\n{value[:settings['preview']]}"
+            created.append(packed[key])
+        return packed, created
+
+    # Best-effort cleanup of files no document references: those of a failed
+    # write, or those a successful write replaced
+    def discard(self, pointers):
+        for pointer in pointers:
+            try:
+                self.delete(pointer)
+            except Exception as e:
+                print(f"Error deleting overflow file {parse_pointer(pointer)[0]}: {str(e)}")
+
+    # Pointers of a stored document that a write of `data` (already packed)
+    # leaves unreferenced: those under keys it sets to another value. Without
+    # `data`, every pointer the document holds, for a delete. Read before the
+    # write; discard the result once the write has succeeded.
+    def replaced_pointers(self, databases, database_id, collection_id, collection_name, document_id, data=None):
+        keys = [key for key in self.attributes.get(collection_name, {}) if data is None or key in data]
+        if not keys:
+            return []
+        try:
+            document = databases.get_document(database_id, collection_id, document_id, queries=[Query.select(keys)])
+        except AppwriteException as e:
+            if e.code != 404:
+                raise
+            return []
+        return [document[key] for key in keys
+                if is_pointer(document.get(key)) and (data is None or data[key] != document[key])]
+
+    # Put the full values back into fetched documents, downloading in parallel
+    def expand(self, collection_name, documents, workers=8):
+        keys = self.attributes.get(collection_name, {})
+        pointers = [(document, key) for document in documents for key in keys if is_pointer(document.get(key))]
+        if not pointers:
+            return documents
+        with ThreadPoolExecutor(max_workers=min(workers, len(pointers))) as pool:
+            values = list(pool.map(lambda item: self.download(item[0][item[1]]), pointers))
+        for (document, key), value in zip(pointers, values):
+            document[key] = value
+        return documents
+
+    # Delete the files the documents of one collection point to. Unlike
+    # delete_collection_files, this leaves alone the files of other collections
+    # with the same name, such as the copy migrate.py swapped in.
+    def delete_referenced_files(self, databases, database_id, collection_id, collection_name):
+        keys = list(self.attributes.get(collection_name, {}))
+        if not keys:
+            return 0
+        pointers = [document[key] for document in paginate(databases.list_documents, 'documents', database_id, collection_id,
+                                                           queries=[Query.select(keys)])
+                    for key in keys if is_pointer(document.get(key))]
+        self.discard(pointers)
+        return len(pointers)
+
+    # Delete the overflow files written for one collection
+    def delete_collection_files(self, collection_name):
+        try:
+            files = list(paginate(self.storage.list_files, 'files', self.bucket_id,
+                                  queries=[Query.starts_with('name', f"{collection_name}.")]))
+        except AppwriteException as e:
+            if e.code != 404:
+                raise
+            return 0
+        for file in files:
+            self.storage.delete_file(self.bucket_id, file['$id'])
+        return len(files)
+
+# An OverflowStore for the data model, or None if no attribute overflows.
+# APPWRITE_OVERFLOW_BUCKET_ID names the bucket (default "overflow"). Clients
+# can read a file with the read permissions of the collection it belongs to.
+def overflow_store(client, data_model):
+    attributes = overflow_attributes(data_model)
+    if not attributes:
+        return None
+    reads = {collection['name']: format_permissions([permission for permission in collection.get('permissions', [])
+                                                     if permission.startswith('read(')])
+             for collection in data_model['collections'] if collection['name'] in attributes}
+    return OverflowStore(client, attributes, os.getenv('APPWRITE_OVERFLOW_BUCKET_ID', DEFAULT_BUCKET_ID), reads)
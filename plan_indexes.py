@@ -0,0 +1,319 @@
+import sys
+import json
+import hashlib
+import argparse
+
+# How each Appwrite query method can use a key index (MariaDB B-tree): equality
+# filters can fill any leading columns, then one range or the sort order can
+# use the next ones. Everything else is checked row by row.
+EQUALITY = {'equal', 'isNull'}
+RANGE = {'lessThan', 'lessThanEqual', 'greaterThan', 'greaterThanEqual', 'between', 'startsWith'}
+RESIDUAL = {'notEqual', 'endsWith', 'isNotNull', 'contains'}
+ORDERS = {'orderAsc': 'ASC', 'orderDesc': 'DESC'}
+IGNORED = {'limit', 'offset', 'cursorAfter', 'cursorBefore', 'select'}
+
+# Appwrite indexes these itself
+BUILTIN_INDEXES = [
+    {'key': '$id', 'type': 'unique', 'attributes': ['$id']},
+    {'key': '$createdAt', 'type': 'key', 'attributes': ['$createdAt']},
+    {'key': '$updatedAt', 'type': 'key', 'attributes': ['$updatedAt']},
+]
+
+# Appwrite keys are limited to 36 characters
+MAX_KEY_LENGTH = 36
+
+# Workload file: {collection: [{"name": ..., "weight": ..., "queries": [...]}]}.
+# Queries are Appwrite Query objects, either as dicts or as the JSON strings
+# the SDK's Query helpers return, e.g. Query.equal("tags", ["x"]).
+def load_workload(path):
+    with open(path, 'r') as f:
+        workload = json.load(f)
+    for entries in workload.values():
+        for i, entry in enumerate(entries):
+            entry.setdefault('name', f"query {i + 1}")
+            entry.setdefault('weight', 1)
+            entry['queries'] = [json.loads(query) if isinstance(query, str) else query for query in entry['queries']]
+    return workload
+
+# Reduce one workload entry to what matters for indexing
+def query_shape(collection, entry):
+    attributes = {attr['key']: attr for attr in collection['attributes']}
+    shape = {'name': entry['name'], 'weight': entry['weight'], 'equality': [], 'range': [], 'orders': [],
+             'search': [], 'residual': [], 'errors': []}
+
+    def add(query):
+        method, attribute = query['method'], query.get('attribute')
+        if method in IGNORED:
+            return
+        if method == 'and':
+            for inner in query['values']:
+                add(inner)
+            return
+        if method == 'or':
+            shape['residual'].append((', '.join(inner.get('attribute', '?') for inner in query['values']),
+                                      'or() is checked row by row'))
+            return
+        if not attribute.startswith('$') and attribute not in attributes:
+            shape['errors'].append(f"'{attribute}' is not an attribute of {collection['name']}")
+            return
+        if method in ORDERS:
+            shape['orders'].append((attribute, ORDERS[method]))
+        elif method == 'search':
+            shape['search'].append(attribute)
+        elif attributes.get(attribute, {}).get('array'):
+            shape['residual'].append((attribute, f"{method}() on an array attribute cannot use an index"))
+        elif attributes.get(attribute, {}).get('type') == 'relationship':
+            shape['residual'].append((attribute, f"{method}() on a relationship cannot use an index"))
+        elif method in EQUALITY:
+            if attribute not in shape['equality']:
+                shape['equality'].append(attribute)
+        elif method in RANGE:
+            if attribute not in shape['range']:
+                shape['range'].append(attribute)
+        elif method in RESIDUAL:
+            shape['residual'].append((attribute, f"{method}() cannot use an index"))
+        else:
+            shape['errors'].append(f"unknown query method '{method}'")
+
+    for query in entry['queries']:
+        add(query)
+    # An attribute compared for equality needs no range or sort on top
+    shape['range'] = [attribute for attribute in shape['range'] if attribute not in shape['equality']]
+    shape['orders'] = [(attribute, direction) for attribute, direction in shape['orders'] if attribute not in shape['equality']]
+    return shape
+
+def index_orders(index):
+    return list(index.get('orders') or ['ASC'] * len(index['attributes']))
+
+# How well one index serves a query: 'full' (all equality columns, then the
+# sort order or a range), 'partial' (some leading column is used) or None
+def index_use(index, shape):
+    if index['type'] == 'fulltext':
+        return 'full' if len(index['attributes']) == 1 and index['attributes'][0] in shape['search'] else None
+    attributes, orders = index['attributes'], index_orders(index)
+    used = 0
+    while used < len(attributes) and attributes[used] in shape['equality']:
+        used += 1
+    rest = list(zip(attributes[used:], orders[used:]))
+    if shape['orders']:
+        wanted = rest[:len(shape['orders'])]
+        # An index can be read backwards, so the sort matches as written or fully reversed
+        flipped = [(attribute, 'ASC' if direction == 'DESC' else 'DESC') for attribute, direction in shape['orders']]
+        tail_ok = wanted == shape['orders'] or wanted == flipped
+        if len(shape['orders']) == 1:
+            tail_ok = bool(rest) and rest[0][0] == shape['orders'][0][0]
+    else:
+        tail_ok = not shape['range'] or (bool(rest) and rest[0][0] in shape['range'])
+    # Searches need a fulltext index, whatever else a key index covers
+    if used == len(shape['equality']) and tail_ok and (used or shape['range'] or shape['orders']) and not shape['search']:
+        return 'full'
+    if used or (rest and (rest[0][0] in shape['range'] or (shape['orders'] and rest[0][0] == shape['orders'][0][0]))):
+        return 'partial'
+    return None
+
+# The indexes that would serve a query fully
+def ideal_indexes(shape):
+    if shape['search']:
+        return [{'type': 'fulltext', 'attributes': [attribute]} for attribute in shape['search']]
+    attributes = list(shape['equality'])
+    orders = ['ASC'] * len(attributes)
+    if shape['orders']:
+        attributes += [attribute for attribute, _ in shape['orders']]
+        orders += [direction for _, direction in shape['orders']]
+    elif shape['range']:
+        attributes.append(shape['range'][0])
+        orders.append('ASC')
+    if not attributes:
+        return []
+    return [{'type': 'key', 'attributes': attributes, 'orders': orders}]
+
+def index_key(index, taken):
+    key = 'idx_' + '_'.join(attribute.lstrip('$') for attribute in index['attributes'])
+    if len(key) > MAX_KEY_LENGTH:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+        key = f"{key[:MAX_KEY_LENGTH - 9]}_{digest}"
+    base, n = key, 2
+    while key in taken:
+        key = f"{base[:MAX_KEY_LENGTH - len(str(n)) - 1]}_{n}"
+        n += 1
+    return key
+
+def same_columns(a, b):
+    return a['type'] == b['type'] and a['attributes'] == b['attributes'] and index_orders(a) == index_orders(b)
+
+def is_prefix(shorter, longer):
+    size = len(shorter['attributes'])
+    return (shorter['type'] == 'key' and longer['type'] in ('key', 'unique')
+            and size < len(longer['attributes'])
+            and longer['attributes'][:size] == shorter['attributes']
+            and index_orders(longer)[:size] == index_orders(shorter))
+
+def best_use(indexes, shape):
+    # Without filters or a sort, documents are read in $id order
+    if not any(shape[part] for part in ('equality', 'range', 'orders', 'search', 'residual')):
+        return 'full', BUILTIN_INDEXES[0]
+    uses = [(index_use(index, shape), index) for index in indexes]
+    for level in ('full', 'partial'):
+        for use, index in uses:
+            if use == level:
+                return level, index
+    return None, None
+
+# Searched attributes without their own fulltext index; Appwrite rejects such searches
+def missing_fulltext(indexes, shape):
+    return [attribute for attribute in shape['search']
+            if not any(index['type'] == 'fulltext' and index['attributes'] == [attribute] for index in indexes)]
+
+def plan_collection(collection, entries):
+    shapes = sorted((query_shape(collection, entry) for entry in entries), key=lambda shape: -shape['weight'])
+    existing = list(collection.get('indexes', []))
+    available = BUILTIN_INDEXES + existing
+
+    # Candidate indexes for every query not fully served, longest first so a
+    # shorter candidate is only added when no longer one already covers its query
+    candidates = []
+    for shape in shapes:
+        if not shape['errors'] and (best_use(available, shape)[0] != 'full' or missing_fulltext(available, shape)):
+            candidates.extend((ideal, shape) for ideal in ideal_indexes(shape))
+    recommended = []
+    for ideal, shape in sorted(candidates, key=lambda item: (-len(item[0]['attributes']), -item[1]['weight'])):
+        if ideal['type'] == 'fulltext':
+            if ideal['attributes'][0] not in missing_fulltext(available + recommended, shape):
+                continue
+        elif best_use(available + recommended, shape)[0] == 'full':
+            continue
+        ideal['key'] = index_key(ideal, {index['key'] for index in existing + recommended})
+        recommended.append(ideal)
+
+    final = existing + recommended
+    redundant = {}
+    for index in existing:
+        for other in final:
+            if other is index:
+                continue
+            if is_prefix(index, other):
+                redundant[index['key']] = f"prefix of {other['key']} {other['attributes']}"
+                break
+            if same_columns(index, other) and index['type'] != 'unique' and final.index(other) < final.index(index):
+                redundant[index['key']] = f"duplicate of {other['key']}"
+                break
+
+    kept = [index for index in final if index['key'] not in redundant]
+    queries = []
+    for shape in shapes:
+        now, now_index = best_use(available, shape)
+        after, after_index = best_use(BUILTIN_INDEXES + kept, shape)
+        queries.append({
+            'name': shape['name'],
+            'weight': shape['weight'],
+            'current': now,
+            'current_index': now_index and now_index['key'],
+            'planned': after,
+            'planned_index': after_index and after_index['key'],
+            'missing_fulltext': missing_fulltext(existing, shape),
+            'residual': [f"{attribute}: {reason}" for attribute, reason in shape['residual']],
+            'errors': shape['errors'],
+        })
+    used = {query['planned_index'] for query in queries} | {query['current_index'] for query in queries}
+    unused = [index['key'] for index in existing if index['key'] not in used and index['key'] not in redundant]
+    return {'queries': queries, 'recommended': recommended, 'redundant': redundant, 'unused': unused, 'indexes': kept}
+
+def describe_index(index):
+    columns = ', '.join(f"{attribute} {order}" if order == 'DESC' else attribute
+                        for attribute, order in zip(index['attributes'], index_orders(index)))
+    return f"{index['key']}: {index['type']} ({columns})"
+
+def print_plan(name, plan):
+    print(f"{name}:")
+    for query in plan['queries']:
+        if query['errors']:
+            status = 'ERROR ' + '; '.join(query['errors'])
+        elif query['missing_fulltext']:
+            status = f"FAILS without a fulltext index on {', '.join(query['missing_fulltext'])}"
+        elif query['current'] == 'full':
+            status = f"uses {query['current_index']}"
+        elif query['current'] == 'partial':
+            status = f"partly uses {query['current_index']}"
+        else:
+            status = 'NO USABLE INDEX'
+        if not query['errors'] and query['planned'] != query['current']:
+            status += f" -> {'uses' if query['planned'] == 'full' else 'partly uses'} {query['planned_index']}"
+        print(f"  [{query['weight']:>6}] {query['name']}: {status}")
+        for residual in query['residual']:
+            print(f"           filtered row by row: {residual}")
+    for index in plan['recommended']:
+        print(f"  + {describe_index(index)}")
+    for key, reason in plan['redundant'].items():
+        print(f"  - {key}: redundant, {reason}")
+    for key in plan['unused']:
+        print(f"  ? {key}: not used by any query in the workload")
+
+# Write the model back in the layout of _dataModel.json: one line per
+# attribute, index and permission
+def dump_data_model(data_model):
+    def inline(value):
+        return json.dumps(value, ensure_ascii=False)
+
+    # Only the model and its collections (dicts holding lists of dicts) are spread over lines
+    def spread(value):
+        return isinstance(value, dict) and (value is data_model or any(
+            isinstance(item, list) and any(isinstance(element, dict) for element in item) for item in value.values()))
+
+    def block(value, depth):
+        pad = '  ' * (depth + 1)
+        if not spread(value):
+            return inline(value)
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, list) and item:
+                items = ',\n'.join(f"{pad}  {block(element, depth + 2)}" for element in item)
+                lines.append(f"{pad}{inline(key)}: [\n{items}\n{pad}]")
+            else:
+                lines.append(f"{pad}{inline(key)}: {block(item, depth + 1)}")
+        return '{\n' + ',\n'.join(lines) + '\n' + '  ' * depth + '}'
+    return block(data_model, 0)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Plan the indexes in _dataModel.json from a workload of Appwrite queries")
+    parser.add_argument('workload', help="JSON file of the queries each collection serves (see workload-Sample.json)")
+    parser.add_argument('--model', default='_dataModel.json', help="data model to plan for (default: _dataModel.json)")
+    parser.add_argument('--write', action='store_true', help="write the planned indexes back into the data model")
+    parser.add_argument('--drop-unused', action='store_true', help="with --write, also remove indexes no query in the workload uses")
+    parser.add_argument('--report', help="write the plan as JSON to this path")
+    parser.add_argument('--check', action='store_true', help="exit nonzero if any query has no usable index in the current model")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(args.model, 'r') as f:
+        data_model = json.load(f)
+    workload = load_workload(args.workload)
+    collections = {collection['name']: collection for collection in data_model['collections']}
+    for name in workload:
+        if name not in collections:
+            print(f"Workload collection '{name}' is not in {args.model}")
+
+    plans = {}
+    for collection in data_model['collections']:
+        if collection['name'] in workload:
+            plans[collection['name']] = plan_collection(collection, workload[collection['name']])
+            print_plan(collection['name'], plans[collection['name']])
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(plans, f, indent=2)
+    if args.write:
+        for name, plan in plans.items():
+            collections[name]['indexes'] = [
+                {field: index[field] for field in ('key', 'type', 'attributes', 'orders') if field in index}
+                for index in plan['indexes']
+                if not (args.drop_unused and index['key'] in plan['unused'])
+            ]
+        with open(args.model, 'w') as f:
+            f.write(dump_data_model(data_model))
+        print(f"Indexes written to {args.model}. Run 4_create_indexes.py or deploy.py to apply them.")
+    unserved = [f"{name}: {query['name']}" for name, plan in plans.items() for query in plan['queries']
+                if query['errors'] or query['missing_fulltext'] or query['current'] is None]
+    if args.check and unserved:
+        print(f"Queries without a usable index: {len(unserved)}")
+        sys.exit(1)
@@ -0,0 +1,536 @@
+import re
+import time
+import asyncio
+from appwrite.id import ID
+from appwrite.query import Query
+from appwrite.permission import Permission
+from appwrite.role import Role
+from fingerprint import STAGES
+from async_databases import run_all
+
+# Seconds to wait for Appwrite to finish building attributes
+ATTRIBUTE_TIMEOUT = 300
+
+# Attribute properties that update_*_attribute can change on a populated collection
+IN_PLACE_FIELDS = ('required', 'size', 'elements', 'default')
+
+# Whether a diff narrows what existing values may be: a smaller size or fewer
+# enum elements can leave stored values invalid, so only a migration, which
+# rewrites them, may apply it
+def narrows(diff):
+    if 'size' in diff:
+        old, new = diff['size']
+        if old is not None and new < old:
+            return True
+    if 'elements' in diff:
+        old, new = diff['elements']
+        return bool(set(old) - set(new))
+    return False
+
+# Names migrate.py gives its copies: the shadow being filled and the old
+# collection kept for rollback (`<Collection>__retired_<UTC time>`). Pruning
+# leaves both alone.
+SHADOW_SUFFIX = '__shadow'
+RETIRED_SUFFIX = '__retired'
+
+def is_migration_copy(name):
+    return name.endswith(SHADOW_SUFFIX) or re.search(re.escape(RETIRED_SUFFIX) + r'_\d{14}$', name) is not None
+
+# Apply order: later steps depend on earlier ones having finished
+ACTION_ORDER = [
+    'create_collection',
+    'create_attribute',
+    'update_attribute',
+    'create_relationship',
+    'delete_index',
+    'create_index',
+    'update_permissions',
+    'delete_attribute',
+    'delete_collection',
+]
+
+PLAN_SYMBOLS = {'create': '+', 'update': '~', 'delete': '-', 'unsupported': '!'}
+
+def format_permissions(permissions):
+    formatted_permissions = []
+    for perm in permissions:
+        action, role = perm.split('(')
+        role = role.strip('")')
+        if role == 'any':
+            formatted_permissions.append(getattr(Permission, action)(Role.any()))
+        elif role == 'users':
+            formatted_permissions.append(getattr(Permission, action)(Role.users()))
+        else:
+            formatted_permissions.append(getattr(Permission, action)(Role.team(role)))
+    return formatted_permissions
+
+# Appwrite stores write("x") as create/update/delete, so compare expanded sets
+def normalize_permissions(permissions):
+    normalized = set()
+    for perm in permissions:
+        action, role = perm.split('(', 1)
+        if action == 'write':
+            normalized.update(f"{expanded}({role}" for expanded in ('create', 'update', 'delete'))
+        else:
+            normalized.add(perm)
+    return normalized
+
+# Reduce a live attribute to the shape used in _dataModel.json
+def normalize_attribute(attr):
+    attr_type = attr['type']
+    if attr_type == 'string' and attr.get('format') in ('enum', 'email', 'ip', 'url'):
+        attr_type = attr['format']
+    elif attr_type == 'double':
+        attr_type = 'float'
+    spec = {
+        'key': attr['key'],
+        'type': attr_type,
+        'required': attr.get('required', False),
+        'array': attr.get('array', False),
+        'default': attr.get('default'),
+    }
+    if attr_type == 'string':
+        spec['size'] = attr.get('size')
+    elif attr_type == 'enum':
+        spec['elements'] = attr.get('elements', [])
+    elif attr_type == 'relationship':
+        spec['related_collection_id'] = attr.get('relatedCollection')
+        spec['relationship_type'] = attr.get('relationType')
+    return spec
+
+# Fields of the model attribute that differ from the live one: {field: (live, wanted)}
+def attribute_diff(wanted, live, related_collection_id=None):
+    current = normalize_attribute(live)
+    diff = {}
+    if current['type'] != wanted['type']:
+        diff['type'] = (current['type'], wanted['type'])
+    if current['array'] != wanted.get('array', False):
+        diff['array'] = (current['array'], wanted.get('array', False))
+    if wanted['type'] == 'relationship':
+        if related_collection_id and current.get('related_collection_id') != related_collection_id:
+            diff['related_collection'] = (current.get('related_collection_id'), wanted['related_collection'])
+        if current.get('relationship_type') != wanted.get('relationship_type'):
+            diff['relationship_type'] = (current.get('relationship_type'), wanted.get('relationship_type'))
+        return diff
+    if current['required'] != wanted.get('required', False):
+        diff['required'] = (current['required'], wanted.get('required', False))
+    if wanted['type'] == 'string' and current.get('size') != wanted.get('size', 255):
+        diff['size'] = (current.get('size'), wanted.get('size', 255))
+    if wanted['type'] == 'enum' and sorted(current.get('elements', [])) != sorted(wanted.get('elements', [])):
+        diff['elements'] = (current.get('elements', []), wanted.get('elements', []))
+    if 'default' in wanted and current['default'] != wanted['default']:
+        diff['default'] = (current['default'], wanted['default'])
+    return diff
+
+def index_matches(wanted, live):
+    if live['type'] != wanted['type'] or list(live['attributes']) != list(wanted['attributes']):
+        return False
+    return 'orders' not in wanted or list(live.get('orders') or []) == list(wanted['orders'])
+
+def describe_attribute(attr):
+    parts = [attr['type']]
+    if attr['type'] == 'string':
+        parts.append(f"size {attr.get('size', 255)}")
+    if attr['type'] == 'enum':
+        parts.append(f"elements {attr['elements']}")
+    if attr['type'] == 'relationship':
+        parts.append(f"{attr.get('relationship_type')} -> {attr['related_collection']}")
+    if attr.get('required'):
+        parts.append('required')
+    if attr.get('array'):
+        parts.append('array')
+    return ', '.join(parts)
+
+def change(action, collection, key=None, detail='', **extra):
+    return {'action': action, 'collection': collection, 'key': key, 'detail': detail, **extra}
+
+# The stage (see fingerprint.STAGES) a planned change belongs to
+def change_stage(item):
+    action = item['action']
+    if action == 'unsupported':
+        return 'relationships' if item['spec']['type'] == 'relationship' else 'attributes'
+    if action == 'create_relationship':
+        return 'relationships'
+    if action.endswith('_attribute'):
+        return 'attributes'
+    if action.endswith('_index'):
+        return 'indexes'
+    if action == 'update_permissions':
+        return 'permissions'
+    if action == 'create_collection':
+        return 'collection'
+    return None
+
+# Computes the minimal set of changes that bring a database in line with the
+# data model, from a single read of the live schema, and applies only those.
+class Reconciler:
+    def __init__(self, databases, database_id, catalog):
+        self.databases = databases
+        self.database_id = database_id
+        self.catalog = catalog
+
+    # With a SchemaState, stages whose part of the model is unchanged since it
+    # was last applied to the same collection are not compared at all
+    def plan(self, data_model, prune=False, state=None):
+        live_collections = self.catalog.collections
+        model_collections = {collection['name']: collection for collection in data_model['collections']}
+        plan = []
+
+        def current(collection, stage):
+            live = live_collections.get(collection['name'])
+            return state is not None and live is not None and state.is_current(collection, stage, live['$id'])
+
+        for collection in data_model['collections']:
+            name = collection['name']
+            live = live_collections.get(name)
+            if not live:
+                plan.append(change('create_collection', name, detail='new collection',
+                                   permissions=collection.get('permissions')))
+            live_attributes = {attr['key']: attr for attr in live.get('attributes', [])} if live else {}
+            live_indexes = {index['key']: index for index in live.get('indexes', [])} if live else {}
+            # Relationships are also stale when a related collection was recreated
+            related_models = [model_collections.get(attr['related_collection'], {'name': attr['related_collection']})
+                              for attr in collection['attributes'] if attr['type'] == 'relationship']
+            skip = {
+                'attributes': current(collection, 'attributes'),
+                'relationships': current(collection, 'relationships')
+                                 and all('attributes' in other and current(other, 'collection') for other in related_models),
+                'indexes': current(collection, 'indexes'),
+                'permissions': current(collection, 'permissions'),
+            }
+
+            for attr in collection['attributes']:
+                is_relationship = attr['type'] == 'relationship'
+                if skip['relationships' if is_relationship else 'attributes']:
+                    continue
+                if attr['key'] not in live_attributes:
+                    action = 'create_relationship' if is_relationship else 'create_attribute'
+                    plan.append(change(action, name, attr['key'], describe_attribute(attr), spec=attr))
+                    continue
+                related_live = live_collections.get(attr.get('related_collection')) if is_relationship else None
+                diff = attribute_diff(attr, live_attributes[attr['key']], related_live and related_live['$id'])
+                if not diff:
+                    continue
+                detail = ', '.join(f"{field} {old} -> {new}" for field, (old, new) in diff.items())
+                # A "migrate" hint means existing values must be rewritten too (e.g. re-keyed enums)
+                if (is_relationship or 'migrate' in attr or narrows(diff)
+                        or any(field not in IN_PLACE_FIELDS for field in diff)):
+                    plan.append(change('unsupported', name, attr['key'], f"{detail} (needs a migration)", spec=attr))
+                else:
+                    plan.append(change('update_attribute', name, attr['key'], detail, spec=attr,
+                                       live=live_attributes[attr['key']]))
+
+            for index in collection.get('indexes', []) if not skip['indexes'] else []:
+                if index['key'] not in live_indexes:
+                    plan.append(change('create_index', name, index['key'],
+                                       f"{index['type']} on {index['attributes']}", spec=index))
+                elif not index_matches(index, live_indexes[index['key']]):
+                    plan.append(change('delete_index', name, index['key'], 'definition changed'))
+                    plan.append(change('create_index', name, index['key'],
+                                       f"{index['type']} on {index['attributes']}", spec=index))
+
+            if live and 'permissions' in collection and not skip['permissions']:
+                wanted = format_permissions(collection['permissions'])
+                if normalize_permissions(wanted) != normalize_permissions(live.get('$permissions', [])):
+                    plan.append(change('update_permissions', name, detail=', '.join(collection['permissions']),
+                                       permissions=collection['permissions']))
+
+            if prune and live:
+                wanted_attributes = {attr['key'] for attr in collection['attributes']}
+                wanted_indexes = {index['key'] for index in collection.get('indexes', [])}
+                for key in live_indexes:
+                    if key not in wanted_indexes:
+                        plan.append(change('delete_index', name, key, 'not in data model'))
+                for key in live_attributes:
+                    if key not in wanted_attributes:
+                        plan.append(change('delete_attribute', name, key, 'not in data model'))
+
+        if prune:
+            for name in live_collections:
+                if name not in model_collections and not is_migration_copy(name):
+                    plan.append(change('delete_collection', name, detail='not in data model'))
+
+        order = {action: position for position, action in enumerate(ACTION_ORDER)}
+        return sorted(plan, key=lambda item: order.get(item['action'], len(order)))
+
+    # Remember the stages of these collections as applied, except stages with
+    # changes the plan could not make
+    def record(self, state, collections, stages=STAGES, plan=()):
+        blocked = {(item['collection'], change_stage(item)) for item in plan if item['action'] == 'unsupported'}
+        for collection in collections:
+            collection_id = self.catalog.get_collection_id(collection['name'])
+            if collection_id:
+                state.record(collection, [stage for stage in stages if (collection['name'], stage) not in blocked],
+                             collection_id)
+
+    def print_plan(self, plan):
+        counts = {'create': 0, 'update': 0, 'delete': 0, 'unsupported': 0}
+        for item in plan:
+            counts[item['action'].split('_')[0]] += 1
+        print(f"Plan: {counts['create']} to create, {counts['update']} to update, "
+              f"{counts['delete']} to delete, {counts['unsupported']} unsupported")
+        for item in plan:
+            verb, _, target = item['action'].partition('_')
+            symbol = PLAN_SYMBOLS[verb]
+            subject = f"{item['collection']}.{item['key']}" if item['key'] else item['collection']
+            print(f"  {symbol} {target or 'attribute'} {subject}: {item['detail']}")
+        if not plan:
+            print("  Database matches the data model. Nothing to do.")
+
+    # Apply a plan. Each collection's changes run as their own task on an
+    # AsyncDatabases, so independent collections are built concurrently and the
+    # run takes about as long as its slowest collection. Within a collection the
+    # plan order is kept; a relationship waits until its related collection exists.
+    async def apply_async(self, plan, adb):
+        started = time.monotonic()
+        # Load the catalog up front so collections created by one task are remembered
+        # in it, not missed by a listing another task started earlier
+        try:
+            await adb.run(lambda: self.catalog.collections)
+        except Exception as e:
+            print(f"Error listing collections: {str(e)}")
+            return False
+        created = {item['collection']: asyncio.Event() for item in plan if item['action'] == 'create_collection'}
+        outcomes = []
+        # Collections are deleted last, once nothing else can be reading the catalog
+        for batch in ([item for item in plan if item['action'] != 'delete_collection'],
+                      [item for item in plan if item['action'] == 'delete_collection']):
+            by_collection = {}
+            for item in batch:
+                by_collection.setdefault(item['collection'], []).append(item)
+            outcomes += await run_all(self.apply_collection_async(items, adb, created) for items in by_collection.values())
+        failures = sum(failed for failed, _ in outcomes)
+        print(f"Applied {len(plan) - failures} of {len(plan)} changes in {time.monotonic() - started:.1f}s")
+        return failures == 0 and all(settled for _, settled in outcomes)
+
+    async def apply_collection_async(self, items, adb, created):
+        pending = []
+        collection_id = None
+        settled = True
+        failures = 0
+        for item in items:
+            # Indexes and relationships need their attributes built first
+            if item['action'] in ('create_relationship', 'delete_index', 'create_index') and pending:
+                settled = await self.wait_for_attributes_async(adb, collection_id, pending) and settled
+                pending = []
+            if item['action'] == 'unsupported':
+                print(f"Skipping {item['collection']}.{item['key']}: {item['detail']}")
+                continue
+            try:
+                if item['action'] == 'create_relationship' and item['spec']['related_collection'] in created:
+                    await created[item['spec']['related_collection']].wait()
+                item_collection_id = None
+                if item['action'] != 'create_collection':
+                    item_collection_id = await adb.run(self.catalog.get_collection_id, item['collection'])
+                    if not item_collection_id:
+                        raise LookupError(f"collection '{item['collection']}' not found")
+                key = await adb.run(getattr(self, f"apply_{item['action']}"), item, item_collection_id)
+                if key:
+                    collection_id = item_collection_id
+                    pending.append(key)
+            except Exception as e:
+                failures += 1
+                subject = f"{item['collection']}.{item['key']}" if item['key'] else item['collection']
+                print(f"Error applying {item['action']} for {subject}: {str(e)}")
+            finally:
+                # Set even on failure, so relationships waiting on it go on to fail rather than hang
+                if item['action'] == 'create_collection':
+                    created[item['collection']].set()
+        if pending:
+            settled = await self.wait_for_attributes_async(adb, collection_id, pending) and settled
+        return failures, settled
+
+    def apply_create_collection(self, item, collection_id):
+        permissions = item.get('permissions')
+        collection = self.databases.create_collection(
+            database_id=self.database_id,
+            collection_id=ID.unique(),
+            name=item['collection'],
+            permissions=format_permissions(permissions) if permissions else None
+        )
+        print(f"Collection created: {collection['name']}")
+        self.catalog.remember(collection)
+
+    def apply_create_attribute(self, item, collection_id):
+        create_attribute(self.databases, self.database_id, collection_id, item['spec'])
+        print(f"Attribute submitted: {item['key']} (Type: {item['spec']['type']})")
+        return item['key']
+
+    def apply_update_attribute(self, item, collection_id):
+        update_attribute(self.databases, self.database_id, collection_id, item['spec'], item['live'])
+        print(f"Attribute updated: {item['key']} ({item['detail']})")
+        return item['key']
+
+    def apply_create_relationship(self, item, collection_id):
+        attr = item['spec']
+        related_id = self.catalog.get_collection_id(attr['related_collection'])
+        if not related_id:
+            raise LookupError(f"related collection '{attr['related_collection']}' not found")
+        self.databases.create_relationship_attribute(
+            database_id=self.database_id,
+            collection_id=collection_id,
+            related_collection_id=related_id,
+            type=attr['relationship_type'],
+            two_way=False,
+            key=attr['key'],
+            two_way_key='parent_' + item['collection'].lower()
+        )
+        print(f"Relationship created: {item['collection']}.{attr['key']} -> {attr['related_collection']}")
+        return attr['key']
+
+    def apply_create_index(self, item, collection_id):
+        index = item['spec']
+        self.databases.create_index(
+            database_id=self.database_id,
+            collection_id=collection_id,
+            key=index['key'],
+            type=index['type'],
+            attributes=index['attributes'],
+            orders=index.get('orders')
+        )
+        print(f"Index '{index['key']}' created for collection '{item['collection']}'")
+
+    def apply_delete_index(self, item, collection_id):
+        self.databases.delete_index(self.database_id, collection_id, item['key'])
+        # Deletion is asynchronous; wait so a replacement with the same key can be created
+        deadline = time.monotonic() + ATTRIBUTE_TIMEOUT
+        while self.databases.list_indexes(self.database_id, collection_id, queries=[Query.equal('key', item['key'])])['indexes']:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"index '{item['key']}' is still being deleted")
+            time.sleep(0.5)
+        print(f"Index '{item['key']}' deleted from collection '{item['collection']}'")
+
+    def apply_update_permissions(self, item, collection_id):
+        self.databases.update_collection(
+            database_id=self.database_id,
+            collection_id=collection_id,
+            name=item['collection'],
+            permissions=format_permissions(item['permissions'])
+        )
+        print(f"Permissions set for collection {item['collection']}")
+
+    def apply_delete_attribute(self, item, collection_id):
+        self.databases.delete_attribute(self.database_id, collection_id, item['key'])
+        print(f"Attribute '{item['key']}' deleted from collection '{item['collection']}'")
+
+    def apply_delete_collection(self, item, collection_id):
+        self.databases.delete_collection(self.database_id, collection_id)
+        print(f"Collection deleted: {item['collection']}")
+        self.catalog.invalidate()
+
+    # Appwrite builds attributes asynchronously. Poll the collection's pending
+    # attributes until they are all available or failed, backing off between
+    # polls and sleeping without holding a thread or an in-flight slot.
+    async def wait_for_attributes_async(self, adb, collection_id, keys, timeout=ATTRIBUTE_TIMEOUT):
+        started = time.monotonic()
+        delay = 0.5
+        failed = {}
+        pending = set(keys)
+        while pending:
+            try:
+                attributes = []
+                for queries in key_queries(pending):
+                    attributes += (await adb.list_attributes(self.database_id, collection_id, queries=queries))['attributes']
+                settle_attributes(attributes, pending, failed)
+            except Exception as e:
+                print(f"Error polling attributes for collection {collection_id}: {str(e)}")
+            if not pending:
+                break
+            elapsed = time.monotonic() - started
+            if elapsed >= timeout:
+                print(f"Timed out after {elapsed:.1f}s waiting for attributes: {', '.join(sorted(pending))}")
+                return False
+            await asyncio.sleep(min(delay, timeout - elapsed))
+            delay = min(delay * 2, 5.0)
+
+        for key, error in failed.items():
+            print(f"Attribute '{key}' failed: {error}")
+        print(f"Attributes of collection {collection_id} settled in {time.monotonic() - started:.1f}s ({len(failed)} failed)")
+        return not failed
+
+# Attribute and index listings stop at 25 entries by default and have no
+# cursor, so polls ask for the keys they wait on by name, in chunks of at most
+# QUERY_VALUES (Appwrite's limit on the values of one query)
+QUERY_VALUES = 100
+
+def key_queries(keys):
+    keys = sorted(keys)
+    for start in range(0, len(keys), QUERY_VALUES):
+        chunk = keys[start:start + QUERY_VALUES]
+        yield [Query.equal('key', chunk), Query.limit(len(chunk))]
+
+# Drop from `keys` the attributes that have finished building; failures are added to `failed`
+def settle_attributes(attributes, keys, failed):
+    for attr in attributes:
+        if attr['key'] not in keys:
+            continue
+        if attr.get('status') == 'available':
+            keys.discard(attr['key'])
+        elif attr.get('status') in ('failed', 'stuck'):
+            keys.discard(attr['key'])
+            failed[attr['key']] = attr.get('error') or attr['status']
+
+def create_attribute(databases, database_id, collection_id, attr):
+    attribute_type = attr['type'].lower()
+    kwargs = {
+        "database_id": database_id,
+        "collection_id": collection_id,
+        "key": attr['key'],
+        "required": attr.get('required', False),
+        # Array-ness is fixed at creation time; Appwrite has no call to change it later
+        "array": attr.get('array', False)
+    }
+    if 'default' in attr:
+        kwargs['default'] = attr['default']
+
+    if attribute_type == 'string':
+        databases.create_string_attribute(**kwargs, size=attr.get('size', 255))
+    elif attribute_type == 'integer':
+        databases.create_integer_attribute(**kwargs)
+    elif attribute_type == 'float':
+        databases.create_float_attribute(**kwargs)
+    elif attribute_type == 'boolean':
+        databases.create_boolean_attribute(**kwargs)
+    elif attribute_type == 'datetime':
+        databases.create_datetime_attribute(**kwargs)
+    elif attribute_type == 'enum':
+        databases.create_enum_attribute(**kwargs, elements=attr['elements'])
+    elif attribute_type == 'ip':
+        databases.create_ip_attribute(**kwargs)
+    elif attribute_type == 'email':
+        databases.create_email_attribute(**kwargs)
+    elif attribute_type == 'url':
+        databases.create_url_attribute(**kwargs)
+    else:
+        raise ValueError(f"Unsupported attribute type: {attr['type']}")
+
+def update_attribute(databases, database_id, collection_id, attr, live):
+    attribute_type = attr['type'].lower()
+    kwargs = {
+        "database_id": database_id,
+        "collection_id": collection_id,
+        "key": attr['key'],
+        "required": attr.get('required', False),
+        "default": attr.get('default', live.get('default'))
+    }
+
+    if attribute_type == 'string':
+        databases.update_string_attribute(**kwargs, size=attr.get('size', 255))
+    elif attribute_type == 'integer':
+        databases.update_integer_attribute(**kwargs, min=attr.get('min', live.get('min')), max=attr.get('max', live.get('max')))
+    elif attribute_type == 'float':
+        databases.update_float_attribute(**kwargs, min=attr.get('min', live.get('min')), max=attr.get('max', live.get('max')))
+    elif attribute_type == 'boolean':
+        databases.update_boolean_attribute(**kwargs)
+    elif attribute_type == 'datetime':
+        databases.update_datetime_attribute(**kwargs)
+    elif attribute_type == 'enum':
+        databases.update_enum_attribute(**kwargs, elements=attr['elements'])
+    elif attribute_type == 'ip':
+        databases.update_ip_attribute(**kwargs)
+    elif attribute_type == 'email':
+        databases.update_email_attribute(**kwargs)
+    elif attribute_type == 'url':
+        databases.update_url_attribute(**kwargs)
+    else:
+        raise ValueError(f"Unsupported attribute type: {attr['type']}")
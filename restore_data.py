@@ -0,0 +1,195 @@
+import os
+import json
+import argparse
+from dotenv import load_dotenv
+from appwrite.services.databases import Databases
+from catalog import CollectionCatalog
+from bulk_writer import BulkWriter
+from dag import run_dag, print_timings
+from sample_data import seeding_order
+from snapshot import read_manifest, read_shard, schema_hash
+from overflow import overflow_store
+from journal import open_journal, BatchProgress
+from appwrite_client import get_client
+
+# Load environment variables
+load_dotenv()
+
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
+
+# Initialize the database service
+databases = Databases(client)
+
+# Use the database ID from environment variables
+DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
+
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
+
+def load_data_model():
+    with open('_dataModel.json', 'r') as f:
+        return json.load(f)
+
+def iter_snapshot(directory, entry):
+    for shard in entry['shards']:
+        yield from read_shard(directory, shard)
+
+# Document data for the first pass: ID, permissions, attributes and the
+# relationships whose related documents are already restored
+def restore_document(document, keys):
+    data = {'$id': document['$id'], '$permissions': document.get('$permissions', [])}
+    for key in keys:
+        if key in document and document[key] is not None:
+            data[key] = document[key]
+    return data
+
+# With a journal, snapshot documents in batches an earlier run finished are
+# skipped; the rest are sent again, and those that already exist count as restored
+def restore_collection(collection, directory, entry, writer, deferred, restoring, results, journal=None, resume=False):
+    name = collection['name']
+    collection_id = catalog.get_collection_id(name)
+    if not collection_id:
+        print(f"Failed to restore {name}: Collection not found")
+        return False
+    if journal is not None and journal.is_finished(name, 'restore'):
+        print(f"{name} was already restored by the earlier run. Skipping.")
+        return True
+    keys = [attr['key'] for attr in collection['attributes']
+            if attr['type'] != 'relationship'
+            or ((name, attr['key']) not in deferred and attr['related_collection'] in restoring)]
+    progress = BatchProgress(journal, name, 'restore') if journal else None
+    documents = (restore_document(document, keys) for document in iter_progress(iter_snapshot(directory, entry), progress))
+    try:
+        stats = writer.create_documents(name, collection_id, documents, on_success=progress.done if progress else None,
+                                        exists_ok=resume)
+        results.append(stats)
+        if progress is not None:
+            progress.finish()
+            if stats.errors == 0:
+                journal.finish(name, 'restore')
+    except Exception as e:
+        print(f"Error restoring {name}: {str(e)}")
+        return False
+    return True
+
+# Snapshot documents not yet journaled as done, registered with `progress`
+def iter_progress(documents, progress=None):
+    for index, document in enumerate(documents):
+        if progress is not None:
+            if not progress.is_pending(index):
+                continue
+            progress.start(document['$id'], index)
+        yield document
+
+# Relationship updates for one collection's snapshot. Documents without any are
+# done straight away, so their batch can still be journaled.
+def relink_updates(documents, keys, progress=None):
+    for document in iter_progress(documents, progress):
+        values = {key: document[key] for key in keys if document.get(key)}
+        if values:
+            yield document['$id'], values
+        elif progress is not None:
+            progress.done(document['$id'])
+
+# Second pass: relationships that could not be set at create time (self
+# references and cycles) are replayed as updates once every document exists
+def relink_relationships(data_model, directory, manifest, writer, deferred, results, journal=None):
+    ok = True
+    restoring = {collection['name'] for collection in data_model['collections']}
+    for collection in data_model['collections']:
+        name = collection['name']
+        entry = manifest['collections'].get(name)
+        keys = [attr['key'] for attr in collection['attributes']
+                if (name, attr['key']) in deferred and attr['related_collection'] in restoring]
+        if not entry or not keys:
+            continue
+        collection_id = catalog.get_collection_id(name)
+        progress = BatchProgress(journal, name, 'relink') if journal else None
+        updates = relink_updates(iter_snapshot(directory, entry), keys, progress)
+        try:
+            results.append(writer.update_documents(f"{name} relationships", collection_id, updates,
+                                                   on_success=progress.done if progress else None))
+            if progress is not None:
+                progress.finish()
+        except Exception as e:
+            print(f"Error relinking {name}: {str(e)}")
+            ok = False
+    return ok
+
+def restore_data(directory, collections=None, workers=4, concurrency=32, adaptive=True, force=False, resume=False):
+    data_model = load_data_model()
+    manifest = read_manifest(directory)
+    if manifest['schema_hash'] != schema_hash(data_model):
+        if not force:
+            print("The snapshot was taken with a different _dataModel.json. Use --force to restore anyway.")
+            return False
+        print("Warning: the snapshot was taken with a different _dataModel.json.")
+
+    wanted = [c for c in data_model['collections']
+              if c['name'] in manifest['collections'] and (not collections or c['name'] in collections)]
+    restoring = {c['name'] for c in wanted}
+    _, deferred = seeding_order(data_model)
+    # A partial restore leaves relationships into the other collections unset:
+    # the related documents may not exist on the target
+    outside = [f"{c['name']}.{attr['key']}" for c in wanted for attr in c['attributes']
+               if attr['type'] == 'relationship' and attr['related_collection'] not in restoring]
+    if outside:
+        print(f"Not restoring relationships to collections outside this restore: {', '.join(outside)}")
+    # Long values in the snapshot go back to the overflow bucket as they are restored
+    writer = BulkWriter(databases, DATABASE_ID, concurrency=concurrency, adaptive=adaptive,
+                        overflow=overflow_store(client, data_model))
+    results = []
+    try:
+        journal = open_journal('restore', DATABASE_ID, {'directory': os.path.abspath(directory),
+                                                        'created_at': manifest.get('created_at')}, resume)
+    except (OSError, ValueError) as e:
+        print(f"Error opening journal: {str(e)}")
+        return False
+
+    # Collections restore in parallel, each after the collections it points to
+    nodes = {}
+    for collection in wanted:
+        name = collection['name']
+        first = sorted({attr['related_collection'] for attr in collection['attributes']
+                        if attr['type'] == 'relationship' and (name, attr['key']) not in deferred
+                        and attr['related_collection'] in restoring and attr['related_collection'] != name})
+        entry = manifest['collections'][name]
+        nodes[f'restore:{name}'] = (
+            [f'restore:{other}' for other in first],
+            lambda collection=collection, entry=entry: restore_collection(collection, directory, entry, writer, deferred, restoring,
+                                                                          results, journal, resume)
+        )
+    timings = run_dag(nodes, max_workers=workers)
+    ok = all(result['status'] == 'ok' for result in timings.values())
+    ok = relink_relationships({'collections': wanted}, directory, manifest, writer, deferred, results, journal) and ok
+    if journal is not None:
+        journal.close()
+
+    print_timings(timings)
+    print("Restore summary:")
+    for stats in results:
+        print(f"  {stats.summary()}")
+    return ok and all(stats.errors == 0 for stats in results)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Restore a snapshot written by export_data.py")
+    parser.add_argument('directory', help="snapshot directory containing manifest.json")
+    parser.add_argument('collections', nargs='*', help="collections to restore (default: every collection in the snapshot)")
+    parser.add_argument('--workers', type=int, default=4, help="collections restored in parallel (default: 4)")
+    parser.add_argument('--concurrency', type=int, default=32, help="maximum parallel create_document calls per collection (default: 32)")
+    parser.add_argument('--fixed-concurrency', action='store_true', help="always run --concurrency calls instead of adapting to throttling")
+    parser.add_argument('--resume', action='store_true', help="continue an interrupted restore, skipping what its journal records as done")
+    parser.add_argument('--force', action='store_true', help="restore even if the snapshot's schema differs from _dataModel.json")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Restoring from {args.directory}...")
+    ok = restore_data(args.directory, args.collections, args.workers, args.concurrency, not args.fixed_concurrency, args.force,
+                      args.resume)
+    client.print_pool_stats()
+    if not ok:
+        print("Restore finished with errors.")
+        raise SystemExit(1)
+    print("Restore completed.")
@@ -0,0 +1,144 @@
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 30.0
+
+# Statuses worth retrying: throttling, timeouts and server-side failures.
+# Every other 4xx (bad request, not found, conflict, ...) is permanent.
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Statuses that mean the server is overloaded; adaptive concurrency backs off on these
+THROTTLE_STATUS = {429, 503}
+
+# Seconds to wait according to Retry-After (seconds or an HTTP date), falling
+# back to Appwrite's X-RateLimit-Reset (epoch seconds). None if neither is set.
+def retry_after_seconds(headers):
+    value = headers.get('Retry-After')
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    reset = headers.get('X-RateLimit-Reset')
+    if reset:
+        try:
+            return max(float(reset) - time.time(), 0.0)
+        except ValueError:
+            pass
+    return None
+
+# Request parameters that name the resource a POST creates. Appwrite serves
+# the created resource at <path>/<id>.
+ID_PARAMS = ('documentId', 'collectionId', 'databaseId', 'bucketId', 'fileId')
+
+# Where the resource created by a POST can be read back, or None when the
+# request doesn't name it. Only such creates are safe to repeat: a repeat
+# can't duplicate data, it can only find the resource already there (409).
+def created_path(method, path, params):
+    if method != 'post':
+        return None
+    for name in ID_PARAMS:
+        value = params.get(name)
+        if value:
+            return None if value == 'unique()' else f"{path}/{value}"
+    key = params.get('key')
+    if key and '/attributes/' in path:
+        # POST .../attributes/<type> creates .../attributes/<key>
+        return f"{path.rsplit('/', 1)[0]}/{key}"
+    if key and path.endswith('/indexes'):
+        return f"{path}/{key}"
+    return None
+
+# Shared retry policy for every request the client sends. Transport errors
+# (status 0) and RETRYABLE_STATUS are retried with capped exponential backoff
+# and full jitter, never sooner than the server's Retry-After. Only idempotent
+# requests are retried: GET, PUT, PATCH and DELETE, and creates that name
+# their resource (see created_path).
+class RetryPolicy:
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Count of throttled responses seen so far; adaptive limits watch it
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify(status):
+        return 'retryable' if status == 0 or status in RETRYABLE_STATUS else 'permanent'
+
+    def should_retry(self, status, attempt, idempotent=True):
+        return idempotent and attempt < self.max_retries and self.classify(status) == 'retryable'
+
+    def note(self, status):
+        if status in THROTTLE_STATUS:
+            with self._lock:
+                self.throttled += 1
+
+    def delay(self, attempt, retry_after=None):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return max(min(retry_after, self.max_delay), backoff)
+        return backoff
+
+# Policy from APPWRITE_MAX_RETRIES, APPWRITE_RETRY_BASE_DELAY and APPWRITE_RETRY_MAX_DELAY
+def policy_from_env():
+    return RetryPolicy(
+        max_retries=int(os.getenv('APPWRITE_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+        base_delay=float(os.getenv('APPWRITE_RETRY_BASE_DELAY', DEFAULT_BASE_DELAY)),
+        max_delay=float(os.getenv('APPWRITE_RETRY_MAX_DELAY', DEFAULT_MAX_DELAY))
+    )
+
+# Concurrency limit that adapts AIMD-style. It starts low and doubles every
+# window (a limit's worth of completed requests) until the server first
+# throttles. From then on it grows by one slot per window and halves on
+# throttling, at most once per window so one burst of 429s counts as a single
+# signal. With `throttled` unset the limit stays fixed at `maximum`.
+class AdaptiveLimit:
+    def __init__(self, maximum, throttled=None, initial=4, minimum=1):
+        self.maximum = max(1, maximum)
+        self.minimum = min(minimum, self.maximum)
+        self.throttled = throttled
+        self.limit = float(min(initial, self.maximum)) if throttled else float(self.maximum)
+        self.in_flight = 0
+        self.decreases = 0
+        self._seen = throttled() if throttled else 0
+        self._slow_start = True
+        self._since_decrease = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            if self.throttled:
+                self._adjust()
+            self._condition.notify_all()
+
+    def _adjust(self):
+        seen = self.throttled()
+        self._since_decrease += 1
+        if seen != self._seen:
+            self._seen = seen
+            if self._since_decrease >= self.limit:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._since_decrease = 0
+                self._slow_start = False
+                self.decreases += 1
+        elif self._slow_start:
+            self.limit = min(self.maximum, self.limit + 1)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
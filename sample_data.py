@@ -0,0 +1,75 @@
+import random
+from datagen import CollectionGenerator
+from journal import BatchProgress
+
+# Picks related document IDs for one relationship attribute from an in-memory
+# pool. For oneToOne/oneToMany each related document may only have one parent,
+# so IDs are handed out without replacement.
+class RelationshipPicker:
+    def __init__(self, attr, related_ids):
+        relationship_type = attr.get('relationship_type', 'oneToMany')
+        self.many = relationship_type in ('oneToMany', 'manyToMany')
+        self.exclusive = relationship_type in ('oneToOne', 'oneToMany')
+        self.related_ids = list(related_ids)
+        if self.exclusive:
+            random.shuffle(self.related_ids)
+
+    def pick(self):
+        if not self.related_ids:
+            related_id = None
+        elif self.exclusive:
+            related_id = self.related_ids.pop()
+        else:
+            related_id = random.choice(self.related_ids)
+        if self.many:
+            return [related_id] if related_id else []
+        return related_id
+
+# Order collections so that related collections are seeded first, letting
+# relationship values be set when a document is created. Relationships that
+# can't be ordered that way (self references, cycles) are returned as
+# (collection, key) pairs to fill in with updates afterwards.
+def seeding_order(data_model):
+    by_name = {collection['name']: collection for collection in data_model['collections']}
+    ordered, deferred, visiting, done = [], set(), set(), set()
+
+    def visit(collection):
+        visiting.add(collection['name'])
+        for attr in collection['attributes']:
+            if attr['type'] != 'relationship':
+                continue
+            related = by_name.get(attr['related_collection'])
+            if related is None or related['name'] in visiting:
+                deferred.add((collection['name'], attr['key']))
+            elif related['name'] not in done:
+                visit(related)
+        visiting.discard(collection['name'])
+        done.add(collection['name'])
+        ordered.append(collection)
+
+    for collection in data_model['collections']:
+        if collection['name'] not in done:
+            visit(collection)
+    return ordered, deferred
+
+# Documents for one collection, generated in column batches by a compiled
+# generator (see datagen.py); relationship values come from the pickers
+def generate_documents(collection, num_documents, pickers=None, generator=None):
+    generator = generator or CollectionGenerator(collection)
+    return generator.documents(num_documents, pickers)
+
+# Create generated documents in a collection. With a journal, only the batches
+# an earlier run did not finish are generated and written, under IDs that are
+# stable across runs, so documents already created count as done.
+def seed_documents(writer, collection, collection_id, num_documents, pickers=None, generator=None, journal=None):
+    if journal is None:
+        documents = generate_documents(collection, num_documents, pickers, generator)
+        return writer.create_documents(collection['name'], collection_id, documents)
+    progress = BatchProgress(journal, collection['name'], 'create')
+    remaining = progress.remaining(num_documents)
+    if remaining < num_documents:
+        print(f"{collection['name']}: {num_documents - remaining} documents already seeded, {remaining} to go")
+    documents = progress.track(generate_documents(collection, remaining, pickers, generator), num_documents)
+    stats = writer.create_documents(collection['name'], collection_id, documents, on_success=progress.done, exists_ok=True)
+    progress.finish()
+    return stats
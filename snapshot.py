@@ -0,0 +1,211 @@
+import os
+import gzip
+import json
+import queue
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+# zstandard is optional; gzip is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+DEFAULT_SHARD_SIZE = 256 * 1024 * 1024
+EXTENSIONS = {'zstd': '.ndjson.zst', 'gzip': '.ndjson.gz'}
+
+def default_compression():
+    return 'zstd' if zstandard is not None else 'gzip'
+
+# Hash of the data model, so a restore can tell whether a snapshot was taken
+# from the same schema
+def schema_hash(data_model):
+    canonical = json.dumps(data_model, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+# Binary file wrapper that hashes (and counts) the compressed bytes as they are
+# written or read, so checksums cost no second pass over the file
+class HashingFile:
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        self.raw.flush()
+
+    def close(self):
+        self.raw.close()
+
+    @property
+    def closed(self):
+        return self.raw.closed
+
+def open_compressed_writer(raw, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=1)
+
+def open_compressed_reader(raw, path):
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode='rb')
+
+# Writes one collection's documents as numbered NDJSON shards, starting a new
+# shard after `shard_size` uncompressed bytes. Only one shard is open at a time.
+class ShardWriter:
+    def __init__(self, directory, collection_name, compression=None, shard_size=DEFAULT_SHARD_SIZE):
+        self.directory = directory
+        self.collection_name = collection_name
+        self.compression = compression or default_compression()
+        self.shard_size = shard_size
+        self.shards = []
+        self.count = 0
+        self._raw = self._stream = None
+        self._shard_count = self._shard_bytes = 0
+        os.makedirs(os.path.join(directory, collection_name), exist_ok=True)
+
+    def _open(self):
+        name = f"part-{len(self.shards):05d}{EXTENSIONS[self.compression]}"
+        self._file = os.path.join(self.collection_name, name)
+        self._raw = HashingFile(open(os.path.join(self.directory, self._file), 'wb'))
+        self._stream = open_compressed_writer(self._raw, self.compression)
+        self._shard_count = self._shard_bytes = 0
+
+    def _close(self):
+        self._stream.close()
+        self._raw.close()
+        self.shards.append({
+            'file': self._file,
+            'count': self._shard_count,
+            'bytes': self._raw.size,
+            'sha256': self._raw.sha256.hexdigest(),
+        })
+        self._raw = self._stream = None
+
+    def write(self, document):
+        if self._stream is None:
+            self._open()
+        line = (json.dumps(document, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        self._stream.write(line)
+        self._shard_count += 1
+        self._shard_bytes += len(line)
+        self.count += 1
+        if self._shard_bytes >= self.shard_size:
+            self._close()
+
+    def close(self):
+        if self._stream is not None:
+            self._close()
+        return {'count': self.count, 'shards': self.shards}
+
+class ChecksumError(Exception):
+    pass
+
+# Documents from one shard, one line at a time. The checksum is verified once
+# the shard has been read to the end.
+def read_shard(directory, shard):
+    path = os.path.join(directory, shard['file'])
+    with open(path, 'rb') as f:
+        raw = HashingFile(f)
+        with open_compressed_reader(raw, path) as stream:
+            for line in stream_lines(stream):
+                yield json.loads(line)
+        # Drain anything the decompressor did not need, so the whole file is hashed
+        while raw.read(1 << 20):
+            pass
+    if shard.get('sha256') and raw.sha256.hexdigest() != shard['sha256']:
+        raise ChecksumError(f"{shard['file']} does not match the manifest checksum")
+
+def stream_lines(stream):
+    buffered = b''
+    while True:
+        chunk = stream.read(1 << 20)
+        if not chunk:
+            break
+        lines = (buffered + chunk).split(b'\n')
+        buffered = lines.pop()
+        for line in lines:
+            if line:
+                yield line
+    if buffered:
+        yield buffered
+
+def write_manifest(directory, database_id, data_model, collections, compression):
+    manifest = {
+        'version': FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'database_id': database_id,
+        'schema_hash': schema_hash(data_model),
+        'compression': compression,
+        'collections': collections,
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST), 'r') as f:
+        return json.load(f)
+
+# Run an iterator on a background thread, keeping up to `depth` items ready, so
+# fetching the next page overlaps with compressing the current one
+def prefetch(iterable, depth=2):
+    items = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        items.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            items.put(done)
+        except Exception as e:
+            items.put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,658 @@
+import re
+import json
+import gzip
+import time
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# A local, in-memory stand-in for the Appwrite Databases endpoints these scripts
+# use (and the Storage endpoints behind overflow attributes), for measuring request counts and timings without a real server. It
+# supports per-request latency, injected 503/429 errors, and attributes/indexes
+# that stay 'processing' for a while before becoming 'available', like Appwrite.
+
+ID_CHARS = '0123456789abcdef'
+
+class ApiError(Exception):
+    def __init__(self, code, message, error_type='general_argument_invalid'):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.type = error_type
+
+def now():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+def new_id(requested=None):
+    if requested and requested != 'unique()':
+        return requested
+    return ''.join(random.choice(ID_CHARS) for _ in range(20))
+
+# Evaluate one Appwrite query filter against a document
+def matches(doc, query):
+    method, attribute, values = query['method'], query.get('attribute'), query.get('values') or []
+    if method == 'and':
+        return all(matches(doc, q) for q in values)
+    if method == 'or':
+        return any(matches(doc, q) for q in values)
+    value = doc.get(attribute)
+    items = value if isinstance(value, list) else [value]
+    if method == 'equal':
+        return any(item in values for item in items)
+    if method == 'notEqual':
+        return all(item not in values for item in items)
+    if method == 'isNull':
+        return value is None
+    if method == 'isNotNull':
+        return value is not None
+    if value is None:
+        return False
+    if method == 'lessThan':
+        return value < values[0]
+    if method == 'lessThanEqual':
+        return value <= values[0]
+    if method == 'greaterThan':
+        return value > values[0]
+    if method == 'greaterThanEqual':
+        return value >= values[0]
+    if method == 'between':
+        return values[0] <= value <= values[1]
+    if method == 'startsWith':
+        return str(value).startswith(values[0])
+    if method == 'endsWith':
+        return str(value).endswith(values[0])
+    if method == 'contains':
+        if isinstance(value, list):
+            return any(item in value for item in values)
+        return any(str(item) in str(value) for item in values)
+    if method == 'search':
+        words = str(values[0]).lower().split()
+        text = str(value).lower()
+        return any(word in text for word in words)
+    raise ApiError(400, f"Invalid query method: {method}", 'general_query_invalid')
+
+class StandInState:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, attribute_delay=0.0, seed=None,
+                 max_in_flight=0, lost_response_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Fraction of writes that are applied but answered with 503, as when a response is lost
+        self.lost_response_rate = lost_response_rate
+        self.throttle_rate = throttle_rate
+        self.attribute_delay = attribute_delay
+        # Requests beyond this many in flight are answered with 429 (0 = no limit)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.databases = {}
+        self.buckets = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {}
+
+    def record(self, endpoint, bytes_in, bytes_out, status):
+        with self.lock:
+            entry = self.stats.setdefault(endpoint, {'requests': 0, 'bytes_in': 0, 'bytes_out': 0, 'errors': 0})
+            entry['requests'] += 1
+            entry['bytes_in'] += bytes_in
+            entry['bytes_out'] += bytes_out
+            if status >= 400:
+                entry['errors'] += 1
+
+    def totals(self):
+        with self.lock:
+            totals = {'requests': 0, 'bytes_in': 0, 'bytes_out': 0, 'errors': 0}
+            for entry in self.stats.values():
+                for field in totals:
+                    totals[field] += entry[field]
+            return totals
+
+    # Attributes and indexes report 'processing' until attribute_delay has passed
+    def status(self, item):
+        if item['status'] == 'processing' and time.monotonic() - item['_created'] >= self.attribute_delay:
+            item['status'] = 'available'
+        return item['status']
+
+    def database(self, database_id):
+        database = self.databases.get(database_id)
+        if database is None:
+            raise ApiError(404, 'Database not found', 'database_not_found')
+        return database
+
+    def collection(self, database_id, collection_id):
+        collection = self.database(database_id)['collections'].get(collection_id)
+        if collection is None:
+            raise ApiError(404, 'Collection with the requested ID could not be found.', 'collection_not_found')
+        return collection
+
+    def bucket(self, bucket_id):
+        bucket = self.buckets.get(bucket_id)
+        if bucket is None:
+            raise ApiError(404, 'Storage bucket with the requested ID could not be found.', 'storage_bucket_not_found')
+        return bucket
+
+    def public(self, item):
+        return {key: value for key, value in item.items() if not key.startswith('_')}
+
+    def collection_view(self, collection):
+        view = self.public(collection)
+        view['attributes'] = [self.attribute_view(attr) for attr in collection['_attributes'].values()]
+        view['indexes'] = [self.index_view(index) for index in collection['_indexes'].values()]
+        return view
+
+    def attribute_view(self, attr):
+        self.status(attr)
+        return self.public(attr)
+
+    def index_view(self, index):
+        self.status(index)
+        return self.public(index)
+
+ROUTES = []
+
+def route(method, pattern):
+    def register(fn):
+        # Requests are counted per endpoint, named like /databases/{db}/collections
+        template = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'{\1}', pattern)
+        ROUTES.append((method, re.compile('^' + pattern + '$'), template, fn))
+        return fn
+    return register
+
+def paginate_items(items, queries, id_key='$id'):
+    limit, offset, cursor, cursor_before = 25, 0, None, None
+    filters, orders, select = [], [], None
+    for query in queries:
+        method = query['method']
+        if method == 'limit':
+            limit = query['values'][0]
+        elif method == 'offset':
+            offset = query['values'][0]
+        elif method == 'cursorAfter':
+            cursor = query['values'][0]
+        elif method == 'cursorBefore':
+            cursor_before = query['values'][0]
+        elif method == 'select':
+            select = query['values']
+        elif method in ('orderAsc', 'orderDesc'):
+            orders.append((query['attribute'], method == 'orderDesc'))
+        else:
+            filters.append(query)
+    items = [item for item in items if all(matches(item, q) for q in filters)]
+    for attribute, descending in reversed(orders):
+        items.sort(key=lambda item: (item.get(attribute) is None, item.get(attribute)), reverse=descending)
+    total = len(items)
+    if cursor is not None or cursor_before is not None:
+        ids = [item.get(id_key) for item in items]
+        target = cursor if cursor is not None else cursor_before
+        if target not in ids:
+            raise ApiError(400, f"Document '{target}' for the 'cursor' value not found.", 'general_cursor_not_found')
+        position = ids.index(target)
+        items = items[position + 1:] if cursor is not None else items[:position][-limit:]
+    items = items[offset:offset + limit]
+    if select:
+        items = [{key: value for key, value in item.items() if key in select or key == '$id'} for item in items]
+    return total, items
+
+@route('POST', r'/databases')
+def create_database(state, params, body):
+    database_id = new_id(body.get('databaseId'))
+    if database_id in state.databases:
+        raise ApiError(409, 'Database already exists', 'database_already_exists')
+    state.databases[database_id] = {'$id': database_id, 'name': body.get('name'), 'collections': {}}
+    return 201, {'$id': database_id, 'name': body.get('name'), '$createdAt': now(), '$updatedAt': now(), 'enabled': True}
+
+@route('GET', r'/databases/(?P<db>[^/]+)')
+def get_database(state, params, body, db):
+    database = state.database(db)
+    return 200, {'$id': database['$id'], 'name': database['name'], 'enabled': True}
+
+@route('GET', r'/databases/(?P<db>[^/]+)/collections')
+def list_collections(state, params, body, db):
+    collections = [state.collection_view(c) for c in state.database(db)['collections'].values()]
+    total, items = paginate_items(collections, params['queries'])
+    return 200, {'total': total, 'collections': items}
+
+@route('POST', r'/databases/(?P<db>[^/]+)/collections')
+def create_collection(state, params, body, db):
+    collections = state.database(db)['collections']
+    collection_id = new_id(body.get('collectionId'))
+    if collection_id in collections:
+        raise ApiError(409, 'Collection already exists', 'collection_already_exists')
+    collection = {
+        '$id': collection_id, '$createdAt': now(), '$updatedAt': now(),
+        '$permissions': body.get('permissions') or [], 'databaseId': db, 'name': body['name'],
+        'enabled': body.get('enabled', True), 'documentSecurity': body.get('documentSecurity', False),
+        '_attributes': {}, '_indexes': {}, '_documents': {},
+    }
+    collections[collection_id] = collection
+    return 201, state.collection_view(collection)
+
+@route('GET', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)')
+def get_collection(state, params, body, db, cid):
+    return 200, state.collection_view(state.collection(db, cid))
+
+@route('PUT', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)')
+def update_collection(state, params, body, db, cid):
+    collection = state.collection(db, cid)
+    collection['name'] = body.get('name', collection['name'])
+    if 'permissions' in body:
+        collection['$permissions'] = body['permissions']
+    collection['$updatedAt'] = now()
+    return 200, state.collection_view(collection)
+
+@route('DELETE', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)')
+def delete_collection(state, params, body, db, cid):
+    state.collection(db, cid)
+    del state.database(db)['collections'][cid]
+    return 204, None
+
+@route('GET', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/attributes')
+def list_attributes(state, params, body, db, cid):
+    collection = state.collection(db, cid)
+    attributes = [state.attribute_view(attr) for attr in collection['_attributes'].values()]
+    total, attributes = paginate_items(attributes, params['queries'], 'key')
+    return 200, {'total': total, 'attributes': attributes}
+
+@route('POST', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/attributes/(?P<kind>[a-z]+)')
+def create_attribute(state, params, body, db, cid, kind):
+    collection = state.collection(db, cid)
+    key = body['key']
+    if key in collection['_attributes']:
+        raise ApiError(409, 'Attribute with the requested key already exists.', 'attribute_already_exists')
+    attr = {'key': key, 'type': kind, 'status': 'processing', 'error': '', 'required': body.get('required', False),
+            'array': body.get('array', False), '_created': time.monotonic()}
+    if kind == 'float':
+        attr['type'] = 'double'
+    if kind in ('enum', 'email', 'ip', 'url'):
+        attr['type'] = 'string'
+        attr['format'] = kind
+    if kind == 'enum':
+        attr['elements'] = body['elements']
+    if kind == 'string':
+        attr['size'] = body['size']
+    if kind == 'relationship':
+        attr.update({'key': key, 'relatedCollection': body['relatedCollectionId'], 'relationType': body['type'],
+                     'twoWay': body.get('twoWay', False), 'twoWayKey': body.get('twoWayKey'),
+                     'onDelete': body.get('onDelete', 'restrict'), 'side': 'parent', 'required': False, 'array': False})
+        state.collection(db, body['relatedCollectionId'])
+    if kind in ('integer', 'float'):
+        attr['min'] = body.get('min')
+        attr['max'] = body.get('max')
+    if 'default' in body:
+        attr['default'] = body['default']
+    collection['_attributes'][key] = attr
+    return 202, state.attribute_view(attr)
+
+@route('PATCH', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/attributes/(?P<kind>[a-z]+)/(?P<key>[^/]+)')
+def update_attribute(state, params, body, db, cid, kind, key):
+    attr = state.collection(db, cid)['_attributes'].get(key)
+    if attr is None:
+        raise ApiError(404, 'Attribute with the requested ID could not be found.', 'attribute_not_found')
+    for field in ('required', 'default', 'size', 'elements', 'min', 'max'):
+        if field in body:
+            attr[field] = body[field]
+    return 200, state.attribute_view(attr)
+
+@route('DELETE', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/attributes/(?P<key>[^/]+)')
+def delete_attribute(state, params, body, db, cid, key):
+    collection = state.collection(db, cid)
+    if collection['_attributes'].pop(key, None) is None:
+        raise ApiError(404, 'Attribute with the requested ID could not be found.', 'attribute_not_found')
+    for document in collection['_documents'].values():
+        document.pop(key, None)
+    return 204, None
+
+@route('GET', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/attributes/(?P<key>[^/]+)')
+def get_attribute(state, params, body, db, cid, key):
+    attr = state.collection(db, cid)['_attributes'].get(key)
+    if attr is None:
+        raise ApiError(404, 'Attribute with the requested ID could not be found.', 'attribute_not_found')
+    return 200, state.attribute_view(attr)
+
+@route('GET', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/indexes/(?P<key>[^/]+)')
+def get_index(state, params, body, db, cid, key):
+    index = state.collection(db, cid)['_indexes'].get(key)
+    if index is None:
+        raise ApiError(404, 'Index not found', 'index_not_found')
+    return 200, state.index_view(index)
+
+@route('GET', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/indexes')
+def list_indexes(state, params, body, db, cid):
+    indexes = [state.index_view(index) for index in state.collection(db, cid)['_indexes'].values()]
+    total, indexes = paginate_items(indexes, params['queries'], 'key')
+    return 200, {'total': total, 'indexes': indexes}
+
+@route('POST', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/indexes')
+def create_index(state, params, body, db, cid):
+    collection = state.collection(db, cid)
+    if body['key'] in collection['_indexes']:
+        raise ApiError(409, 'Index with the requested key already exists.', 'index_already_exists')
+    for attribute in body['attributes']:
+        attr = collection['_attributes'].get(attribute)
+        if attr is None or state.status(attr) != 'available':
+            raise ApiError(400, f"Attribute '{attribute}' is not available.", 'attribute_not_available')
+    index = {'key': body['key'], 'type': body['type'], 'status': 'processing', 'error': '',
+             'attributes': body['attributes'], 'orders': body.get('orders') or [], '_created': time.monotonic()}
+    collection['_indexes'][body['key']] = index
+    return 202, state.index_view(index)
+
+@route('DELETE', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/indexes/(?P<key>[^/]+)')
+def delete_index(state, params, body, db, cid, key):
+    if state.collection(db, cid)['_indexes'].pop(key, None) is None:
+        raise ApiError(404, 'Index not found', 'index_not_found')
+    return 204, None
+
+def check_document(collection, data, partial=False):
+    attributes = collection['_attributes']
+    for key in data:
+        if key not in attributes:
+            raise ApiError(400, f'Invalid document structure: Unknown attribute: "{key}"', 'document_invalid_structure')
+    if not partial:
+        for key, attr in attributes.items():
+            if attr.get('required') and data.get(key) is None:
+                raise ApiError(400, f'Invalid document structure: Missing required attribute "{key}"', 'document_invalid_structure')
+    for key, value in data.items():
+        attr = attributes[key]
+        if attr['type'] == 'string' and value is not None and 'size' in attr:
+            for item in (value if isinstance(value, list) else [value]):
+                if len(str(item)) > attr['size']:
+                    raise ApiError(400, f'Invalid document structure: Attribute "{key}" has invalid length', 'document_invalid_structure')
+
+@route('GET', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/documents')
+def list_documents(state, params, body, db, cid):
+    documents = list(state.collection(db, cid)['_documents'].values())
+    total, items = paginate_items(documents, params['queries'])
+    return 200, {'total': total, 'documents': items}
+
+@route('POST', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/documents')
+def create_document(state, params, body, db, cid):
+    collection = state.collection(db, cid)
+    document_id = new_id(body.get('documentId'))
+    if document_id in collection['_documents']:
+        raise ApiError(409, 'Document with the requested ID already exists.', 'document_already_exists')
+    data = body.get('data') or {}
+    if isinstance(data, str):
+        data = json.loads(data)
+    check_document(collection, data)
+    document = {'$id': document_id, '$collectionId': cid, '$databaseId': db, '$createdAt': now(), '$updatedAt': now(),
+                '$permissions': body.get('permissions') or [], **data}
+    collection['_documents'][document_id] = document
+    return 201, document
+
+@route('GET', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/documents/(?P<did>[^/]+)')
+def get_document(state, params, body, db, cid, did):
+    document = state.collection(db, cid)['_documents'].get(did)
+    if document is None:
+        raise ApiError(404, 'Document with the requested ID could not be found.', 'document_not_found')
+    return 200, document
+
+@route('PATCH', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/documents/(?P<did>[^/]+)')
+def update_document(state, params, body, db, cid, did):
+    collection = state.collection(db, cid)
+    document = collection['_documents'].get(did)
+    if document is None:
+        raise ApiError(404, 'Document with the requested ID could not be found.', 'document_not_found')
+    data = body.get('data') or {}
+    check_document(collection, data, partial=True)
+    document.update(data)
+    document['$updatedAt'] = now()
+    if 'permissions' in body:
+        document['$permissions'] = body['permissions']
+    return 200, document
+
+@route('DELETE', r'/databases/(?P<db>[^/]+)/collections/(?P<cid>[^/]+)/documents/(?P<did>[^/]+)')
+def delete_document(state, params, body, db, cid, did):
+    if state.collection(db, cid)['_documents'].pop(did, None) is None:
+        raise ApiError(404, 'Document with the requested ID could not be found.', 'document_not_found')
+    return 204, None
+
+@route('POST', r'/storage/buckets')
+def create_bucket(state, params, body):
+    bucket_id = new_id(body.get('bucketId'))
+    if bucket_id in state.buckets:
+        raise ApiError(409, 'A storage bucket with the requested ID already exists.', 'storage_bucket_already_exists')
+    state.buckets[bucket_id] = {'$id': bucket_id, 'name': body.get('name'), '$permissions': body.get('permissions') or [],
+                                'fileSecurity': body.get('fileSecurity', False), 'compression': body.get('compression', 'none'),
+                                '$createdAt': now(), '$updatedAt': now(), '_files': {}}
+    return 201, state.buckets[bucket_id]
+
+@route('PUT', r'/storage/buckets/(?P<bucket>[^/]+)')
+def update_bucket(state, params, body, bucket):
+    item = state.bucket(bucket)
+    item['name'] = body.get('name', item['name'])
+    for field, key in (('$permissions', 'permissions'), ('fileSecurity', 'fileSecurity'), ('compression', 'compression')):
+        if body.get(key) is not None:
+            item[field] = body[key]
+    item['$updatedAt'] = now()
+    return 200, state.public(item)
+
+@route('GET', r'/storage/buckets/(?P<bucket>[^/]+)/files')
+def list_files(state, params, body, bucket):
+    files = [state.public(file) for file in state.bucket(bucket)['_files'].values() if not file['_chunks']]
+    total, items = paginate_items(files, params['queries'])
+    return 200, {'total': total, 'files': items}
+
+# Uploads over 5 MB arrive as several requests, each with a Content-Range; the
+# first creates the file and later ones name it with X-Appwrite-ID
+@route('POST', r'/storage/buckets/(?P<bucket>[^/]+)/files')
+def create_file(state, params, body, bucket):
+    files = state.bucket(bucket)['_files']
+    data = body['file']
+    content_range = body.get('_contentRange')
+    start, total = 0, len(data)
+    if content_range:
+        span, total = content_range.split(' ')[1].split('/')
+        start, total = int(span.split('-')[0]), int(total)
+    file_id = body.get('_uploadId') or new_id(body.get('fileId'))
+    file = files.get(file_id)
+    if file is None:
+        if start:
+            raise ApiError(400, 'File upload must start at the first chunk.', 'storage_invalid_content_range')
+        file = files[file_id] = {'$id': file_id, 'bucketId': bucket, 'name': body.get('_filename'),
+                                 'mimeType': body.get('_mimeType'), '$permissions': body.get('permissions') or [],
+                                 '$createdAt': now(), '$updatedAt': now(), 'sizeOriginal': total,
+                                 'chunksTotal': max(1, -(-total // (5 * 1024 * 1024))), 'chunksUploaded': 0,
+                                 '_data': bytearray(), '_chunks': True}
+    elif not file['_chunks'] or not body.get('_uploadId'):
+        raise ApiError(409, 'A storage file with the requested ID already exists.', 'storage_file_already_exists')
+    if start != len(file['_data']):
+        raise ApiError(400, 'Chunk does not continue the upload.', 'storage_invalid_content_range')
+    file['_data'] += data
+    file['chunksUploaded'] += 1
+    file['_chunks'] = len(file['_data']) < total
+    return 201, file
+
+@route('GET', r'/storage/buckets/(?P<bucket>[^/]+)/files/(?P<fid>[^/]+)')
+def get_file(state, params, body, bucket, fid):
+    file = state.bucket(bucket)['_files'].get(fid)
+    if file is None or file['_chunks']:
+        raise ApiError(404, 'The requested file could not be found.', 'storage_file_not_found')
+    return 200, state.public(file)
+
+@route('GET', r'/storage/buckets/(?P<bucket>[^/]+)/files/(?P<fid>[^/]+)/download')
+def download_file(state, params, body, bucket, fid):
+    file = state.bucket(bucket)['_files'].get(fid)
+    if file is None or file['_chunks']:
+        raise ApiError(404, 'The requested file could not be found.', 'storage_file_not_found')
+    return 200, bytes(file['_data'])
+
+@route('DELETE', r'/storage/buckets/(?P<bucket>[^/]+)/files/(?P<fid>[^/]+)')
+def delete_file(state, params, body, bucket, fid):
+    if state.bucket(bucket)['_files'].pop(fid, None) is None:
+        raise ApiError(404, 'The requested file could not be found.', 'storage_file_not_found')
+    return 204, None
+
+# Multipart bodies (file uploads) as a dict of fields; list fields sent as
+# name[0], name[1], ... become lists. The file's bytes are under its field name.
+def parse_multipart(content_type, raw):
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + raw)
+    body = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True)
+        if part.get_filename():
+            body[name] = payload
+            body['_filename'] = part.get_filename()
+            body['_mimeType'] = part.get_content_type()
+            continue
+        value = payload.decode('utf-8')
+        match = re.match(r'^(\w+)\[\d+\]$', name)
+        if match:
+            body.setdefault(match.group(1), []).append(value)
+        else:
+            body[name] = value
+    return body
+
+def parse_params(query_string):
+    params = {'queries': []}
+    for key, values in parse_qs(query_string).items():
+        if key.startswith('queries['):
+            params['queries'].extend(json.loads(value) for value in values)
+        else:
+            params[key] = values[-1]
+    return params
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, delayed ACKs stall
+    # every kept-alive response by ~40ms
+    disable_nagle_algorithm = True
+    state = None
+
+    def handle_request(self, method):
+        state = self.state
+        url = urlsplit(self.path)
+        path = url.path[3:] if url.path.startswith('/v1') else url.path
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        endpoint = f"{method} {path}"
+        extra_headers = {}
+
+        with state.lock:
+            state.in_flight += 1
+            over_capacity = state.max_in_flight and state.in_flight > state.max_in_flight
+        try:
+            delay = state.latency + (state.random.uniform(0, state.jitter) if state.jitter else 0.0)
+            if delay:
+                time.sleep(delay)
+            if over_capacity:
+                raise ApiError(429, 'Too many concurrent requests.', 'general_rate_limit_exceeded')
+            roll = state.random.random()
+            if roll < state.throttle_rate:
+                extra_headers['Retry-After'] = '1'
+                raise ApiError(429, 'Rate limit for the current endpoint has been exceeded.', 'general_rate_limit_exceeded')
+            if roll < state.throttle_rate + state.error_rate:
+                raise ApiError(503, 'Service unavailable (injected).', 'general_server_error')
+            for route_method, pattern, template, handler in ROUTES:
+                match = pattern.match(path)
+                if route_method == method and match:
+                    endpoint = f"{method} {template}"
+                    content_type = self.headers.get('Content-Type') or ''
+                    if content_type.startswith('multipart/form-data'):
+                        body = parse_multipart(content_type, raw)
+                        body['_contentRange'] = self.headers.get('Content-Range')
+                        body['_uploadId'] = self.headers.get('X-Appwrite-ID')
+                    else:
+                        body = json.loads(raw) if raw else {}
+                    with state.lock:
+                        status, payload = handler(state, parse_params(url.query), body, **match.groupdict())
+                    if method != 'GET' and status < 300 and state.random.random() < state.lost_response_rate:
+                        raise ApiError(503, 'Response lost (injected).', 'general_server_error')
+                    break
+            else:
+                raise ApiError(404, f'Route not found: {method} {path}', 'general_route_not_found')
+        except ApiError as e:
+            status, payload = e.code, {'message': e.message, 'code': e.code, 'type': e.type, 'version': 'standin'}
+        except (KeyError, ValueError, TypeError) as e:
+            status, payload = 400, {'message': f'Invalid request: {str(e)}', 'code': 400, 'type': 'general_argument_invalid'}
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+        if isinstance(payload, bytes):
+            data, content_type = payload, 'application/octet-stream'
+        else:
+            data = b'' if payload is None else json.dumps(state.public(payload) if isinstance(payload, dict) else payload).encode()
+            # Empty (204) responses must not claim a JSON body, or the SDK would try to parse it
+            content_type = 'application/json; charset=utf-8' if data else 'text/plain'
+        headers = {'Content-Type': content_type, **extra_headers}
+        if len(data) > 1024 and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            data = gzip.compress(data, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+        state.record(endpoint, len(raw) + len(self.path), len(data), status)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_PATCH(self):
+        self.handle_request('PATCH')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), **options):
+        self.state = StandInState(**options)
+        handler = type('BoundStandInHandler', (StandInHandler,), {'state': self.state})
+        super().__init__(address, handler)
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run an in-memory stand-in for the Appwrite Databases API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request (default: 0)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random latency of up to this many seconds (default: 0)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503 (default: 0)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of requests answered with 429 (default: 0)")
+    parser.add_argument('--attribute-delay', type=float, default=0.0, help="seconds attributes and indexes stay 'processing' (default: 0)")
+    parser.add_argument('--max-in-flight', type=int, default=0, help="answer 429 beyond this many concurrent requests, 0 for no limit (default: 0)")
+    parser.add_argument('--lost-response-rate', type=float, default=0.0, help="fraction of writes applied but answered with 503 (default: 0)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = StandInServer((args.host, args.port), latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           throttle_rate=args.throttle_rate, attribute_delay=args.attribute_delay,
+                           max_in_flight=args.max_in_flight, lost_response_rate=args.lost_response_rate)
+    print(f"Appwrite stand-in listening on {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
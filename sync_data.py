@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import threading
+from dotenv import load_dotenv
+from appwrite.services.databases import Databases
+from catalog import CollectionCatalog
+from bulk_writer import BulkWriter
+from importer import read_rows, coerce_row, RowError, RejectFile
+from overflow import overflow_store
+from appwrite_client import get_client
+
+# Load environment variables
+load_dotenv()
+
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
+
+# Initialize the database service
+databases = Databases(client)
+
+# Use the database ID from environment variables
+DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
+
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
+
+SYNC_INDEX = '.appwrite-sync.db'
+
+# Index writes are committed in groups of this many
+COMMIT_EVERY = 1000
+
+# Content hashes of the documents this script last wrote, kept in a local SQLite
+# file per endpoint, project, database and collection. A source row whose hash
+# matches its entry is left alone without any request. Entries change only
+# after the server accepted the write, so a failed or interrupted sync is
+# simply redone by the next one.
+class SyncIndex:
+    def __init__(self, path, scope, collection_name):
+        self.scope = scope
+        self.collection_name = collection_name
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS documents (
+            scope TEXT NOT NULL, collection TEXT NOT NULL, document_id TEXT NOT NULL, hash TEXT NOT NULL,
+            PRIMARY KEY (scope, collection, document_id)) WITHOUT ROWID''')
+        # Document IDs met in this run's source, to catch duplicate keys and find missing rows
+        self.db.execute('CREATE TEMP TABLE seen (document_id TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def lookup(self, document_id):
+        with self._lock:
+            row = self.db.execute('SELECT hash FROM documents WHERE scope = ? AND collection = ? AND document_id = ?',
+                                  (self.scope, self.collection_name, document_id)).fetchone()
+        return row[0] if row else None
+
+    # False if the ID was already met in this run
+    def see(self, document_id):
+        with self._lock:
+            return self.db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (document_id,)).rowcount == 1
+
+    def store(self, document_id, digest):
+        self._write('INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)',
+                    (self.scope, self.collection_name, document_id, digest))
+
+    def remove(self, document_id):
+        self._write('DELETE FROM documents WHERE scope = ? AND collection = ? AND document_id = ?',
+                    (self.scope, self.collection_name, document_id))
+
+    def _write(self, statement, params):
+        with self._lock:
+            self.db.execute(statement, params)
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self.db.commit()
+                self._uncommitted = 0
+
+    # Documents written by earlier syncs whose rows are gone from this source
+    def missing(self):
+        with self._lock:
+            return [row[0] for row in self.db.execute(
+                'SELECT document_id FROM documents WHERE scope = ? AND collection = ? '
+                'AND document_id NOT IN (SELECT document_id FROM seen)', (self.scope, self.collection_name))]
+
+    def close(self):
+        with self._lock:
+            self.db.commit()
+            self.db.close()
+
+def load_data_model():
+    with open('_dataModel.json', 'r') as f:
+        return json.load(f)
+
+# The natural key columns: --key, else the collection's "sync_key" in _dataModel.json
+def key_fields(collection, override=None):
+    fields = override or collection.get('sync_key')
+    if isinstance(fields, str):
+        fields = [fields]
+    return list(fields or [])
+
+# The same key always maps to the same document ID
+def key_document_id(row, fields):
+    values = []
+    for field in fields:
+        value = row.get(field)
+        if value is None or value == '':
+            raise RowError(f"key column '{field}' is empty")
+        values.append(str(value))
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()[:32]
+
+def content_hash(data):
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+# Read the whole source once, comparing every row with the index. New and
+# changed rows are spooled to temporary files; unchanged rows go no further.
+def classify(path, collection, fields, index, rejects, spools):
+    counts = {'rows': 0, 'new': 0, 'changed': 0, 'unchanged': 0, 'rejected': 0, 'unkeyed': 0}
+    for line_number, row in read_rows(path):
+        counts['rows'] += 1
+        try:
+            if isinstance(row, RowError):
+                raise row
+            if not isinstance(row, dict):
+                raise RowError("row is not an object")
+            document_id = key_document_id(row, fields)
+        except RowError as e:
+            # Without a key the row's document is unknown, so nothing may count as missing
+            rejects.write(line_number, None if isinstance(row, RowError) else row, e)
+            counts['unkeyed'] += 1
+            continue
+        if not index.see(document_id):
+            rejects.write(line_number, row, RowError(f"duplicate key {[row.get(field) for field in fields]}"))
+            counts['rejected'] += 1
+            continue
+        try:
+            data = coerce_row(row, collection['attributes'])
+        except RowError as e:
+            rejects.write(line_number, row, e)
+            counts['rejected'] += 1
+            continue
+        data.pop('$id', None)
+        digest = content_hash(data)
+        stored = index.lookup(document_id)
+        if stored == digest:
+            counts['unchanged'] += 1
+            continue
+        kind = 'new' if stored is None else 'changed'
+        counts[kind] += 1
+        spools[kind].write(json.dumps({'$id': document_id, 'hash': digest, 'data': data}) + '\n')
+    return counts
+
+def spooled_documents(spool, pending):
+    spool.seek(0)
+    for line in spool:
+        entry = json.loads(line)
+        pending[entry['$id']] = entry['hash']
+        yield {'$id': entry['$id'], **entry['data']}
+
+def sync_file(path, collection_name, key=None, delete_missing=False, plan=False, reject_path=None,
+              concurrency=32, rate=None, adaptive=True):
+    data_model = load_data_model()
+    collection = next((c for c in data_model['collections'] if c['name'] == collection_name), None)
+    if not collection:
+        print(f"Collection '{collection_name}' is not defined in _dataModel.json")
+        return False
+    fields = key_fields(collection, key)
+    if not fields:
+        print(f"No natural key for {collection_name}: pass --key or set \"sync_key\" on the collection in _dataModel.json")
+        return False
+    collection_id = catalog.get_collection_id(collection_name)
+    if not collection_id:
+        print(f"Failed to sync {collection_name}: Collection not found")
+        return False
+
+    scope = f"{os.getenv('APPWRITE_ENDPOINT')}|{os.getenv('APPWRITE_PROJECT_ID')}|{DATABASE_ID}"
+    index = SyncIndex(os.getenv('APPWRITE_SYNC_INDEX') or SYNC_INDEX, scope, collection_name)
+    rejects = RejectFile(reject_path or f"{path}.rejects.ndjson")
+    ok = True
+    try:
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as new, tempfile.TemporaryFile('w+', encoding='utf-8') as changed:
+            counts = classify(path, collection, fields, index, rejects, {'new': new, 'changed': changed})
+            missing = index.missing() if delete_missing else []
+            print(f"{collection_name}: {counts['rows']} rows, {counts['new']} new, {counts['changed']} changed, "
+                  f"{counts['unchanged']} unchanged, {counts['rejected'] + counts['unkeyed']} rejected"
+                  + (f", {len(missing)} missing" if delete_missing else ''))
+            if plan:
+                return True
+
+            # The writer's overflow store uploads long values, and deletes the files of
+            # the values changed rows replace and of the documents --delete-missing removes
+            writer = BulkWriter(databases, DATABASE_ID, concurrency=concurrency, rate=rate, adaptive=adaptive,
+                                overflow=overflow_store(client, data_model))
+            pending = {}
+
+            def written(document_id):
+                index.store(document_id, pending.pop(document_id))
+
+            def failed(data, error):
+                pending.pop(data['$id'], None)
+
+            for kind, spool in (('new', new), ('changed', changed)):
+                if counts[kind]:
+                    stats = writer.upsert_documents(collection_name, collection_id, spooled_documents(spool, pending),
+                                                    on_error=failed, on_success=written, existing=kind == 'changed')
+                    ok = ok and stats.errors == 0
+
+            if missing and counts['unkeyed']:
+                print(f"Not deleting {len(missing)} missing documents: {counts['unkeyed']} rows had no readable key")
+                ok = False
+            elif missing:
+                stats = writer.delete_documents(collection_name, collection_id, iter(missing), on_success=index.remove)
+                print(f"Deleted {stats.summary()}")
+                ok = ok and stats.errors == 0
+    finally:
+        index.close()
+        rejects.close()
+    if rejects.count:
+        print(f"{rejects.count} rows rejected; see {rejects.path}")
+    return ok
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bring a collection in line with a source file, writing only new and changed rows")
+    parser.add_argument('path', help="NDJSON or CSV file (optionally .gz) holding every row the collection should contain")
+    parser.add_argument('--collection', required=True, help="collection to sync")
+    parser.add_argument('--key', help="comma-separated natural key columns (default: the collection's \"sync_key\" in _dataModel.json)")
+    parser.add_argument('--delete-missing', action='store_true', help="delete documents from earlier syncs whose rows are gone from the file")
+    parser.add_argument('--plan', action='store_true', help="count new, changed, unchanged and missing rows without writing")
+    parser.add_argument('--reject', help="file for rows that fail validation or are refused by the server (default: <file>.rejects.ndjson)")
+    parser.add_argument('--concurrency', type=int, default=32, help="maximum parallel writes (default: 32)")
+    parser.add_argument('--fixed-concurrency', action='store_true', help="always run --concurrency calls instead of adapting to throttling")
+    parser.add_argument('--rate', type=float, default=0, help="target writes/sec, 0 for unlimited (default: 0)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Syncing {args.path} into {args.collection}...")
+    key = args.key.split(',') if args.key else None
+    ok = sync_file(args.path, args.collection, key, args.delete_missing, args.plan, args.reject,
+                   args.concurrency, args.rate, not args.fixed_concurrency)
+    client.print_pool_stats()
+    if not ok:
+        print("Sync finished with errors.")
+        sys.exit(1)
+    print("Sync completed.")
@@ -1,16 +1,21 @@
 import os
+import sys
+import json
+import time
+import argparse
 from dotenv import load_dotenv
-from appwrite.client import Client
 from appwrite.services.databases import Databases
+from catalog import CollectionCatalog, iter_document_ids, PAGE_SIZE
+from bulk_writer import BulkWriter
+from overflow import overflow_store
+from journal import open_journal
+from appwrite_client import get_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Appwrite client
-client = Client()
-client.set_endpoint(os.getenv('APPWRITE_ENDPOINT'))
-client.set_project(os.getenv('APPWRITE_PROJECT_ID'))
-client.set_key(os.getenv('APPWRITE_API_KEY'))
+# Shared Appwrite client with a keep-alive connection pool
+client = get_client()
 
 # Initialize the database service
 databases = Databases(client)
@@ -18,38 +23,92 @@ databases = Databases(client)
 # Use the database ID from environment variables
 DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
 
-def get_collection_id(collection_name):
-    try:
-        collections = databases.list_collections(DATABASE_ID)
-        for collection in collections['collections']:
-            if collection['name'] == collection_name:
-                return collection['$id']
-        print(f"Collection '{collection_name}' not found")
-        return None
-    except Exception as e:
-        print(f"Error getting collection ID for '{collection_name}': {str(e)}")
-        return None
-
-def delete_all_documents(collection_name):
-    collection_id = get_collection_id(collection_name)
+# Collections are listed once per run and looked up by name
+catalog = CollectionCatalog(databases, DATABASE_ID)
+
+def delete_all_documents(collection_name, writer, page_size=PAGE_SIZE):
+    collection_id = catalog.get_collection_id(collection_name)
     if not collection_id:
         print(f"Failed to delete documents from {collection_name}: Collection not found")
-        return
+        return False
 
-    try:
-        documents = databases.list_documents(DATABASE_ID, collection_id)
-        for doc in documents['documents']:
-            databases.delete_document(DATABASE_ID, collection_id, doc['$id'])
-            print(f"Deleted document from {collection_name}: {doc['$id']}")
-    except Exception as e:
-        print(f"Error deleting documents from {collection_name}: {str(e)}")
-
-def delete_all_data():
-    collections = ["DailyEntry", "FoodItem", "ExerciseItem", "CaffeineIntake", "CaffeineSource", "SweetsIntake"]
+    started = time.monotonic()
+    total_deleted = 0
+    emptied = False
+    # Repeat full passes until one finds nothing left (documents may be added
+    # while we delete), or until a pass makes no progress at all.
+    while True:
+        try:
+            # Only $id is selected so large string attributes never leave the server
+            document_ids = iter_document_ids(databases, DATABASE_ID, collection_id, page_size)
+            stats = writer.delete_documents(collection_name, collection_id, document_ids)
+        except Exception as e:
+            print(f"Error deleting documents from {collection_name}: {str(e)}")
+            break
+        total_deleted += stats.succeeded
+        found = stats.succeeded + stats.errors
+        if found:
+            print(f"Deleted {total_deleted} documents from {collection_name}")
+        if found == 0:
+            emptied = True
+            break
+        if stats.succeeded == 0:
+            print(f"No progress deleting {found} remaining documents from {collection_name}. Giving up.")
+            break
+
+    elapsed = time.monotonic() - started
+    rate = total_deleted / elapsed if elapsed > 0 else 0.0
+    print(f"Emptied {collection_name}: {total_deleted} documents deleted in {elapsed:.1f}s ({rate:.0f} docs/s)")
+    return emptied
+
+def load_data_model():
+    with open('_dataModel.json', 'r') as f:
+        return json.load(f)
+
+# Deleted documents drop out of the listing, so an interrupted collection
+# resumes where it stopped on its own; the journal only records which
+# collections (and their overflow files) are done, so a resumed run skips them
+def delete_all_data(collections=None, concurrency=32, page_size=PAGE_SIZE, adaptive=True, journal=None):
+    data_model = load_data_model()
+    if not collections:
+        collections = [collection['name'] for collection in data_model['collections']]
+    writer = BulkWriter(databases, DATABASE_ID, concurrency=concurrency, adaptive=adaptive)
+    overflow = overflow_store(client, data_model)
     for collection in collections:
-        delete_all_documents(collection)
+        if journal is not None and journal.is_finished(collection, 'delete'):
+            print(f"{collection} was already emptied by the earlier run. Skipping.")
+            continue
+        emptied = delete_all_documents(collection, writer, page_size)
+        # Emptied collections leave no overflow text behind
+        if overflow is not None and collection in overflow.attributes:
+            try:
+                deleted = overflow.delete_collection_files(collection)
+                print(f"Deleted {deleted} overflow files of {collection}")
+            except Exception as e:
+                print(f"Error deleting overflow files of {collection}: {str(e)}")
+                emptied = False
+        if emptied and journal is not None:
+            journal.finish(collection, 'delete')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Delete every document from the collections in _dataModel.json")
+    parser.add_argument('collections', nargs='*', help="collection names to empty (default: all collections in the data model)")
+    parser.add_argument('--concurrency', type=int, default=32, help="maximum parallel delete_document calls (default: 32)")
+    parser.add_argument('--fixed-concurrency', action='store_true', help="always run --concurrency calls instead of adapting to throttling")
+    parser.add_argument('--resume', action='store_true', help="skip collections an interrupted run already emptied")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help=f"document IDs fetched per page (default: {PAGE_SIZE})")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    try:
+        journal = open_journal('delete', DATABASE_ID, {'collections': sorted(args.collections)}, args.resume)
+    except (OSError, ValueError) as e:
+        print(f"Error opening journal: {str(e)}")
+        sys.exit(1)
     print("Starting data deletion process...")
-    delete_all_data()
-    print("Data deletion process completed.")
\ No newline at end of file
+    delete_all_data(args.collections, args.concurrency, args.page_size, not args.fixed_concurrency, journal)
+    if journal is not None:
+        journal.close()
+    client.print_pool_stats()
+    print("Data deletion process completed.")